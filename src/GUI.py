@@ -1577,7 +1577,8 @@ class BookingWorker(QtCore.QThread):
             # 重试直到命中 MUST_STOP 之一
             while not self._stop_flag:
                 try:
-                    msg = self._try_once(place, start_ts, end_ts)
+                    # book() 返回 BookingResult，旧版 main.txt 返回 str，统一取消息文本
+                    msg = str(self._try_once(place, start_ts, end_ts))
                 except Exception as e:
                     msg = f"异常：{e!r}"
 
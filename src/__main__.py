@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+python -m src：命令行（无界面）预订，见 cli.py
+"""
+
+import os
+import sys
+
+# src 内的模块互相以顶层模块名导入
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main
+
+sys.exit(main())
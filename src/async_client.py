@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+"""
+异步预订客户端（仅依赖标准库 asyncio）
+与 CrazyRequests 相同的代理 / SSL 回退语义，但所有请求复用同一个事件循环，
+成百上千个预订请求无需各占一个系统线程。
+建连与同步客户端共用 dns_cache.DNS_CACHE（固定地址 + 竞速）、tls_policy 的共享 SSLContext 与按主机的验证策略。
+另提供同步封装 book_sync()，参数与返回值与 main.book() 一致；配置 async_client 为 true 时 BookingEngine 用它发送预订请求。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import socket
+import ssl
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from main import (
+    DEFAULT_POOL_SIZE,
+    INVALID_PLACE,
+    USER_AGENT,
+    BookingRequestTemplate,
+    _client_key,
+    network_error,
+    parse_book_result,
+)
+from dns_cache import DNS_CACHE
+from retry_policy import BookingResult
+from tls_policy import TLS_POLICY, ssl_context
+
+# 单个请求（含建连）的超时，与 CrazyRequests 保持一致
+DEFAULT_TIMEOUT = 10.0
+
+_READ_SIZE = 65536
+
+
+class HttpProtocolError(IOError):
+    """响应不符合 HTTP/1.1 格式或连接提前关闭"""
+
+
+class ResponseParser:
+    """
+    增量（sans-IO）HTTP/1.1 响应解析器
+    每收到一段数据调用 feed()，返回 True 表示响应已完整；连接关闭时调用 feed_eof()
+    支持 Content-Length、chunked 以及以关闭连接界定长度的响应
+    """
+
+    def __init__(self, head_request: bool = False):
+        self.head_request = head_request
+        self.http_version = ""
+        self.status_code = 0
+        self.reason = ""
+        self.headers: Dict[str, str] = {}  # 键为小写
+        self.body = bytearray()
+        self.complete = False
+        self.keep_alive = True
+        self.received = 0
+        self._buf = bytearray()
+        self._state = "status"
+        self._remaining = 0
+
+    def feed(self, data: bytes) -> bool:
+        self.received += len(data)
+        self._buf += data
+        self._parse()
+        return self.complete
+
+    def feed_eof(self):
+        if self._state == "body_until_close":
+            self.body += self._buf
+            self._buf.clear()
+            self.complete = True
+            self.keep_alive = False
+        elif not self.complete:
+            raise HttpProtocolError("连接在响应完成前被关闭")
+
+    def _readline(self) -> Optional[bytes]:
+        idx = self._buf.find(b"\r\n")
+        if idx < 0:
+            return None
+        line = bytes(self._buf[:idx])
+        del self._buf[:idx + 2]
+        return line
+
+    def _start_body(self):
+        conn = self.headers.get("connection", "").lower()
+        if conn == "close" or (self.http_version == "HTTP/1.0" and conn != "keep-alive"):
+            self.keep_alive = False
+
+        if self.head_request or self.status_code in (204, 304):
+            self.complete = True
+        elif "chunked" in self.headers.get("transfer-encoding", "").lower():
+            self._state = "chunk_size"
+        elif "content-length" in self.headers:
+            self._remaining = int(self.headers["content-length"])
+            self._state = "body"
+            self.complete = self._remaining == 0
+        else:
+            self._state = "body_until_close"
+            self.keep_alive = False
+
+    def _parse(self):
+        while not self.complete:
+            state = self._state
+            if state == "status":
+                line = self._readline()
+                if line is None:
+                    return
+                parts = line.decode("latin-1").split(" ", 2)
+                if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+                    raise HttpProtocolError(f"无效的状态行: {line[:80]!r}")
+                self.http_version = parts[0]
+                self.status_code = int(parts[1])
+                self.reason = parts[2] if len(parts) > 2 else ""
+                self._state = "headers"
+            elif state == "headers":
+                line = self._readline()
+                if line is None:
+                    return
+                if line:
+                    name, _, value = line.decode("latin-1").partition(":")
+                    name = name.strip().lower()
+                    value = value.strip()
+                    self.headers[name] = f"{self.headers[name]}, {value}" if name in self.headers else value
+                elif 100 <= self.status_code < 200:
+                    # 1xx 临时响应，继续等待最终响应
+                    self.headers = {}
+                    self._state = "status"
+                else:
+                    self._start_body()
+            elif state == "body":
+                n = min(self._remaining, len(self._buf))
+                self.body += self._buf[:n]
+                del self._buf[:n]
+                self._remaining -= n
+                if self._remaining:
+                    return
+                self.complete = True
+            elif state == "body_until_close":
+                self.body += self._buf
+                self._buf.clear()
+                return
+            elif state == "chunk_size":
+                line = self._readline()
+                if line is None:
+                    return
+                size = int(line.split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    self._state = "chunk_trailer"
+                else:
+                    self._remaining = size
+                    self._state = "chunk_data"
+            elif state == "chunk_data":
+                if len(self._buf) < self._remaining + 2:
+                    return
+                self.body += self._buf[:self._remaining]
+                del self._buf[:self._remaining + 2]
+                self._state = "chunk_size"
+            elif state == "chunk_trailer":
+                line = self._readline()
+                if line is None:
+                    return
+                if not line:
+                    self.complete = True
+
+
+@dataclass
+class AsyncResponse:
+    status_code: int
+    reason: str
+    headers: Dict[str, str]  # 键为小写
+    content: bytes
+    elapsed: float           # 从发出请求到收完响应的秒数
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def usable(self) -> bool:
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class _NoResponse(HttpProtocolError):
+    """请求发出后没有收到任何字节（通常是复用的空闲连接已被对端关闭）"""
+
+
+class AsyncCrazyRequests:
+    """
+    异步版 CrazyRequests
+    - 直接连接：先启用 SSL 验证，握手失败再禁用验证重试
+    - 使用代理：HTTPS 走 CONNECT 隧道并禁用 SSL 验证，HTTP 走绝对 URI 转发
+    - 每个主机最多 pool_size 条并发连接，空闲连接保持复用
+    """
+
+    def __init__(
+        self,
+        proxies: dict | None = None,
+        cookie: str = "",
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.proxies = proxies
+        self.use_proxy = proxies is not None and len(proxies) > 0
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = timeout
+        self.headers = {"Cookie": cookie, "User-Agent": USER_AGENT}
+        self._idle: Dict[Tuple[str, str, int], List[_Connection]] = {}
+        self._slots: Dict[Tuple[str, str, int], asyncio.Semaphore] = {}
+        self.n_requests = 0
+        self.n_connections = 0
+
+    # ---- 建立连接 ----
+    def _proxy_address(self, scheme: str) -> Tuple[str, int]:
+        proxy = self.proxies.get(scheme) or self.proxies.get("https") or self.proxies.get("http")
+        if "://" not in proxy:
+            proxy = "http://" + proxy
+        parts = urlsplit(proxy)
+        return parts.hostname, parts.port or 80
+
+    async def _tunnel(self, reader, writer, host: str, port: int):
+        writer.write(f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode("ascii"))
+        await writer.drain()
+        parser = ResponseParser(head_request=True)  # CONNECT 的成功响应没有响应体
+        while not parser.complete:
+            data = await reader.read(_READ_SIZE)
+            if not data:
+                raise HttpProtocolError("代理在 CONNECT 完成前关闭了连接")
+            parser.feed(data)
+        if parser.status_code != 200:
+            raise IOError(f"代理 CONNECT 失败: {parser.status_code} {parser.reason}")
+
+    async def _connect(self, host: str, port: int) -> socket.socket:
+        """经 DNS_CACHE 建立 TCP 连接（固定地址 + 多地址竞速）；建连在线程池中进行，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(DNS_CACHE.connect, host, port, timeout=self.timeout))
+
+    async def _open_stream(self, host: str, port: int, verify: Optional[bool] = None):
+        """建立连接；verify 不为 None 时完成 TLS 握手（使用 tls_policy 的共享 SSLContext）"""
+        sock = await self._connect(host, port)
+        try:
+            if verify is None:
+                return await asyncio.open_connection(sock=sock)
+            return await asyncio.open_connection(sock=sock, ssl=ssl_context(verify), server_hostname=host)
+        except BaseException:
+            sock.close()
+            raise
+
+    async def _open(self, scheme: str, host: str, port: int) -> _Connection:
+        if self.use_proxy:
+            reader, writer = await self._open_stream(*self._proxy_address(scheme))
+            if scheme == "https":
+                # 使用代理时直接禁用 SSL 验证
+                await self._tunnel(reader, writer, host, port)
+                await writer.start_tls(ssl_context(False), server_hostname=host)
+        elif scheme == "https":
+            reader = writer = None
+            # 按主机缓存的策略决定是否验证 SSL；未知时先尝试验证，失败则降级并记住结果
+            verify = TLS_POLICY.get(host)
+            if verify is not False:
+                try:
+                    reader, writer = await self._open_stream(host, port, verify=True)
+                    if verify is None:
+                        TLS_POLICY.set(host, True)
+                except ssl.SSLError as ssl_err:
+                    print(f"[AsyncCrazyRequests] SSL验证失败，尝试禁用验证: {str(ssl_err)[:100]}")
+                    TLS_POLICY.set(host, False)
+            if writer is None:
+                try:
+                    reader, writer = await self._open_stream(host, port, verify=False)
+                except Exception as e:
+                    print(f"[AsyncCrazyRequests] 禁用SSL验证后仍然失败: {type(e).__name__}: {e}")
+                    raise IOError(f"无法连接到服务器（SSL握手失败）。请尝试使用代理（Reqable）。详细错误: {e}")
+        else:
+            reader, writer = await self._open_stream(host, port)
+        self.n_connections += 1
+        return _Connection(reader, writer)
+
+    def _slot(self, key) -> asyncio.Semaphore:
+        sem = self._slots.get(key)
+        if sem is None:
+            sem = self._slots[key] = asyncio.Semaphore(self.pool_size)
+        return sem
+
+    def _take_idle(self, key) -> Optional[_Connection]:
+        idle = self._idle.get(key, [])
+        while idle:
+            conn = idle.pop()
+            if conn.usable():
+                return conn
+            conn.close()
+        return None
+
+    # ---- 收发 ----
+    async def _roundtrip(self, conn: _Connection, raw: bytes, head: bool) -> Tuple[ResponseParser, float]:
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        conn.writer.write(raw)
+        await conn.writer.drain()
+        parser = ResponseParser(head_request=head)
+        while not parser.complete:
+            data = await conn.reader.read(_READ_SIZE)
+            if not data:
+                if parser.received == 0:
+                    raise _NoResponse("连接已被对端关闭")
+                parser.feed_eof()
+                break
+            parser.feed(data)
+        return parser, loop.time() - t0
+
+    async def _send(self, key, raw: bytes, head: bool) -> AsyncResponse:
+        async with self._slot(key):
+            conn = self._take_idle(key)
+            reused = conn is not None
+            if conn is None:
+                conn = await self._open(*key)
+            try:
+                try:
+                    parser, elapsed = await self._roundtrip(conn, raw, head)
+                except (_NoResponse, ConnectionResetError, BrokenPipeError):
+                    conn.close()
+                    if not reused:
+                        raise
+                    # 复用的空闲连接已失效且服务器未收到任何请求：换新连接重发一次
+                    conn = await self._open(*key)
+                    parser, elapsed = await self._roundtrip(conn, raw, head)
+            except BaseException:
+                conn.close()
+                raise
+            self.n_requests += 1
+            if parser.keep_alive:
+                self._idle.setdefault(key, []).append(conn)
+            else:
+                conn.close()
+            return AsyncResponse(parser.status_code, parser.reason, parser.headers, bytes(parser.body), elapsed)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        params: dict | None = None,
+        data: dict | bytes | None = None,
+        headers: dict | None = None,
+    ) -> AsyncResponse:
+        parts = urlsplit(url)
+        scheme = parts.scheme
+        host = parts.hostname
+        port = parts.port or (443 if scheme == "https" else 80)
+        query = parts.query
+        if params:
+            query = (query + "&" if query else "") + urlencode(params)
+        target = (parts.path or "/") + ("?" + query if query else "")
+        if self.use_proxy and scheme == "http":
+            target = f"http://{parts.netloc}{target}"
+
+        body = b""
+        hdrs = {"Host": parts.netloc, **self.headers, "Accept": "*/*", "Connection": "keep-alive"}
+        if data is not None:
+            body = data if isinstance(data, bytes) else urlencode(data).encode("utf-8")
+            hdrs["Content-Type"] = "application/x-www-form-urlencoded"
+        if body or method in ("POST", "PUT"):
+            hdrs["Content-Length"] = str(len(body))
+        if headers:
+            hdrs.update(headers)
+
+        head = f"{method} {target} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in hdrs.items()) + "\r\n"
+        raw = head.encode("utf-8") + body
+        return await asyncio.wait_for(self._send((scheme, host, port), raw, method == "HEAD"), self.timeout)
+
+    async def get(self, url, params: dict | None = None) -> AsyncResponse:
+        return await self.request("GET", url, params=params)
+
+    async def head(self, url, params: dict | None = None) -> AsyncResponse:
+        return await self.request("HEAD", url, params=params)
+
+    async def post(self, url, params: dict | None = None, data: dict | bytes | None = None) -> AsyncResponse:
+        return await self.request("POST", url, params=params, data=data)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.n_requests,
+            "connections": self.n_connections,
+            "handshakes_avoided": max(0, self.n_requests - self.n_connections),
+        }
+
+    def close(self):
+        for conns in self._idle.values():
+            for conn in conns:
+                conn.close()
+        self._idle.clear()
+
+
+async def async_book(
+    client: AsyncCrazyRequests,
+    user_id: str,
+    user_name: str,
+    place: str,
+    start_time: str,
+    end_time: str,
+    user_email: str = "example@link.cuhk.edu.cn",
+    user_phone: str = "123456",
+    theme: str = "练琴",
+    template: BookingRequestTemplate | None = None,
+) -> BookingResult:
+    """异步版 book()：请求模板与结果解析与同步版共用"""
+    if template is None:
+        template = BookingRequestTemplate.compile(
+            user_id=user_id,
+            user_name=user_name,
+            place=place,
+            start_time=start_time,
+            end_time=end_time,
+            user_email=user_email,
+            user_phone=user_phone,
+            theme=theme,
+        )
+    if template is None:
+        return INVALID_PLACE
+    t0 = time.perf_counter()
+    try:
+        response = await client.post(template.url, data=template.render())
+    except (IOError, asyncio.TimeoutError):
+        return network_error(time.perf_counter() - t0)
+    return parse_book_result(response.content, response.status_code, time.perf_counter() - t0)
+
+
+class AsyncLoopThread:
+    """
+    后台事件循环线程
+    同步代码通过 run() 提交协程；异步客户端（及其连接池）绑定在这个循环上，跨调用保持
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._clients: Dict[tuple, AsyncCrazyRequests] = {}
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-booking", daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout: float | None = None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def client_for(self, proxies: dict | None, cookie: str) -> AsyncCrazyRequests:
+        key = _client_key(proxies, cookie)
+        client = self._clients.get(key)
+        if client is None:
+            client = self._clients[key] = AsyncCrazyRequests(proxies=proxies, cookie=cookie)
+        return client
+
+
+_LOOP_THREAD: Optional[AsyncLoopThread] = None
+_LOOP_THREAD_LOCK = threading.Lock()
+
+
+def get_loop_thread() -> AsyncLoopThread:
+    global _LOOP_THREAD
+    with _LOOP_THREAD_LOCK:
+        if _LOOP_THREAD is None:
+            _LOOP_THREAD = AsyncLoopThread()
+        return _LOOP_THREAD
+
+
+def book_sync(
+    cookie: str,
+    user_id: str,
+    user_name: str,
+    place: str,
+    start_time: str,
+    end_time: str,
+    user_email: str = "example@link.cuhk.edu.cn",
+    user_phone: str = "123456",
+    theme: str = "练琴",
+    proxies: dict | None = None,
+    client=None,
+    template: BookingRequestTemplate | None = None,
+) -> BookingResult:
+    """
+    同步封装：参数与返回值与 main.book() 相同，可直接作为 BookingEngine 的 book_func
+    client 参数为兼容 book() 的签名而保留，这里忽略（使用后台循环上的异步客户端）
+    """
+    loop_thread = get_loop_thread()
+    async_client = loop_thread.client_for(proxies, cookie)
+    return loop_thread.run(async_book(
+        async_client,
+        user_id=user_id,
+        user_name=user_name,
+        place=place,
+        start_time=start_time,
+        end_time=end_time,
+        user_email=user_email,
+        user_phone=user_phone,
+        theme=theme,
+        template=template,
+    ))
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+房间 × 日期 × 半小时时段的空闲索引
+每个（房间, 日期）用一个 uint64 位图表示一天 48 个半小时时段（第 s 位为 1 表示 s*30 分钟起的时段已被占用），
+整个索引是一个 (房间数, 天数) 的 NumPy uint64 数组，查询时对所有房间同时做位运算：
+例如“明天 18:00 之后任意 UP 琴房第一个空闲的 2 小时”只需 4 次移位与按位与。
+
+数据来源：服务器的占用数据（load_occupancy）与本程序自己的预订结果（record_result，由 BookingEngine 回调）。
+"""
+
+from __future__ import annotations
+
+import threading
+from datetime import date, datetime
+from fnmatch import fnmatchcase
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from constants import PLACES
+from retry_policy import BookingStatus
+from utils import hhmm_to_minutes, minutes_to_hhmm
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# 可预订时段（与请求项的 06:00~23:00 校验一致）
+OPEN_FROM = "06:00"
+OPEN_UNTIL = "23:00"
+
+# 默认索引的天数（含今天）
+DEFAULT_DAYS = 8
+
+# 表示占用的预订结果：自己订到的与被别人订走的时段都不再空闲
+_BUSY_STATUSES = {BookingStatus.SUCCESS, BookingStatus.TAKEN}
+
+
+def _slot_mask(first: int, last: int) -> int:
+    """时段 [first, last) 对应的位"""
+    first = max(0, first)
+    last = min(SLOTS_PER_DAY, last)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def _slot_range(start_hm: str, end_hm: str) -> Tuple[int, int]:
+    """HH:MM 区间覆盖的时段 [first, last)；不足半小时的部分按整个时段计"""
+    s = hhmm_to_minutes(start_hm)
+    e = hhmm_to_minutes(end_hm)
+    return s // SLOT_MINUTES, -(-e // SLOT_MINUTES)
+
+
+def _split_ts(ts: str) -> Tuple[date, str]:
+    """'YYYY-MM-DD HH:MM' -> (date, 'HH:MM')"""
+    d, hm = ts.split(" ")
+    return datetime.strptime(d, "%Y-%m-%d").date(), hm
+
+
+class AvailabilityIndex:
+    """
+    空闲索引（线程安全）
+
+    :param places: 房间列表，默认 constants.PLACES（与 FID_MAP 的 key 一致）
+    :param start_date: 索引覆盖的第一天，默认今天
+    :param days: 覆盖的天数；范围外的更新被忽略，查询返回空
+    """
+
+    def __init__(self, places: Sequence[str] = PLACES, start_date: Optional[date] = None, days: int = DEFAULT_DAYS):
+        self.places = list(places)
+        self.start_date = start_date or date.today()
+        self.days = days
+        self._row = {place: i for i, place in enumerate(self.places)}
+        self._busy = np.zeros((len(self.places), days), dtype=np.uint64)
+        self._lock = threading.Lock()
+
+    # ---- 更新 ----
+    def _locate(self, place: str, start_ts: str, end_ts: str) -> Optional[Tuple[int, int, int]]:
+        row = self._row.get(place)
+        if row is None:
+            return None
+        day, start_hm = _split_ts(start_ts)
+        end_day, end_hm = _split_ts(end_ts)
+        col = (day - self.start_date).days
+        if not 0 <= col < self.days:
+            return None
+        if end_day != day:
+            end_hm = "24:00"
+        first, last = _slot_range(start_hm, end_hm)
+        return row, col, _slot_mask(first, last)
+
+    def mark_busy(self, place: str, start_ts: str, end_ts: str) -> bool:
+        """标记 [start_ts, end_ts) 已被占用；房间或日期不在索引内时返回 False"""
+        loc = self._locate(place, start_ts, end_ts)
+        if loc is None:
+            return False
+        row, col, mask = loc
+        with self._lock:
+            self._busy[row, col] |= np.uint64(mask)
+        return True
+
+    def mark_free(self, place: str, start_ts: str, end_ts: str) -> bool:
+        """标记 [start_ts, end_ts) 空闲（如预订被取消）"""
+        loc = self._locate(place, start_ts, end_ts)
+        if loc is None:
+            return False
+        row, col, mask = loc
+        with self._lock:
+            self._busy[row, col] &= np.uint64(~mask & ((1 << SLOTS_PER_DAY) - 1))
+        return True
+
+    def load_occupancy(self, records: Iterable[Tuple[str, str, str]], day: Optional[date] = None,
+                       places: Optional[Iterable[str]] = None):
+        """
+        写入服务器的占用数据 [(place, start_ts, end_ts)]
+        指定 day（及 places）时先清空这些房间当天的记录，即以本次数据为准整体替换
+        """
+        if day is not None:
+            col = (day - self.start_date).days
+            if 0 <= col < self.days:
+                rows = [self._row[p] for p in (places if places is not None else self.places) if p in self._row]
+                with self._lock:
+                    self._busy[rows, col] = 0
+        for place, start_ts, end_ts in records:
+            self.mark_busy(place, start_ts, end_ts)
+
+    def record_result(self, place: str, start_ts: str, end_ts: str, status: BookingStatus):
+        """按预订结果增量更新（BookingEngine 的 availability 回调）"""
+        if status in _BUSY_STATUSES:
+            self.mark_busy(place, start_ts, end_ts)
+
+    # ---- 查询 ----
+    def _rows(self, rooms: Union[None, str, Sequence[str]]) -> np.ndarray:
+        """rooms 为空表示全部房间；字符串按通配符匹配（如 "*（UP）"）；列表为精确房间名"""
+        if rooms is None:
+            return np.arange(len(self.places))
+        if isinstance(rooms, str):
+            return np.array([i for i, p in enumerate(self.places) if fnmatchcase(p, rooms)], dtype=np.intp)
+        return np.array([self._row[p] for p in rooms if p in self._row], dtype=np.intp)
+
+    def busy_bits(self, day: date) -> np.ndarray:
+        """某天所有房间的占用位图（副本）"""
+        col = (day - self.start_date).days
+        if not 0 <= col < self.days:
+            return np.zeros(len(self.places), dtype=np.uint64)
+        with self._lock:
+            return self._busy[:, col].copy()
+
+    def is_free(self, place: str, start_ts: str, end_ts: str) -> bool:
+        loc = self._locate(place, start_ts, end_ts)
+        if loc is None:
+            return False
+        row, col, mask = loc
+        with self._lock:
+            return not int(self._busy[row, col]) & mask
+
+    def free_blocks(
+        self,
+        day: date,
+        minutes: int,
+        after: str = OPEN_FROM,
+        before: str = OPEN_UNTIL,
+        rooms: Union[None, str, Sequence[str]] = None,
+    ) -> List[Tuple[str, str, str]]:
+        """
+        每个房间在 day 的 [after, before) 内第一个连续 minutes 分钟的空闲时段
+        返回 [(place, start_ts, end_ts)]，按开始时间、再按房间顺序排列；没有空闲时段的房间不出现
+        """
+        rows = self._rows(rooms)
+        k = -(-minutes // SLOT_MINUTES)
+        first, last = _slot_range(after, before)
+        if not len(rows) or k <= 0 or last - first < k:
+            return []
+        # 开始时段必须满足 s >= first 且 s + k <= last
+        window = np.uint64(_slot_mask(first, last - k + 1))
+        free = ~self.busy_bits(day)[rows]
+        # run 的第 s 位为 1 ⇔ 时段 s..s+k-1 全部空闲
+        run = free.copy()
+        for i in range(1, k):
+            run &= free >> np.uint64(i)
+        run &= window
+        hit = np.nonzero(run)[0]
+        if not len(hit):
+            return []
+        lowest = run[hit] & (~run[hit] + np.uint64(1))
+        starts = np.log2(lowest.astype(np.float64)).astype(np.int64)
+        order = np.lexsort((rows[hit], starts))
+        d = day.strftime("%Y-%m-%d")
+        out = []
+        for j in order:
+            s = int(starts[j])
+            out.append((self.places[rows[hit[j]]],
+                        f"{d} {minutes_to_hhmm(s * SLOT_MINUTES)}",
+                        f"{d} {minutes_to_hhmm((s + k) * SLOT_MINUTES)}"))
+        return out
+
+    def first_free(
+        self,
+        day: date,
+        minutes: int,
+        after: str = OPEN_FROM,
+        before: str = OPEN_UNTIL,
+        rooms: Union[None, str, Sequence[str]] = None,
+    ) -> Optional[Tuple[str, str, str]]:
+        """所有（匹配的）房间中最早的一个连续 minutes 分钟空闲时段"""
+        blocks = self.free_blocks(day, minutes, after, before, rooms)
+        return blocks[0] if blocks else None
+
+    def occupancy(self, day: date, after: str = OPEN_FROM, before: str = OPEN_UNTIL) -> np.ndarray:
+        """某天 [after, before) 的占用矩阵（房间 × 时段，bool），用于热力图"""
+        first, last = _slot_range(after, before)
+        bits = self.busy_bits(day)
+        shifts = np.arange(first, last, dtype=np.uint64)
+        return ((bits[:, None] >> shifts[None, :]) & np.uint64(1)).astype(bool)
@@ -0,0 +1,497 @@
+# -*- coding: utf-8 -*-
+"""
+并发预订引擎
+到点后所有片段（chunk）同时开抢，每个片段独立重试；
+全局限制同时在途的请求数，并按主机限速。不依赖 Qt，可用于 GUI 线程和命令行。
+
+突发模式：到点时每个片段按错开的时间偏移发出 K 个请求（分散在连接池的多条连接上），
+取第一个终止性结果，其余重复结果只记日志不再弹窗；随后未完成的片段按 RetryPolicy 重试。
+
+预发送（可选，cfg.raw_sender）：到点前 STAGE_LEAD 秒为首轮的每个请求建立连接并写出除最后一个字节外的
+整个请求（见 raw_sender），到点时调度线程只需写出最后的字节。
+
+候选地点：片段可带多个按优先级排列的地点。当前地点已被预订（或地点无效）且它的请求全部返回后，
+立即改抢下一个候选（所有候选的请求开抢前均已预编译）；同一片段任何时刻只有一个地点的请求在途，
+因此不会同时订到两个房间。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlsplit
+
+from main import BOOK_URL, BookingRequestTemplate, book
+from raw_sender import STAGE_LEAD, RawSender, StagedRequest
+from retry_policy import BookingResult, BookingStatus, RetryPolicy, RetryState
+from scheduler import wait_until
+from utils import parse_proxies
+
+
+class RateLimiter:
+    """令牌桶限速：平均每秒 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop_event: Optional[threading.Event] = None) -> bool:
+        """取得一个令牌；rate <= 0 表示不限速。被 stop_event 取消时返回 False"""
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class HostRateLimiter:
+    """按主机分别限速"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> RateLimiter:
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(self.rate, self.burst)
+            return limiter
+
+
+def _describe(result: BookingResult) -> str:
+    """日志中的结果：消息文本，附带状态码与耗时"""
+    extra = []
+    if result.http_status is not None:
+        extra.append(f"HTTP {result.http_status}")
+    if result.latency is not None:
+        extra.append(f"{result.latency * 1000:.0f} ms")
+    return f"{result.message}（{'，'.join(extra)}）" if extra else result.message
+
+
+# 当前候选地点不可用、可以改抢下一个候选的结果
+_FAILOVER = {BookingStatus.TAKEN, BookingStatus.INVALID}
+
+
+@dataclass
+class ChunkState:
+    """单个片段的重试状态"""
+    candidates: List[str]
+    start_ts: str
+    end_ts: str
+    attempts: int = 0
+    sent: int = 0
+    result: Optional[BookingResult] = None
+    retry: Optional[RetryState] = None
+    templates: List[Optional[BookingRequestTemplate]] = field(default_factory=list)
+    index: int = 0  # 当前候选
+    inflight: int = 0  # 当前候选已发出、尚未返回的请求数
+    first_round: int = 0  # 首轮（突发）中尚未返回的请求数，归零后开始重试
+    exhausted: bool = False  # 当前候选已不可用，等在途请求全部返回后切换
+    done: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def place(self) -> str:
+        return self.candidates[self.index]
+
+    @property
+    def template(self) -> Optional[BookingRequestTemplate]:
+        return self.templates[self.index] if self.templates else None
+
+    @property
+    def status(self) -> Optional[BookingStatus]:
+        return self.result.status if self.result is not None else None
+
+    @property
+    def last_message(self) -> str:
+        return self.result.message if self.result is not None else ""
+
+    @property
+    def label(self) -> str:
+        return f"{self.place}  {self.start_ts} - {self.end_ts}"
+
+
+def default_book_func(cfg) -> Callable[..., BookingResult]:
+    """cfg.async_client 为 true 时用异步客户端的同步封装，否则用 main.book"""
+    if cfg.async_client:
+        # 只在启用时导入，不拖慢启动
+        from async_client import book_sync
+        return book_sync
+    return book
+
+
+class BookingEngine:
+    """
+    并发预订引擎
+
+    :param cfg: AppConfig（用户信息、代理等）
+    :param chunks: [(place, start_ts, end_ts)]，place 可为按优先级排列的候选地点列表
+    :param client: 共用的长连接客户端
+    :param on_log: 日志回调 (message)
+    :param on_popup: 弹窗回调 (level, message)，level in {"info","warn","error"}
+    :param stop_event: 外部取消
+    :param book_func: 单次预订函数，缺省按 cfg.async_client 选择 main.book 或 async_client.book_sync（测试时可替换）
+    :param policy: 重试策略，默认按 cfg 的 retry_* 字段构造
+    :param availability: 空闲索引（availability.AvailabilityIndex），每个结果返回后增量更新
+    :param inflight: 同时在途请求数的信号量；多个引擎（多账号）传入同一个即共用并发上限
+    :param rate: 按主机限速器；多个引擎传入同一个即共用限速
+    """
+
+    def __init__(
+        self,
+        cfg,
+        chunks: List[Tuple[Union[str, Sequence[str]], str, str]],
+        client=None,
+        on_log: Callable[[str], None] = print,
+        on_popup: Optional[Callable[[str, str], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+        book_func: Optional[Callable[..., BookingResult]] = None,
+        policy: Optional[RetryPolicy] = None,
+        availability=None,
+        inflight: Optional[threading.BoundedSemaphore] = None,
+        rate: Optional[HostRateLimiter] = None,
+    ):
+        self.cfg = cfg
+        self.states = [
+            ChunkState([place] if isinstance(place, str) else list(place), start_ts, end_ts)
+            for (place, start_ts, end_ts) in chunks
+        ]
+        # 开抢前预编译每个片段所有候选地点的请求，重试与切换候选时只需拼接 UUID
+        for st in self.states:
+            st.templates = [
+                BookingRequestTemplate.compile(
+                    user_id=cfg.user_id,
+                    user_name=cfg.user_name,
+                    place=place,
+                    start_time=st.start_ts,
+                    end_time=st.end_ts,
+                    user_email=cfg.user_email,
+                    user_phone=cfg.user_phone,
+                    theme=cfg.theme or "练琴",
+                )
+                for place in st.candidates
+            ]
+        self.client = client
+        self.proxies = parse_proxies(cfg.proxies)
+        self.on_log = on_log
+        self.on_popup = on_popup or (lambda level, message: None)
+        self.stop_event = stop_event or threading.Event()
+        self.book_func = book_func or default_book_func(cfg)
+        self.policy = policy or RetryPolicy.from_config(cfg)
+        self.availability = availability
+        # 全局并发上限：同时在途的请求数
+        self._inflight = inflight or threading.BoundedSemaphore(max(1, int(cfg.max_concurrency)))
+        self._rate = rate or HostRateLimiter(cfg.rate_limit)
+        # 突发：每个片段到点发出 burst_size 个请求，第 i 个按 burst_offsets_ms[i % len] 错开
+        self.burst_size = max(1, int(cfg.burst_size))
+        self.burst_offsets_ms = list(cfg.burst_offsets_ms or [0])
+        # 每个片段的请求总数上限（含突发与重试），0 表示不限
+        self.budget = max(0, int(cfg.burst_budget))
+        # 首轮请求预发送（可选）
+        self.raw_sender = RawSender(self.proxies, cfg.cookie) if cfg.raw_sender else None
+        # 各片段的重试循环（首轮请求返回后由 _start_retry 启动）
+        self._retries: Dict[int, Future] = {}
+        self._retry_lock = threading.Lock()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _try_once(self, st: ChunkState, index: int, staged: Optional[StagedRequest] = None) -> BookingResult:
+        place = st.candidates[index]
+        if staged is not None:
+            try:
+                return staged.fire()
+            except (IOError, ValueError) as e:
+                # 预发送的连接失效（被服务器关闭等），改用常规请求
+                self.on_log(f"预发送连接失效，改用常规请求（{place} {st.start_ts}）：{type(e).__name__}: {e}")
+        return self.book_func(
+            cookie=self.cfg.cookie,
+            user_id=self.cfg.user_id,
+            user_name=self.cfg.user_name,
+            place=place,
+            start_time=st.start_ts,
+            end_time=st.end_ts,
+            user_email=self.cfg.user_email,
+            user_phone=self.cfg.user_phone,
+            theme=self.cfg.theme or "练琴",
+            proxies=self.proxies,
+            client=self.client,
+            template=st.templates[index],
+        )
+
+    def _try_once_safe(self, st: ChunkState, index: int, staged: Optional[StagedRequest] = None) -> BookingResult:
+        try:
+            return self._try_once(st, index, staged)
+        except Exception as e:
+            return BookingResult(BookingStatus.NETWORK_ERROR, f"异常：{e!r}")
+
+    def _handle_stop_message(self, st: ChunkState, status: BookingStatus):
+        if status is BookingStatus.SUCCESS:
+            self.on_popup("info", f"保存成功：{st.label}")
+        elif status is BookingStatus.TAKEN:
+            if len(st.candidates) > 1:
+                self.on_popup("warn", f"{len(st.candidates)} 个候选地点均已被预订：{st.label}")
+            else:
+                self.on_popup("warn", f"已被预订：{st.label}")
+        elif status is BookingStatus.COOKIE_EXPIRED:
+            self.on_popup("error", "Cookie 过期，请在右上角按钮中重新设置 Cookie。")
+        elif status is BookingStatus.INVALID:
+            self.on_popup("error", f"地点错误：{st.label}")
+
+    def _give_up(self, st: ChunkState):
+        self.on_log(f"放弃重试（{st.retry.reason}）：{st.label}")
+        if st.status is BookingStatus.NETWORK_ERROR:
+            self.on_popup("error", "请求失败，请检查网络、代理服务器或 VPN。")
+        else:
+            self.on_popup("warn", f"已放弃重试（{st.retry.reason}）：{st.label}")
+
+    def _reserve(self, st: ChunkState) -> Optional[int]:
+        """
+        占用一次请求预算并登记为在途，返回本次请求的候选下标；
+        片段已完成或预算用尽时返回 None
+        """
+        with st.lock:
+            if st.done or (self.budget and st.sent >= self.budget):
+                return None
+            st.sent += 1
+            st.inflight += 1
+            return st.index
+
+    def _release(self, st: ChunkState):
+        """登记的请求未发出（被取消）"""
+        with st.lock:
+            st.inflight -= 1
+            self._maybe_failover(st)
+
+    def _maybe_failover(self, st: ChunkState) -> bool:
+        """当前候选已不可用且没有在途请求时切换到下一个候选（需持有 st.lock）"""
+        if st.done or not st.exhausted or st.inflight:
+            return False
+        st.index += 1
+        st.exhausted = False
+        return True
+
+    def _attempt(self, st: ChunkState, limiter: RateLimiter, index: int,
+                 staged: Optional[StagedRequest] = None) -> bool:
+        """
+        发出一次请求并处理结果，返回该片段是否已结束；
+        index 为 _reserve() 返回的候选下标，staged 为已在调度线程上发出的预发送请求
+        """
+        if staged is not None and staged.sent_at is not None:
+            # 调度线程发出预发送请求时已取得限速令牌并占用了并发名额，读完响应后才归还名额
+            try:
+                result = self._try_once_safe(st, index, staged)
+            finally:
+                self._inflight.release()
+        else:
+            if not limiter.acquire(self.stop_event):
+                self._release(st)
+                return True
+            with self._inflight:
+                result = self._try_once_safe(st, index, staged)
+
+        place = st.candidates[index]
+        status = result.status
+        with st.lock:
+            st.attempts += 1
+            st.inflight -= 1
+            duplicate = st.done
+            # 突发中先返回了失败、随后才返回成功时，以成功为准
+            upgrade = duplicate and status is BookingStatus.SUCCESS and st.status is not BookingStatus.SUCCESS
+            if not duplicate or upgrade:
+                st.result = result
+                if status in _FAILOVER and index + 1 < len(st.candidates):
+                    # 还有候选：等当前地点的在途请求全部返回（其中可能有成功）后再切换
+                    st.exhausted = True
+                elif status.terminal:
+                    st.done = True
+            switched = self._maybe_failover(st)
+            next_place = st.place
+        if self.availability is not None:
+            self.availability.record_result(place, st.start_ts, st.end_ts, status)
+        detail = _describe(result)
+        if duplicate and not upgrade:
+            self.on_log(f"返回（{place} {st.start_ts}，已有结果，忽略）：{detail}")
+            return True
+        self.on_log(f"返回（{place} {st.start_ts}）：{detail}")
+        if switched:
+            self.on_log(f"{place} 不可用，改抢候选 {next_place}（{st.start_ts} - {st.end_ts}）")
+        if st.done:
+            self._handle_stop_message(st, status)
+        return st.done
+
+    def _burst_schedule(self, fire_at: datetime) -> List[Tuple[datetime, int, ChunkState]]:
+        schedule = []
+        for idx, st in enumerate(self.states):
+            for i in range(self.burst_size):
+                offset = self.burst_offsets_ms[i % len(self.burst_offsets_ms)] if self.burst_size > 1 else 0
+                schedule.append((fire_at + timedelta(milliseconds=offset), idx, st))
+        schedule.sort(key=lambda item: (item[0], item[1]))
+        return schedule
+
+    def _stage(self, pool: ThreadPoolExecutor, schedule) -> List[Optional[StagedRequest]]:
+        """为首轮的每个请求并行建立连接并预发送；失败的位置为 None（到点时改用常规请求）"""
+        def stage_one(item):
+            _, _, st = item
+            if st.template is None:
+                return None
+            try:
+                return self.raw_sender.stage(st.template)
+            except Exception as e:
+                self.on_log(f"预发送失败（{st.place} {st.start_ts}）：{type(e).__name__}: {e}")
+                return None
+
+        staged = list(pool.map(stage_one, schedule))
+        self.on_log(f"已预发送 {sum(s is not None for s in staged)}/{len(staged)} 个请求，等待到点写出最后的字节")
+        return staged
+
+    def _fire_burst(self, pool: ThreadPoolExecutor, fire_at: datetime):
+        """
+        由单个调度线程按时间顺序派发首轮请求：
+        只有这一个线程做高精度等待，避免多个线程同时自旋争抢 GIL
+        """
+        futures = []
+        limiter = self._rate.for_url(BOOK_URL)
+        first = True
+        schedule = self._burst_schedule(fire_at)
+        staged: List[Optional[StagedRequest]] = [None] * len(schedule)
+        if self.raw_sender is not None:
+            stage_at = schedule[0][0] - timedelta(seconds=STAGE_LEAD)
+            if stage_at > datetime.now() and wait_until(stage_at, self.stop_event) is None:
+                return
+            staged = self._stage(pool, schedule)
+        for st in self.states:
+            st.first_round = 0
+        for _, _, st in schedule:
+            st.first_round += 1
+        for k, (t, _, st) in enumerate(schedule):
+            if t > datetime.now():
+                skew_ms = wait_until(t, self.stop_event)
+                if skew_ms is None:
+                    break
+                if first:
+                    self.on_log(f"已到点触发，偏差 {skew_ms:+.3f} ms")
+            if first:
+                # 热窗口与放弃期限从实际开抢时刻算起
+                for s in self.states:
+                    s.retry = self.policy.start()
+            first = False
+            if self.stop_event.is_set():
+                break
+            index = self._reserve(st)
+            if index is None:
+                self._first_round_done(pool, st)
+                continue
+            pre = staged[k]
+            if pre is not None and index != 0:
+                # 预发送的请求针对首选地点，已切换候选时不能再发出
+                staged[k] = None
+                pre.close()
+                pre = None
+            if pre is not None and limiter.acquire(self.stop_event):
+                staged[k] = None
+                # 并发名额一直占用到 _attempt 读完响应
+                self._inflight.acquire()
+                try:
+                    pre.send()
+                except OSError as e:
+                    self._inflight.release()
+                    self.on_log(f"预发送连接失效（{st.place} {st.start_ts}）：{type(e).__name__}: {e}")
+                    pre.close()
+                    pre = None
+            futures.append(pool.submit(self._first_round, pool, st, limiter, index, pre))
+        for fut in futures:
+            fut.result()
+        # 未用上的预发送连接（片段已完成或被取消）直接关闭
+        for pre in staged:
+            if pre is not None:
+                pre.close()
+
+    def _first_round(self, pool: ThreadPoolExecutor, st: ChunkState, limiter: RateLimiter, index: int,
+                     staged: Optional[StagedRequest]):
+        """首轮请求；该片段的首轮请求全部返回后立即开始它的重试，不等其他片段"""
+        try:
+            self._attempt(st, limiter, index, staged)
+        finally:
+            self._first_round_done(pool, st)
+
+    def _first_round_done(self, pool: ThreadPoolExecutor, st: ChunkState):
+        with st.lock:
+            st.first_round -= 1
+            last = st.first_round == 0
+        if last:
+            self._start_retry(pool, st)
+
+    def _start_retry(self, pool: ThreadPoolExecutor, st: ChunkState):
+        """为未完成的片段启动重试循环（每个片段只启动一次）"""
+        with self._retry_lock:
+            if st.done or id(st) in self._retries:
+                return
+            self._retries[id(st)] = pool.submit(self._run_chunk, st)
+
+    def _run_chunk(self, st: ChunkState):
+        limiter = self._rate.for_url(BOOK_URL)
+        if st.retry is None:
+            st.retry = self.policy.start()
+        # 重试直到命中终止性结果，或按策略放弃；刚切换到下一个候选时立即发出
+        last_index = 0
+        while not self.stop_event.is_set():
+            if st.status is not None and st.index == last_index:
+                delay = self.policy.next_delay(st.retry, st.status)
+                if delay is None:
+                    self._give_up(st)
+                    break
+                if self.stop_event.wait(delay):
+                    break
+            last_index = st.index
+            index = self._reserve(st)
+            if index is None:
+                if not st.done:
+                    self.on_popup("warn", f"请求次数已达上限（{self.budget}）：{st.label}")
+                break
+            if self._attempt(st, limiter, index):
+                break
+
+    def run(self, fire_at: Optional[datetime] = None) -> List[ChunkState]:
+        """
+        首轮（突发）请求在 fire_at 按错开偏移发出（fire_at 为空时立即发出），
+        每个片段的首轮请求一返回，该片段就开始重试（不等其他片段的首轮）；全部结束（或被取消）后返回各片段状态
+        """
+        if not self.states:
+            return self.states
+        for st in self.states:
+            self.on_log(f"开始预定：{st.label}")
+        workers = len(self.states) * (self.burst_size + 1)
+        self._retries = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk") as pool:
+            self._fire_burst(pool, fire_at or datetime.now())
+            # 首轮没有发出请求的片段（如被取消、预算为 0）也进入重试循环，由其自行结束
+            for st in self.states:
+                self._start_retry(pool, st)
+            with self._retry_lock:
+                retries = list(self._retries.values())
+            for fut in retries:
+                fut.result()
+        return self.states
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+命令行（无界面）预订
+读取 config.yaml，按 GUI 相同的规则拆分片段，到目标时间开抢；全程不导入 Qt，适合在常开的 Linux 小主机上运行。
+
+使用方法:
+    python -m src                     # 按 config.yaml 中的 target_time 定时开抢
+    python -m src --now               # 立即开抢
+    python -m src --at "2025-09-16 21:00:00"
+    python -m src --dry-run           # 只打印将要预订的片段
+
+退出码：0 全部订到；1 有片段没订到或被取消；2 配置错误
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+# 只导入轻量模块；网络与预订引擎在确定要开抢后再导入
+from config import CONFIG_FILE, ConfigManager
+from constants import OCCUPANCY_DISABLED_HINT, PLACES
+from utils import build_chunks, parse_proxies
+
+# 命令行直接使用配置中的 Cookie，不需要自动登录的密码
+CLI_REQUIRED_FIELDS = ("cookie", "user_id", "user_name", "user_email")
+
+
+def log(message: str):
+    print(f"{datetime.now():%H:%M:%S.%f}"[:-3] + f" {message}", flush=True)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m src", description="MUS 琴房预订（命令行，无界面）")
+    parser.add_argument("-c", "--config", default=CONFIG_FILE, help="配置文件路径（默认与 GUI 共用 config.yaml）")
+    when = parser.add_mutually_exclusive_group()
+    when.add_argument("--now", action="store_true", help="忽略 target_time，立即开抢")
+    when.add_argument("--at", metavar="TIME", help="目标时间 'YYYY-MM-DD HH:MM:SS'（覆盖配置中的 target_time）")
+    parser.add_argument("--dry-run", action="store_true", help="只打印将要预订的片段，不发请求")
+    parser.add_argument("--watch", action="store_true", help="开抢结束后对没订到的片段继续捡漏（同 watch_after_release；需配置 occupancy_url）")
+    return parser.parse_args(argv)
+
+
+def run(cfg, chunks, fire_at: Optional[datetime], profiles=None, stop_event: Optional[threading.Event] = None,
+        watch: bool = False, book_func=None) -> bool:
+    """开抢（fire_at 为空时立即开始），返回是否所有片段都已订到"""
+    from booking_engine import BookingEngine
+    from main import get_client
+    from multi_account import MultiAccountEngine, main_account_name
+    from retry_policy import BookingStatus
+
+    stop_event = stop_event or threading.Event()
+    client = get_client(
+        proxies=parse_proxies(cfg.proxies),
+        cookie=cfg.cookie,
+        pool_size=max(cfg.pool_size, cfg.burst_size),
+        keep_alive=cfg.keep_alive,
+    )
+
+    prewarmer = None
+    if fire_at is not None:
+        if cfg.prewarm_enabled:
+            from prewarm import ConnectionPrewarmer
+            prewarmer = ConnectionPrewarmer(
+                client,
+                fire_at,
+                lead_seconds=cfg.prewarm_seconds,
+                connections=max(cfg.prewarm_connections, cfg.burst_size),
+                ping_interval=cfg.prewarm_ping_interval,
+            )
+            prewarmer.start()
+        if cfg.clock_sync_enabled:
+            from clock_sync import align_fire_time
+            fire_at = align_fire_time(client, fire_at, samples=cfg.clock_sync_samples,
+                                      stop_event=stop_event, on_log=log)
+            if fire_at is None:
+                log("已取消定时任务。")
+                return False
+
+    try:
+        if profiles:
+            main_name = main_account_name(cfg)
+            multi = MultiAccountEngine(cfg, [(main_name, None, chunks), *profiles], clients={main_name: client},
+                                       on_log=log, on_popup=lambda level, m: log(m),
+                                       stop_event=stop_event, book_func=book_func)
+            results = multi.run(fire_at=fire_at)
+            for line in multi.summary():
+                log(line)
+            main_states = results.pop(main_name)
+            other_states = [st for sts in results.values() for st in sts]
+        else:
+            engine = BookingEngine(cfg, chunks, client=client, on_log=log, on_popup=lambda level, m: log(m),
+                                   stop_event=stop_event, book_func=book_func)
+            main_states, other_states = engine.run(fire_at=fire_at), []
+    finally:
+        if prewarmer is not None:
+            prewarmer.stop()
+
+    if stop_event.is_set():
+        log("已取消。")
+        return False
+    others_ok = all(st.status is BookingStatus.SUCCESS for st in other_states)
+    missed = [st for st in main_states if st.status is not BookingStatus.SUCCESS]
+    if watch and missed:
+        # 捡漏只针对主账号的片段
+        from sniper import AdaptiveInterval, Sniper, WatchItem
+        log(f"{len(missed)} 个片段没订到，开始捡漏（Ctrl+C 停止）…")
+        items = [WatchItem(list(st.candidates), st.start_ts, st.end_ts) for st in missed]
+        Sniper(cfg, items, client, url=cfg.occupancy_url,
+               interval=AdaptiveInterval(cfg.sniper_min_interval, cfg.sniper_max_interval),
+               on_log=log, on_popup=lambda level, m: log(m), stop_event=stop_event, book_func=book_func).run()
+        return others_ok and all(it.booked is not None for it in items)
+    return others_ok and not missed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        cfg = ConfigManager.load(args.config)
+    except Exception as e:
+        log(f"读取配置失败：{type(e).__name__}: {e}")
+        return 2
+
+    missing = [key for key in CLI_REQUIRED_FIELDS if not getattr(cfg, key)]
+    if missing:
+        log("配置缺少必填项：" + "、".join(missing))
+        return 2
+    if cfg.proxies and parse_proxies(cfg.proxies) is None:
+        log("proxies 格式错误，请以 JSON 或 YAML 格式填写")
+        return 2
+    try:
+        chunks = build_chunks(cfg.requests, PLACES)
+        profiles = []
+        if cfg.profiles:
+            from multi_account import profile_jobs
+            profiles = profile_jobs(cfg, PLACES, on_log=log)
+        fire_at = None
+        if not args.now:
+            fire_at = datetime.strptime(args.at or cfg.target_time, "%Y-%m-%d %H:%M:%S")
+    except ValueError as e:
+        log(f"参数错误：{e}")
+        return 2
+
+    n = len(chunks) + sum(len(c) for _, _, c in profiles)
+    if args.dry_run:
+        for places, start_ts, end_ts in chunks:
+            log(f"{start_ts} - {end_ts}  {' > '.join(places)}")
+        for name, _, pchunks in profiles:
+            for places, start_ts, end_ts in pchunks:
+                log(f"[{name}] {start_ts} - {end_ts}  {' > '.join(places)}")
+        log(f"共 {n} 个片段，目标时间 {fire_at or '立即'}")
+        return 0
+
+    watch = args.watch or cfg.watch_after_release
+    if watch and not cfg.occupancy_url:
+        log(OCCUPANCY_DISABLED_HINT)
+        watch = False
+    if fire_at is not None and fire_at <= datetime.now():
+        log(f"目标时间 {fire_at:%Y-%m-%d %H:%M:%S} 已过，立即开抢")
+        fire_at = None
+    log(f"共 {n} 个片段，" + (f"将在 {fire_at:%Y-%m-%d %H:%M:%S} 准时发出…" if fire_at else "立即开始…"))
+
+    # 预订在后台线程进行，主线程等待 Ctrl+C（SIGINT 只会打断主线程）
+    stop_event = threading.Event()
+    outcome = {}
+    worker = threading.Thread(
+        target=lambda: outcome.setdefault("ok", run(cfg, chunks, fire_at, profiles, stop_event, watch=watch)),
+        name="booking",
+    )
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        log("正在取消…")
+        stop_event.set()
+        worker.join()
+    return 0 if outcome.get("ok") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+服务器时钟同步模块
+预订窗口按服务器时钟开放，而本地时钟可能有数百毫秒甚至数秒的偏差。
+参考 NTP 的做法：多次请求 booking.cuhk.edu.cn，记录本地发出/收到时间与响应的 Date 头，
+估计服务器与本地的时钟偏移（offset）和往返时间（RTT）。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Optional
+
+# 采样目标（HEAD 请求，只需要响应头里的 Date）
+CLOCK_SYNC_URL = "https://booking.cuhk.edu.cn/"
+
+# RTT 明显高于最小值的样本视为受排队/重传影响，不参与估计
+RTT_FILTER_RATIO = 1.5
+RTT_FILTER_SLACK = 0.005
+
+# 到点前多少秒进行时钟同步（采样约需 1 秒）
+CLOCK_SYNC_LEAD = 20
+
+
+@dataclass
+class ClockSample:
+    t0: float           # 本地发出时间（epoch 秒）
+    t1: float           # 本地收到时间（epoch 秒）
+    server_time: float  # Date 头表示的服务器时间（epoch 秒，精度 1 秒，向下取整）
+
+    @property
+    def rtt(self) -> float:
+        return self.t1 - self.t0
+
+
+@dataclass
+class ClockEstimate:
+    offset: float  # 服务器时间 - 本地时间（秒）
+    rtt: float     # 最小往返时间（秒）
+    error: float   # offset 的不确定度（± 秒）
+    samples: int
+
+    def local_fire_time(self, server_target: datetime) -> datetime:
+        """
+        将服务器时钟下的目标时间换算为本地应当发出请求的时间：
+        server_target - offset - RTT/2（提前半个往返，使请求恰好在目标时刻到达服务器）
+        """
+        return server_target - timedelta(seconds=self.offset + self.rtt / 2)
+
+
+def estimate_offset(samples: List[ClockSample]) -> Optional[ClockEstimate]:
+    """
+    由样本估计时钟偏移
+
+    Date 头只有秒级精度：服务器读到 D 时，真实服务器时间位于 [D, D+1)，
+    而这一刻对应的本地时间位于 [t0, t1]，因此每个样本都给出 offset 的一个区间
+    (D - t1, D + 1 - t0)。对 RTT 最小的若干样本求区间交集，取中点作为估计值。
+    交集为空（服务器时间抖动等）时退回到 RTT 最小样本的中点估计。
+    """
+    if not samples:
+        return None
+    min_rtt = min(s.rtt for s in samples)
+    good = [s for s in samples if s.rtt <= min_rtt * RTT_FILTER_RATIO + RTT_FILTER_SLACK]
+
+    lo = max(s.server_time - s.t1 for s in good)
+    hi = min(s.server_time + 1.0 - s.t0 for s in good)
+    if lo <= hi:
+        return ClockEstimate(offset=(lo + hi) / 2, rtt=min_rtt, error=(hi - lo) / 2, samples=len(good))
+
+    best = min(good, key=lambda s: s.rtt)
+    offset = best.server_time + 0.5 - (best.t0 + best.t1) / 2
+    return ClockEstimate(offset=offset, rtt=min_rtt, error=0.5 + min_rtt / 2, samples=1)
+
+
+class ClockSync:
+    """通过 CrazyRequests 采样服务器 Date 头并估计时钟偏移"""
+
+    def __init__(self, client, url: str = CLOCK_SYNC_URL, samples: int = 8):
+        self.client = client
+        self.url = url
+        self.n_samples = max(1, int(samples))
+        # 采样间隔错开整秒边界，交集区间才能收窄到毫秒级
+        self.spacing = 1.0 / self.n_samples + 0.013
+
+    def sample(self) -> Optional[ClockSample]:
+        t0 = time.time()
+        resp = self.client.head(self.url)
+        t1 = time.time()
+        date_header = resp.headers.get("Date")
+        if not date_header:
+            return None
+        try:
+            server_time = parsedate_to_datetime(date_header).timestamp()
+        except (TypeError, ValueError):
+            return None
+        return ClockSample(t0=t0, t1=t1, server_time=server_time)
+
+    def estimate(self) -> Optional[ClockEstimate]:
+        """采样并返回估计结果；没有任何有效样本时返回 None"""
+        samples: List[ClockSample] = []
+        for i in range(self.n_samples):
+            if i:
+                time.sleep(self.spacing)
+            try:
+                s = self.sample()
+            except Exception as e:
+                print(f"[ClockSync] [WARNING] 采样失败: {type(e).__name__}: {str(e)[:100]}")
+                continue
+            if s is not None:
+                samples.append(s)
+
+        est = estimate_offset(samples)
+        if est is None:
+            print("[ClockSync] [WARNING] 没有有效样本，继续使用本地时钟")
+        else:
+            print(f"[ClockSync] [OK] 偏移 {est.offset * 1000:+.1f} ms (±{est.error * 1000:.1f} ms)，"
+                  f"RTT {est.rtt * 1000:.1f} ms，有效样本 {est.samples}")
+        return est
+
+
+def align_fire_time(
+    client,
+    fire_at: datetime,
+    samples: int = 8,
+    stop_event: Optional[threading.Event] = None,
+    on_log: Callable[[str], None] = print,
+    lead: float = CLOCK_SYNC_LEAD,
+) -> Optional[datetime]:
+    """
+    目标时间按服务器时钟解释：到点前 lead 秒估计时钟偏移，
+    换算为本地应发出请求的时间。同步失败时沿用 fire_at，被取消时返回 None
+    """
+    stop_event = stop_event or threading.Event()
+    delay = (fire_at - datetime.now()).total_seconds() - lead
+    if delay > 0 and stop_event.wait(delay):
+        return None
+    try:
+        est = ClockSync(client, samples=samples).estimate()
+    except Exception as e:
+        on_log(f"时钟同步失败，使用本地时钟：{e}")
+        return fire_at
+    if est is None:
+        on_log("时钟同步无有效样本，使用本地时钟")
+        return fire_at
+    local_fire = est.local_fire_time(fire_at)
+    on_log(f"服务器时钟偏移 {est.offset * 1000:+.1f} ms（±{est.error * 1000:.1f} ms），"
+           f"RTT {est.rtt * 1000:.1f} ms，本地发出时间 {local_fire:%H:%M:%S.%f}")
+    return local_fire
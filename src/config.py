@@ -7,37 +7,46 @@
 from __future__ import annotations
 
 import os
-import sys
-import json
-import time
-import math
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional, Tuple
-
-from PySide6 import QtCore, QtGui, QtWidgets, QtNetwork
-
-try:
-    from PySide6.QtWebEngineWidgets import QWebEngineView
-    from PySide6.QtWebEngineCore import QWebEnginePage, QWebEngineProfile
-    WEBENGINE_AVAILABLE = True
-except ImportError:
-    WEBENGINE_AVAILABLE = False
+from typing import List
 
 import yaml
 
 # 导入常量和工具函数
-from constants import PLACES, REQUIRED_FIELDS
+from constants import PLACES
 from utils import app_base_dir
 
 CONFIG_FILE = os.path.join(app_base_dir(), "config.yaml")
 
+# 突发模式默认的错开偏移（毫秒，相对目标时间）
+DEFAULT_BURST_OFFSETS_MS = (-30, 0, 30, 60, 120)
+
 @dataclass
 class RequestItemData:
     place: str = PLACES[0]
     date: str = (date.today() + timedelta(days=1)).strftime("%Y-%m-%d")  # 默认：明天
     start: str = "19:00"
     end: str = "21:00"
+    # 首选地点被抢走时依次改抢的备选地点（完整地点名或通配符，如 "MPC4*（GP）"）
+    fallbacks: List[str] = field(default_factory=list)
+
+@dataclass
+class AccountProfile:
+    """额外的预订账号：独立的 Cookie 与个人信息，以及该账号要抢的时段（与主账号同时开抢）"""
+    name: str = ""
+    cookie: str = ""
+    user_id: str = ""
+    user_name: str = ""
+    user_email: str = ""
+    user_phone: str = ""
+    theme: str = ""  # 留空沿用主账号的主题
+    enabled: bool = True
+    requests: List[RequestItemData] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        return self.name or self.user_name or self.user_id
 
 @dataclass
 class AppConfig:
@@ -55,11 +64,69 @@ class AppConfig:
     user_phone: str = ""
     theme: str = "练琴"
 
+    # 连接池：重试复用长连接，避免每次请求重新 DNS+TCP+TLS
+    pool_size: int = 4
+    keep_alive: bool = True
+
+    # 连接预热：目标时间前 prewarm_seconds 秒建立 prewarm_connections 条连接并定时保活
+    prewarm_enabled: bool = True
+    prewarm_seconds: int = 15
+    prewarm_connections: int = 2
+    prewarm_ping_interval: float = 5.0
+
+    # 时钟同步：按服务器 Date 头估计时钟偏移，到点时刻以服务器时钟为准
+    clock_sync_enabled: bool = True
+    clock_sync_samples: int = 8
+
+    # 并发预订：同时在途的请求上限、对预订主机的限速（请求/秒，<=0 表示不限速）
+    max_concurrency: int = 4
+    rate_limit: float = 20.0
+
+    # 突发模式：到点时每个片段发出 burst_size 个请求，按 burst_offsets_ms（相对目标时间的毫秒偏移）错开；
+    # burst_budget 为每个片段的请求总数上限（含后续重试），0 表示不限
+    burst_size: int = 1
+    burst_offsets_ms: List[int] = None  # type: ignore
+    burst_budget: int = 0
+
+    # 重试策略：开抢后 retry_hot_window 秒内每 retry_hot_interval 秒重试，之后每 retry_interval 秒；
+    # 网络/服务器错误按指数退避（上限 retry_backoff_cap 秒），连续出错 retry_error_deadline 秒后放弃；
+    # retry_deadline 为总的放弃期限，0 表示不限
+    retry_hot_window: float = 5.0
+    retry_hot_interval: float = 0.05
+    retry_interval: float = 0.2
+    retry_backoff_cap: float = 5.0
+    retry_error_deadline: float = 60.0
+    retry_deadline: float = 0.0
+
+    # 启动时自动检测代理的总时限（秒）
+    proxy_detect_deadline: float = 6.0
+    # 线路检测结果的缓存有效期（秒）：网络未变化时跳过完整检测，只复核上次的线路；0 表示不缓存
+    route_cache_ttl: float = 86400.0
+
+    # 首轮请求预发送：到点前建立连接并写出除最后一个字节外的整个请求，到点只写出剩余字节
+    raw_sender: bool = False
+    # 用异步客户端（async_client，单个事件循环）发送预订请求，代替每个请求占用一个线程的 CrazyRequests
+    async_client: bool = False
+
+    # 房间占用查询接口（尚无核实过的地址，留空时房间占用一览与捡漏停用）与缓存有效期（秒）
+    occupancy_url: str = ""
+    occupancy_ttl: float = 60.0
+
+    # 捡漏：开抢结束后继续轮询没订到的时段；轮询间隔在最小与最大值之间自适应（秒）
+    watch_after_release: bool = False
+    sniper_min_interval: float = 2.0
+    sniper_max_interval: float = 30.0
+
+    # 额外账号：到点时与主账号的请求一起开抢，共用并发上限与限速，结果按账号汇报
+    profiles: List[AccountProfile] = field(default_factory=list)
+
     requests: List[RequestItemData] = None  # type: ignore
 
     def __post_init__(self):
         if self.requests is None:
             self.requests = [RequestItemData()]
+        if self.burst_offsets_ms is None:
+            self.burst_offsets_ms = list(DEFAULT_BURST_OFFSETS_MS)
 
 class ConfigManager:
     @staticmethod
@@ -84,6 +151,38 @@ class ConfigManager:
             user_email=raw.get("user_email", ""),
             user_phone=raw.get("user_phone", ""),
             theme=raw.get("theme", "练琴"),
+            pool_size=int(raw.get("pool_size", 4)),
+            keep_alive=bool(raw.get("keep_alive", True)),
+            prewarm_enabled=bool(raw.get("prewarm_enabled", True)),
+            prewarm_seconds=int(raw.get("prewarm_seconds", 15)),
+            prewarm_connections=int(raw.get("prewarm_connections", 2)),
+            prewarm_ping_interval=float(raw.get("prewarm_ping_interval", 5.0)),
+            clock_sync_enabled=bool(raw.get("clock_sync_enabled", True)),
+            clock_sync_samples=int(raw.get("clock_sync_samples", 8)),
+            max_concurrency=int(raw.get("max_concurrency", 4)),
+            rate_limit=float(raw.get("rate_limit", 20.0)),
+            burst_size=int(raw.get("burst_size", 1)),
+            burst_offsets_ms=[int(x) for x in raw.get("burst_offsets_ms") or DEFAULT_BURST_OFFSETS_MS],
+            burst_budget=int(raw.get("burst_budget", 0)),
+            retry_hot_window=float(raw.get("retry_hot_window", 5.0)),
+            retry_hot_interval=float(raw.get("retry_hot_interval", 0.05)),
+            retry_interval=float(raw.get("retry_interval", 0.2)),
+            retry_backoff_cap=float(raw.get("retry_backoff_cap", 5.0)),
+            retry_error_deadline=float(raw.get("retry_error_deadline", 60.0)),
+            retry_deadline=float(raw.get("retry_deadline", 0.0)),
+            proxy_detect_deadline=float(raw.get("proxy_detect_deadline", 6.0)),
+            route_cache_ttl=float(raw.get("route_cache_ttl", 86400.0)),
+            raw_sender=bool(raw.get("raw_sender", False)),
+            async_client=bool(raw.get("async_client", False)),
+            occupancy_url=raw.get("occupancy_url", ""),
+            occupancy_ttl=float(raw.get("occupancy_ttl", 60.0)),
+            watch_after_release=bool(raw.get("watch_after_release", False)),
+            sniper_min_interval=float(raw.get("sniper_min_interval", 2.0)),
+            sniper_max_interval=float(raw.get("sniper_max_interval", 30.0)),
+            profiles=[
+                AccountProfile(**{**p, "requests": [RequestItemData(**it) for it in p.get("requests") or []]})
+                for p in raw.get("profiles") or []
+            ],
             requests=reqs or [RequestItemData()],
         )
         return cfg
@@ -56,3 +56,6 @@ PLACES: List[str] = [
 # ---- 工具函数 ----
 # proxies 不再是必填项，因为直接连接（校园网内或 AnyConnect VPN）时不需要代理
 REQUIRED_FIELDS: Tuple[str, ...] = ("user_id", "user_password", "user_name", "user_email")
+
+# 房间占用查询接口尚未核实，config.yaml 中未填写 occupancy_url 时热力图与捡漏停用
+OCCUPANCY_DISABLED_HINT = "未配置 occupancy_url（房间占用查询接口），房间占用一览与捡漏已停用"
@@ -4,12 +4,32 @@ Dialogs package
 从 GUI.py 提取的对话框
 """
 
+import importlib.util
+
 from .settings_dialog import SettingsDialog
 from .cookie_dialog import CookieDialog
-from .auto_login_dialog import AutoLoginDialog
+from .occupancy_dialog import OccupancyDialog
 
 __all__ = [
     'SettingsDialog',
     'CookieDialog',
-    'AutoLoginDialog'
+    'AutoLoginDialog',
+    'OccupancyDialog',
+    'webengine_available',
 ]
+
+
+def webengine_available() -> bool:
+    """QtWebEngine 是否已安装（只查找模块，不加载）"""
+    try:
+        return importlib.util.find_spec("PySide6.QtWebEngineWidgets") is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def __getattr__(name):
+    # AutoLoginDialog 依赖 QtWebEngine（加载耗时明显），真正需要登录时才导入
+    if name == "AutoLoginDialog":
+        from .auto_login_dialog import AutoLoginDialog
+        return AutoLoginDialog
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
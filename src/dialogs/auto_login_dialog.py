@@ -6,16 +6,7 @@ AutoLoginDialog对话框
 
 from __future__ import annotations
 
-import os
-import sys
-import json
-import time
-import math
-from dataclasses import dataclass, asdict
-from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional, Tuple
-
-from PySide6 import QtCore, QtGui, QtWidgets, QtNetwork
+from PySide6 import QtCore, QtWidgets, QtNetwork
 
 try:
     from PySide6.QtWebEngineWidgets import QWebEngineView
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+OccupancyDialog对话框
+房间 × 半小时时段的占用热力图（数据来自 occupancy 查询与本程序的预订结果）
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+# 导入空闲索引
+from availability import OPEN_FROM, OPEN_UNTIL, SLOT_MINUTES, AvailabilityIndex
+
+# 导入配置管理
+from config import AppConfig
+
+# 导入占用数据获取
+from occupancy import OccupancyCache
+
+# 导入工具函数
+from utils import hhmm_to_minutes, minutes_to_hhmm
+
+# 导入后台线程
+from workers import OccupancyWorker
+
+BUSY_COLOR = QtGui.QColor("#e57373")
+FREE_COLOR = QtGui.QColor("#c8e6c9")
+UNKNOWN_COLOR = QtGui.QColor("#eeeeee")
+
+
+class OccupancyDialog(QtWidgets.QDialog):
+    def __init__(self, cfg: AppConfig, availability: AvailabilityIndex, cache: OccupancyCache, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("房间占用一览")
+        self.cfg = cfg
+        self.availability = availability
+        self.cache = cache
+        self.worker = None
+        # 已查询到数据的房间（按日期），其余房间显示为未知
+        self._known: Dict[date, set] = {}
+        self.resize(1100, 720)
+
+        self.date_edit = QtWidgets.QDateEdit(QtCore.QDate.currentDate().addDays(1))
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.setDisplayFormat("yyyy-MM-dd")
+        first = availability.start_date
+        self.date_edit.setDateRange(QtCore.QDate(first.year, first.month, first.day),
+                                    QtCore.QDate(first.year, first.month, first.day).addDays(availability.days - 1))
+
+        self.btn_refresh = QtWidgets.QPushButton("刷新")
+        self.status = QtWidgets.QLabel("")
+        self.status.setStyleSheet("color:#777;")
+
+        top = QtWidgets.QHBoxLayout()
+        top.addWidget(QtWidgets.QLabel("日期"))
+        top.addWidget(self.date_edit)
+        top.addWidget(self.btn_refresh)
+        top.addWidget(self.status, 1)
+
+        first_slot = hhmm_to_minutes(OPEN_FROM) // SLOT_MINUTES
+        last_slot = hhmm_to_minutes(OPEN_UNTIL) // SLOT_MINUTES
+        self._slots = list(range(first_slot, last_slot))
+        self.table = QtWidgets.QTableWidget(len(availability.places), len(self._slots))
+        self.table.setVerticalHeaderLabels(availability.places)
+        self.table.setHorizontalHeaderLabels([minutes_to_hhmm(s * SLOT_MINUTES) for s in self._slots])
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        self.table.verticalHeader().setDefaultSectionSize(18)
+
+        legend = QtWidgets.QLabel(
+            f"<span style='background:{BUSY_COLOR.name()}'>&nbsp;&nbsp;&nbsp;&nbsp;</span> 已占用　"
+            f"<span style='background:{FREE_COLOR.name()}'>&nbsp;&nbsp;&nbsp;&nbsp;</span> 空闲　"
+            f"<span style='background:{UNKNOWN_COLOR.name()}'>&nbsp;&nbsp;&nbsp;&nbsp;</span> 未查询"
+        )
+        legend.setTextFormat(QtCore.Qt.RichText)
+
+        lay = QtWidgets.QVBoxLayout(self)
+        lay.addLayout(top)
+        lay.addWidget(self.table, 1)
+        lay.addWidget(legend)
+
+        self.btn_refresh.clicked.connect(self.refresh)
+        self.date_edit.dateChanged.connect(lambda _: self.refresh())
+        self.refresh()
+
+    def current_day(self) -> date:
+        return self.date_edit.date().toPython()
+
+    def refresh(self):
+        """后台查询所选日期所有房间的占用（缓存有效期内不发请求），完成后重绘"""
+        if self.worker is not None and self.worker.isRunning():
+            return
+        day = self.current_day()
+        self.btn_refresh.setEnabled(False)
+        self.status.setText("正在查询…")
+        self.worker = OccupancyWorker(self.cfg, day, self.availability, self.cache, self)
+        self.worker.log.connect(self.status.setText)
+        self.worker.done.connect(lambda results, d=day: self._on_done(d, results))
+        self.worker.start()
+
+    def _on_done(self, day: date, results: dict):
+        self.btn_refresh.setEnabled(True)
+        self._known.setdefault(day, set()).update(results)
+        if not results:
+            self.status.setText("查询失败：请检查 Cookie、网络或占用接口设置")
+        if day == self.current_day():
+            self._render(day)
+
+    def _render(self, day: date):
+        busy = self.availability.occupancy(day, OPEN_FROM, OPEN_UNTIL)
+        known = self._known.get(day, set())
+        for row, place in enumerate(self.availability.places):
+            for col in range(len(self._slots)):
+                item = self.table.item(row, col)
+                if item is None:
+                    item = QtWidgets.QTableWidgetItem()
+                    self.table.setItem(row, col, item)
+                if busy[row, col]:
+                    item.setBackground(BUSY_COLOR)
+                elif place in known:
+                    item.setBackground(FREE_COLOR)
+                else:
+                    item.setBackground(UNKNOWN_COLOR)
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.wait(2000)
+        super().closeEvent(event)
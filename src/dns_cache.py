@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+DNS 固定与多地址竞速连接
+到点前由预热线程解析预订主机并固定（pin）结果，开抢窗口内建连直接使用固定的地址，热路径上不再查询 DNS；
+固定的结果在 pin_ttl 秒后过期（下一次开抢由预热线程重新固定），没有固定的主机每次建连照常解析，不会被自动固定。
+建连时按 Happy Eyeballs（RFC 8305）的方式错开竞速多个 IPv4/IPv6 地址，先连上者胜出，
+并记录每个 IP 的建连耗时，下次优先尝试最快的地址。
+"""
+
+from __future__ import annotations
+
+import errno
+import ipaddress
+import selectors
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 后一个地址相对前一个的启动延迟（RFC 8305 建议 250ms）
+RACE_STAGGER = 0.25
+
+# 建连耗时的指数滑动平均系数
+LATENCY_ALPHA = 0.3
+
+# 固定的解析结果的有效期（秒）：覆盖预热到开抢、重试结束的整个窗口
+PIN_TTL = 120.0
+
+# 连接失败的地址在这段时间内排到最后
+FAILURE_PENALTY_SECONDS = 60.0
+
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, getattr(errno, "WSAEWOULDBLOCK", -1)}
+
+AddrInfo = Tuple[int, int, int, str, tuple]
+
+
+@dataclass
+class AddressStats:
+    """单个 IP 的建连统计"""
+    latency: Optional[float] = None  # 建连耗时的滑动平均（秒）
+    successes: int = 0
+    failures: int = 0
+    last_failure: float = 0.0
+
+    def record(self, latency: Optional[float], now: float):
+        if latency is None:
+            self.failures += 1
+            self.last_failure = now
+            return
+        self.successes += 1
+        self.latency = latency if self.latency is None else (
+            LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency)
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+
+def _interleave(infos: Sequence[AddrInfo]) -> List[AddrInfo]:
+    """IPv6 / IPv4 地址交替排列（RFC 8305 第 4 节）"""
+    v6 = [i for i in infos if i[0] == socket.AF_INET6]
+    v4 = [i for i in infos if i[0] != socket.AF_INET6]
+    out: List[AddrInfo] = []
+    for k in range(max(len(v6), len(v4))):
+        out.extend(group[k] for group in (v6, v4) if k < len(group))
+    return out
+
+
+class DnsCache:
+    """
+    进程内的解析缓存与按 IP 的建连统计
+
+    :param stagger: 竞速时相邻地址的启动间隔（秒）
+    :param pin_ttl: 固定的解析结果的有效期（秒），0 表示不过期
+    :param clock: 单调时钟（秒），测试时可替换
+    """
+
+    def __init__(self, stagger: float = RACE_STAGGER, pin_ttl: float = PIN_TTL, clock=time.monotonic):
+        self.stagger = stagger
+        self.pin_ttl = pin_ttl
+        self.clock = clock
+        self._pinned: Dict[Tuple[str, int], Tuple[List[AddrInfo], float]] = {}
+        self._stats: Dict[str, AddressStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def resolve(host: str, port: int) -> List[AddrInfo]:
+        """解析 host:port，去重后 IPv6 / IPv4 交替排列"""
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        # 同一地址可能因 proto 不同重复出现
+        return _interleave(list({info[4][:2]: info for info in infos}.values()))
+
+    def pin(self, host: str, port: int) -> List[AddrInfo]:
+        """解析并固定 host:port 的地址（到点前由预热线程调用，覆盖之前的结果，pin_ttl 秒后过期）"""
+        infos = self.resolve(host, port)
+        with self._lock:
+            self._pinned[(host, port)] = (infos, self.clock())
+        return infos
+
+    def unpin(self, host: str, port: int):
+        with self._lock:
+            self._pinned.pop((host, port), None)
+
+    def clear(self):
+        with self._lock:
+            self._pinned.clear()
+            self._stats.clear()
+
+    def pinned(self, host: str, port: int) -> Optional[List[AddrInfo]]:
+        """未过期的固定地址；没有固定或已过期时返回 None（过期的结果随即丢弃）"""
+        with self._lock:
+            entry = self._pinned.get((host, port))
+            if entry is None:
+                return None
+            infos, pinned_at = entry
+            if self.pin_ttl > 0 and not 0 <= self.clock() - pinned_at < self.pin_ttl:
+                del self._pinned[(host, port)]
+                return None
+            return infos
+
+    def lookup(self, host: str, port: int) -> List[AddrInfo]:
+        """返回按优先级排序的候选地址；没有固定（或已过期）时同步解析，但不固定"""
+        infos = self.pinned(host, port)
+        if infos is None:
+            infos = self.resolve(host, port)
+        return self._order(infos)
+
+    def _order(self, infos: List[AddrInfo]) -> List[AddrInfo]:
+        """健康且测过速的地址按耗时升序，其次未测过的地址（保持交替顺序），最近失败过的排最后"""
+        now = self.clock()
+        with self._lock:
+            stats = {info[4][0]: self._stats.get(info[4][0]) for info in infos}
+
+        def key(item):
+            index, info = item
+            st = stats[info[4][0]]
+            if st is None:
+                return 1, 0.0, index
+            if st.failures and now - st.last_failure < FAILURE_PENALTY_SECONDS:
+                return 2, 0.0, index
+            if st.latency is None:
+                return 1, 0.0, index
+            return 0, st.latency, index
+
+        return [info for _, info in sorted(enumerate(infos), key=key)]
+
+    def record(self, ip: str, latency: Optional[float]):
+        """记录一次建连结果；latency 为 None 表示失败"""
+        with self._lock:
+            self._stats.setdefault(ip, AddressStats()).record(latency, self.clock())
+
+    def stats(self) -> Dict[str, AddressStats]:
+        with self._lock:
+            return {ip: AddressStats(**vars(st)) for ip, st in self._stats.items()}
+
+    def connect(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        source_address: Optional[tuple] = None,
+        socket_options: Optional[Sequence[tuple]] = None,
+    ) -> socket.socket:
+        """
+        建立到 host:port 的 TCP 连接（与 socket.create_connection 语义一致）
+        候选地址每隔 stagger 秒启动一个，第一个连上的胜出，其余关闭
+        """
+        if _is_ip(host):
+            infos = socket.getaddrinfo(host.strip("[]"), port, type=socket.SOCK_STREAM)[:1]
+        else:
+            infos = self.lookup(host, port)
+        if not infos:
+            raise OSError(f"getaddrinfo returns an empty list for {host}")
+
+        sel = selectors.DefaultSelector()
+        queue = list(infos)
+        pending: Dict[socket.socket, Tuple[str, float]] = {}
+        last_error: Optional[OSError] = None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        next_start = time.monotonic()
+        try:
+            while queue or pending:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    raise socket.timeout("timed out")
+
+                if queue and (now >= next_start or not pending):
+                    family, socktype, proto, _, sockaddr = queue.pop(0)
+                    sock = socket.socket(family, socktype, proto)
+                    try:
+                        for opt in socket_options or ():
+                            sock.setsockopt(*opt)
+                        if source_address:
+                            sock.bind(source_address)
+                        sock.setblocking(False)
+                        err = sock.connect_ex(sockaddr)
+                    except OSError as e:
+                        sock.close()
+                        last_error = e
+                        continue
+                    if err and err not in _IN_PROGRESS:
+                        sock.close()
+                        self.record(sockaddr[0], None)
+                        last_error = OSError(err, f"connect to {sockaddr[0]} failed")
+                        continue
+                    sel.register(sock, selectors.EVENT_WRITE)
+                    pending[sock] = (sockaddr[0], now)
+                    next_start = now + self.stagger
+                    continue
+
+                waits = [t for t in (next_start if queue else None, deadline) if t is not None]
+                wait = max(0.0, min(waits) - now) if waits else None
+                for key, _ in sel.select(wait):
+                    sock = key.fileobj
+                    ip, started = pending.pop(sock)
+                    sel.unregister(sock)
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if err:
+                        sock.close()
+                        self.record(ip, None)
+                        last_error = OSError(err, f"connect to {ip} failed")
+                        # 失败后立即启动下一个候选，不再等 stagger
+                        next_start = time.monotonic()
+                        continue
+                    self.record(ip, time.monotonic() - started)
+                    sock.setblocking(True)
+                    sock.settimeout(timeout)
+                    return sock
+            raise last_error or OSError(f"无法连接到 {host}:{port}")
+        finally:
+            for sock in pending:
+                sel.unregister(sock)
+                sock.close()
+            sel.close()
+
+
+# 进程内共享：所有 CrazyRequests 实例共用解析结果与地址统计
+DNS_CACHE = DnsCache()
@@ -1,118 +1,377 @@
+import json
+import re
+import socket
+import sys
 import uuid
 import threading
+import time
 from datetime import datetime
+from urllib.parse import urlencode, urlsplit
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.timeout import _DEFAULT_TIMEOUT
+
+from scheduler import PrecisionTimer
+from retry_policy import BookingResult, BookingStatus
+from dns_cache import DNS_CACHE
+from tls_policy import TLS_POLICY, ssl_context
+
+
+# 预订接口
+BOOK_URL = "https://booking.cuhk.edu.cn/a/field/book/bizFieldBookMain/saveData"
+EXTEND1 = "af15efadc379429885681cbad7b1ec12"
+RULE_ID = "4b4d6e5c826c425b9a5ed7a02a46656a"
+
+# 与浏览器一致的 User-Agent
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0"
+
+# 连接池默认参数：同一 session 内的重试复用已建立的 TCP/TLS 连接
+DEFAULT_POOL_SIZE = 4
+DEFAULT_KEEP_ALIVE = True
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    带连接计数的连接池适配器
+    urllib3 在连接被对端关闭后会复用同一个连接对象重新 connect()，
+    因此按 connect() 调用计数才能准确反映握手次数
+
+    resolver 不为空时，建连改用其固定的解析结果并在多个地址间竞速（见 dns_cache）
+    """
+
+    def __init__(self, *args, resolver=None, **kwargs):
+        self.resolver = resolver
+        self._stats_lock = threading.Lock()
+        self._n_requests = 0
+        self._n_connections = 0
+        self._n_tls_full = 0
+        self._n_tls_resumed = 0
+        super().__init__(*args, **kwargs)
+
+    def _on_connect(self):
+        with self._stats_lock:
+            self._n_connections += 1
+
+    def _on_connected(self, sock):
+        # 区分 TLS 完整握手与会话复用（明文连接不计）
+        reused = getattr(sock, "session_reused", None)
+        if reused is None:
+            return
+        with self._stats_lock:
+            if reused:
+                self._n_tls_resumed += 1
+            else:
+                self._n_tls_full += 1
+
+    def _install_pool_classes(self, manager):
+        adapter = self
+
+        def counting(pool_cls):
+            class _CountingConnection(pool_cls.ConnectionCls):
+                def connect(self):
+                    adapter._on_connect()
+                    result = super().connect()
+                    adapter._on_connected(self.sock)
+                    return result
+
+                def _new_conn(self):
+                    if adapter.resolver is None:
+                        return super()._new_conn()
+                    # 与 urllib3 的 _new_conn 相同，只是把 create_connection 换成固定地址 + 竞速
+                    timeout = socket.getdefaulttimeout() if self.timeout is _DEFAULT_TIMEOUT else self.timeout
+                    try:
+                        sock = adapter.resolver.connect(
+                            self._dns_host,
+                            self.port,
+                            timeout,
+                            source_address=self.source_address,
+                            socket_options=self.socket_options,
+                        )
+                    except socket.gaierror as e:
+                        raise NameResolutionError(self.host, self, e) from e
+                    except socket.timeout as e:
+                        raise ConnectTimeoutError(
+                            self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+                        ) from e
+                    except OSError as e:
+                        raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+                    sys.audit("http.client.connect", self, self.host, self.port)
+                    return sock
+
+            return type(pool_cls.__name__, (pool_cls,), {"ConnectionCls": _CountingConnection})
+
+        manager.pool_classes_by_scheme = {
+            "http": counting(HTTPConnectionPool),
+            "https": counting(HTTPSConnectionPool),
+        }
+        return manager
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self._install_pool_classes(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        is_new = proxy not in self.proxy_manager
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if is_new:
+            self._install_pool_classes(manager)
+        return manager
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        # 每种验证策略共用一个预先构建的 SSLContext，新连接不再各自加载 CA 证书包
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        if host_params["scheme"] == "https":
+            pool_kwargs["ssl_context"] = ssl_context(verify is not False)
+        return host_params, pool_kwargs
+
+    def cert_verify(self, conn, url, verify, cert):
+        super().cert_verify(conn, url, verify, cert)
+        # CA 已在共享 SSLContext 中，不再给连接池设置 ca_certs（否则每次建连都会重新加载）
+        if verify is True:
+            conn.ca_certs = None
+            conn.ca_cert_dir = None
+
+    def send(self, request, **kwargs):
+        with self._stats_lock:
+            self._n_requests += 1
+        return super().send(request, **kwargs)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            n_requests, n_connections = self._n_requests, self._n_connections
+            n_tls_full, n_tls_resumed = self._n_tls_full, self._n_tls_resumed
+        return {
+            "requests": n_requests,
+            "connections": n_connections,
+            "handshakes_avoided": max(0, n_requests - n_connections),
+            "tls_full_handshakes": n_tls_full,
+            "tls_resumed": n_tls_resumed,
+        }
 
 
 class CrazyRequests:
 
-    def __init__(self, proxies: dict | None = None, cookie: str = ""):
+    def __init__(
+        self,
+        proxies: dict | None = None,
+        cookie: str = "",
+        pool_size: int = DEFAULT_POOL_SIZE,
+        keep_alive: bool = DEFAULT_KEEP_ALIVE,
+    ):
         # 处理代理配置
         # None 或空字典 {} 表示直接连接（不使用任何代理）
         # 非空字典表示使用指定的代理
         self.proxies = proxies
         self.use_proxy = proxies is not None and len(proxies) > 0
+        self.pool_size = max(1, int(pool_size))
+        self.keep_alive = keep_alive
 
         # 创建 session 以便更好地控制连接行为
         self.session = requests.Session()
         self.session.headers.update({
             "Cookie": cookie,
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36 Edg/140.0.0.0",
+            "User-Agent": USER_AGENT,
         })
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+        # 连接池：pool_maxsize 为每个主机可保持的空闲连接数，重试时不再重新握手
+        # max_retries=0：重试由上层循环负责，避免 urllib3 内部静默重连
+        # resolver：建连使用进程内固定的 DNS 结果，多地址竞速（代理模式下解析的是代理主机）
+        self.adapter = PooledAdapter(pool_maxsize=self.pool_size, max_retries=0, resolver=DNS_CACHE)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
 
         # 如果不使用代理，禁用环境变量检测，确保直接连接
         if not self.use_proxy:
             self.session.trust_env = False  # 忽略环境变量中的代理设置
 
-    def get(self, url, params: dict | None = None):
-        # 直接连接时，先尝试启用 SSL 验证，如果失败则尝试禁用
+    def _send(self, method: str, url, verify: bool, **kwargs):
+        return self.session.request(
+            method,
+            url,
+            proxies={"http": None, "https": None},
+            verify=verify,
+            timeout=10,
+            **kwargs,
+        )
+
+    def _request(self, method: str, url, **kwargs):
+        # 直接连接时，按主机缓存的策略决定是否验证 SSL；未知时先尝试验证，失败则降级并记住结果
         if not self.use_proxy:
+            host = urlsplit(url).hostname or ""
+            verify = TLS_POLICY.get(host)
+            if verify is False:
+                try:
+                    return self._send(method, url, verify=False, **kwargs)
+                except requests.exceptions.SSLError as e:
+                    print(f"[CrazyRequests] 禁用SSL验证后仍然失败: {type(e).__name__}: {e}")
+                    raise IOError(f"无法连接到服务器（SSL握手失败）。请尝试使用代理（Reqable）。详细错误: {e}")
+
             # 尝试1：启用SSL验证
             try:
-                return self.session.get(
-                    url,
-                    params=params,
-                    proxies={"http": None, "https": None},
-                    verify=True,
-                    timeout=10,
-                )
+                response = self._send(method, url, verify=True, **kwargs)
             except requests.exceptions.SSLError as ssl_err:
-                # SSL 错误，尝试禁用验证
+                # SSL 错误，记住该主机需要禁用验证，之后的请求不再先失败一次
                 print(f"[CrazyRequests] SSL验证失败，尝试禁用验证: {str(ssl_err)[:100]}")
+                TLS_POLICY.set(host, False)
                 try:
-                    return self.session.get(
-                        url,
-                        params=params,
-                        proxies={"http": None, "https": None},
-                        verify=False,
-                        timeout=10,
-                    )
+                    return self._send(method, url, verify=False, **kwargs)
                 except Exception as e:
                     # 禁用验证仍然失败，可能是SSL握手问题，抛出详细错误
                     print(f"[CrazyRequests] 禁用SSL验证后仍然失败: {type(e).__name__}: {e}")
                     raise IOError(f"无法连接到服务器（SSL握手失败）。请尝试使用代理（Reqable）。详细错误: {e}")
+            if verify is None:
+                TLS_POLICY.set(host, True)
+            return response
         else:
             # 使用代理时直接禁用 SSL 验证
-            return self.session.get(
+            return self.session.request(
+                method,
                 url,
-                params=params,
                 proxies=self.proxies,
                 verify=False,
                 timeout=10,
+                **kwargs,
             )
 
+    def get(self, url, params: dict | None = None, headers: dict | None = None):
+        return self._request("GET", url, params=params, headers=headers)
+
+    def head(self, url, params: dict | None = None):
+        # 不跟随重定向：预热与对时只需要这一跳的连接与 Date 头（跳到登录主机会预热错误的连接、多算一个往返）
+        return self._request("HEAD", url, params=params, allow_redirects=False)
+
     def post(
         self,
         url,
         params: dict | None = None,
-        data: dict | None = None,
+        data: dict | bytes | None = None,
         json: dict | None = None,
     ):
-        # 直接连接时，先尝试启用 SSL 验证，如果失败则尝试禁用
-        if not self.use_proxy:
-            # 尝试1：启用SSL验证
-            try:
-                return self.session.post(
-                    url,
-                    params=params,
-                    data=data,
-                    json=json,
-                    proxies={"http": None, "https": None},
-                    verify=True,
-                    timeout=10,
-                )
-            except requests.exceptions.SSLError as ssl_err:
-                # SSL 错误，尝试禁用验证
-                print(f"[CrazyRequests] SSL验证失败，尝试禁用验证: {str(ssl_err)[:100]}")
-                try:
-                    return self.session.post(
-                        url,
-                        params=params,
-                        data=data,
-                        json=json,
-                        proxies={"http": None, "https": None},
-                        verify=False,
-                        timeout=10,
-                    )
-                except Exception as e:
-                    # 禁用验证仍然失败，可能是SSL握手问题，抛出详细错误
-                    print(f"[CrazyRequests] 禁用SSL验证后仍然失败: {type(e).__name__}: {e}")
-                    raise IOError(f"无法连接到服务器（SSL握手失败）。请尝试使用代理（Reqable）。详细错误: {e}")
-        else:
-            # 使用代理时直接禁用 SSL 验证
-            return self.session.post(
-                url,
-                params=params,
-                data=data,
-                json=json,
-                proxies=self.proxies,
-                verify=False,
-                timeout=10,
-            )
+        # 预编码的表单字节串需要显式声明 Content-Type（dict 表单由 requests 自动设置）
+        headers = {"Content-Type": FORM_CONTENT_TYPE} if isinstance(data, bytes) else None
+        return self._request("POST", url, params=params, data=data, json=json, headers=headers)
 
+    def stats(self) -> dict:
+        """
+        连接复用统计
 
-def book(
-    cookie: str,
+        returns:
+            dict: requests 为发出的请求数，connections 为实际建立的连接数（每次都要 DNS+TCP+TLS），
+                  handshakes_avoided 为复用已有连接而省下的握手次数，
+                  tls_full_handshakes / tls_resumed 为新连接中 TLS 完整握手与会话复用的次数
+        """
+        return self.adapter.stats()
+
+    def close(self):
+        self.session.close()
+
+
+# ---- 长连接客户端注册表：相同 proxies + cookie 共用一个连接池 ----
+_CLIENTS: dict = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _client_key(proxies: dict | None, cookie: str) -> tuple:
+    return tuple(sorted((proxies or {}).items())), cookie
+
+
+def get_client(
+    proxies: dict | None = None,
+    cookie: str = "",
+    pool_size: int = DEFAULT_POOL_SIZE,
+    keep_alive: bool = DEFAULT_KEEP_ALIVE,
+) -> CrazyRequests:
+    """
+    获取（或创建）与 proxies + cookie 对应的长连接客户端
+    已有客户端的连接池不小于 pool_size 时直接复用（不缩小，不关闭其中已预热的连接）；
+    需要更大的连接池或 keep_alive 不同时才关闭旧客户端并重建
+    """
+    key = _client_key(proxies, cookie)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is not None and (client.pool_size < max(1, int(pool_size)) or client.keep_alive != keep_alive):
+            client.close()
+            client = None
+        if client is None:
+            client = CrazyRequests(proxies=proxies, cookie=cookie, pool_size=pool_size, keep_alive=keep_alive)
+            _CLIENTS[key] = client
+        return client
+
+
+def release_client(proxies: dict | None, cookie: str):
+    """关闭并移除与 proxies + cookie 对应的客户端（Cookie 更新后旧 Cookie 的连接池不再使用）"""
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.pop(_client_key(proxies, cookie), None)
+    if client is not None:
+        client.close()
+
+
+def close_clients():
+    """关闭注册表中的所有客户端（释放空闲连接）"""
+    with _CLIENTS_LOCK:
+        for client in _CLIENTS.values():
+            client.close()
+        _CLIENTS.clear()
+
+
+# 地点 -> 场地 FId（模块级常量，避免每次预订都重建字典）
+FID_MAP = {
+    "MPC319 管弦乐学部": "0bf599e78f3a46dda05e65cd8fd4f61a",
+    "MPC320 管弦乐学部": "117da0ca23dd4ff4860dff461e9d6ff4",
+    "MPC321 室内乐琴房（GP）": "76e34000bc5348598a705ae483005308",
+    "MPC322 室内乐琴房（UP）": "f02f83d544f4490f8237c869eee87913",
+    "MPC323 管弦乐学部琴房": "a73c09fc1dd74ee7a495edae53b7c2f0",
+    "MPC324 管弦乐学部琴房": "62508f2d7a91455fad00839609b1c63b",
+    "MPC325 管弦乐学部琴房（UP）": "28209733f1be415383f16a253737f2db",
+    "MPC326 管弦乐学部琴房（UP）": "af3b514fb3f5490ead315a4152df6abd",
+    "MPC327 管弦乐学部琴房（UP）": "34d88aa5f4fd476ab013dcc561ee1063",
+    "MPC328 管弦乐学部琴房（UP）": "1ab85f1a6dc44474ae8bad97a55097e9",
+    "MPC329 管弦乐学部琴房（UP）": "d828d19e79604c3cb02040576bd23104",
+    "MPC334 室内乐琴房（GP）": "dc4f0f555ac34e5e8c659b71887e9743",
+    "MPC335 管弦乐学部琴房": "2a695052a7ce4d11aa0e23b96194ec32",
+    "MPC336 管弦乐学部琴房": "032bba7d83ff4a20a4ab74f9343f3b82",
+    "MPC337 管弦乐学部琴房": "7c410dcf1a1747d2b3e35d1e16b9894e",
+    "MPC401 管弦乐学部琴房": "b67000e23c27464386ee417d3851aa00",
+    "MPC402 管弦乐学部琴房": "f69d6cf620d149e2bc1800a2c61d1843",
+    "MPC403 管弦乐学部琴房": "e5cd05208c7343148050fbc54c9df753",
+    "MPC404 管弦乐学部琴房": "07b0c915577049e786ce4608b419a56f",
+    "MPC405 管弦乐学部琴房": "ce111f3b2d5e481abd10ed03d15dc282",
+    "MPC406 管弦乐学部琴房（UP）": "eec8bb6419c04d3581264b1497f70248",
+    "MPC407 管弦乐学部琴房": "2f446f29b3cf456aac29d260b883380d",
+    "MPC408 管弦乐学部琴房（UP）": "9aac575aab0b4c76a7b5e009d745eadd",
+    "MPC409 管弦乐学部琴房（UP）": "8d84d1b18a6141cdbf2513b4bdfe68ba",
+    "MPC410 管弦乐学部琴房": "5da100f8db6f449c97ba445c0bfe8eb6",
+    "MPC411 管弦乐学部琴房": "fda92551c763443abc5e0c189295512c",
+    "MPC412 室内乐琴房（GP）": "1c89c2dacef342e7be2b37c98c275236",
+    "MPC413 室内乐琴房（UP）": "da7a15b42471405bb0af3bfa5e7f7238",
+    "MPC414 管弦乐学部琴房": "c3327b0749e545d7b64516a682e18189",
+    "MPC415 管弦乐学部琴房（UP）": "6d782a5fe1054a32bb6ae4b135648593",
+    "MPC416 管弦乐学部琴房": "68e84f84eee1461a8e9dfe9ed5b4c5b1",
+    "MPC417 管弦乐学部琴房（UP）": "a2cf5f7eea204adabb1b644f99e1d9bc",
+    "MPC418 管弦乐学部琴房（GP）": "55590a8d83f84744bb11634fc2d7738e",
+    "MPC419 管弦乐学部琴房（GP）": "b2892c0e12f94b4ca36a3618bd33628c",
+    "MPC420 管弦乐学部琴房（GP）": "0cbb5a428d484333b52f904e534444af",
+    "MPC421 管弦乐学部琴房": "d15552be0d9849eb8549d1a63b2e862e",
+    "MPC422 管弦乐学部琴房（GP）": "bb9b779bf79c416c905149dd21e47bc4",
+    "MPC423 管弦乐学部琴房": "b36918432d2246859761f7e0c0eb147b",
+    "MPC424 管弦乐学部琴房（GP）": "0041a2034f7348e7a2a5cd279c5d5d93",
+    "MPC425 室内乐琴房（GP）": "487eade0fb874e6e8962cc8f75b3f7bb",
+    "MPC426 管弦乐学部琴房": "b7a5fcb27c054d55a712f2993cd04d07",
+    "MPC427 管弦乐学部琴房": "6ba6de4ea11246d185485b52637d362b",
+    "MPC428 管弦乐学部琴房": "56bfa46d5390495e826f017da64edc6c",
+    "MPC429 管弦乐学部琴房": "de003fd87e844066b952800365abac8d",
+    "MPC430 管弦乐学部琴房": "4b7c0c08d5ee45a09ba94dba907159cd",
+    "MPC518 室内乐琴房（Double GP）": "9fa74f29bc8b494dacbecffa1a39ba0f",
+    "MPC519 室内乐琴房（Double GP）": "eabe116377d5454981ae80af5dd13616",
+    "MPC524室内乐琴房（Double GP）": "91bbe4ac68d04025bef15eb76abe5a3d",
+}
+
+
+def build_book_form(
     user_id: str,
     user_name: str,
     place: str,
@@ -121,92 +380,23 @@ def book(
     user_email: str = "example@link.cuhk.edu.cn",
     user_phone: str = "123456",
     theme: str = "练琴",
-    proxies: dict | None = None,
-) -> str:
-    """预定
-
-    Args:
-        user_id (str): 学号
-        user_name (str): 姓名
-        user_email (str): 邮箱
-        user_phone (str): 电话
-        theme (str): 预定主题
-        place (str): 预定地点, 必须是 FID_MAP 的 key 之一
-        start_time (str): 开始时间, 格式 "2025-09-12 18:30"
-        end_time (str): 结束时间, 格式 "2025-09-12 19:00"
-
-    returns:
-        str: 预定结果
+    book_id: str | None = None,
+    field_id: str | None = None,
+) -> dict | None:
+    """
+    构建 saveData 表单（同步/异步客户端共用）；place 不在 FID_MAP 中时返回 None
+    book_id / field_id 为空时各生成一个新的 UUID
     """
-    EXTEND1 = "af15efadc379429885681cbad7b1ec12"
-    RULE_ID = "4b4d6e5c826c425b9a5ed7a02a46656a"
-
-    FID_MAP = {
-        "MPC319 管弦乐学部": "0bf599e78f3a46dda05e65cd8fd4f61a",
-        "MPC320 管弦乐学部": "117da0ca23dd4ff4860dff461e9d6ff4",
-        "MPC321 室内乐琴房（GP）": "76e34000bc5348598a705ae483005308",
-        "MPC322 室内乐琴房（UP）": "f02f83d544f4490f8237c869eee87913",
-        "MPC323 管弦乐学部琴房": "a73c09fc1dd74ee7a495edae53b7c2f0",
-        "MPC324 管弦乐学部琴房": "62508f2d7a91455fad00839609b1c63b",
-        "MPC325 管弦乐学部琴房（UP）": "28209733f1be415383f16a253737f2db",
-        "MPC326 管弦乐学部琴房（UP）": "af3b514fb3f5490ead315a4152df6abd",
-        "MPC327 管弦乐学部琴房（UP）": "34d88aa5f4fd476ab013dcc561ee1063",
-        "MPC328 管弦乐学部琴房（UP）": "1ab85f1a6dc44474ae8bad97a55097e9",
-        "MPC329 管弦乐学部琴房（UP）": "d828d19e79604c3cb02040576bd23104",
-        "MPC334 室内乐琴房（GP）": "dc4f0f555ac34e5e8c659b71887e9743",
-        "MPC335 管弦乐学部琴房": "2a695052a7ce4d11aa0e23b96194ec32",
-        "MPC336 管弦乐学部琴房": "032bba7d83ff4a20a4ab74f9343f3b82",
-        "MPC337 管弦乐学部琴房": "7c410dcf1a1747d2b3e35d1e16b9894e",
-        "MPC401 管弦乐学部琴房": "b67000e23c27464386ee417d3851aa00",
-        "MPC402 管弦乐学部琴房": "f69d6cf620d149e2bc1800a2c61d1843",
-        "MPC403 管弦乐学部琴房": "e5cd05208c7343148050fbc54c9df753",
-        "MPC404 管弦乐学部琴房": "07b0c915577049e786ce4608b419a56f",
-        "MPC405 管弦乐学部琴房": "ce111f3b2d5e481abd10ed03d15dc282",
-        "MPC406 管弦乐学部琴房（UP）": "eec8bb6419c04d3581264b1497f70248",
-        "MPC407 管弦乐学部琴房": "2f446f29b3cf456aac29d260b883380d",
-        "MPC408 管弦乐学部琴房（UP）": "9aac575aab0b4c76a7b5e009d745eadd",
-        "MPC409 管弦乐学部琴房（UP）": "8d84d1b18a6141cdbf2513b4bdfe68ba",
-        "MPC410 管弦乐学部琴房": "5da100f8db6f449c97ba445c0bfe8eb6",
-        "MPC411 管弦乐学部琴房": "fda92551c763443abc5e0c189295512c",
-        "MPC412 室内乐琴房（GP）": "1c89c2dacef342e7be2b37c98c275236",
-        "MPC413 室内乐琴房（UP）": "da7a15b42471405bb0af3bfa5e7f7238",
-        "MPC414 管弦乐学部琴房": "c3327b0749e545d7b64516a682e18189",
-        "MPC415 管弦乐学部琴房（UP）": "6d782a5fe1054a32bb6ae4b135648593",
-        "MPC416 管弦乐学部琴房": "68e84f84eee1461a8e9dfe9ed5b4c5b1",
-        "MPC417 管弦乐学部琴房（UP）": "a2cf5f7eea204adabb1b644f99e1d9bc",
-        "MPC418 管弦乐学部琴房（GP）": "55590a8d83f84744bb11634fc2d7738e",
-        "MPC419 管弦乐学部琴房（GP）": "b2892c0e12f94b4ca36a3618bd33628c",
-        "MPC420 管弦乐学部琴房（GP）": "0cbb5a428d484333b52f904e534444af",
-        "MPC421 管弦乐学部琴房": "d15552be0d9849eb8549d1a63b2e862e",
-        "MPC422 管弦乐学部琴房（GP）": "bb9b779bf79c416c905149dd21e47bc4",
-        "MPC423 管弦乐学部琴房": "b36918432d2246859761f7e0c0eb147b",
-        "MPC424 管弦乐学部琴房（GP）": "0041a2034f7348e7a2a5cd279c5d5d93",
-        "MPC425 室内乐琴房（GP）": "487eade0fb874e6e8962cc8f75b3f7bb",
-        "MPC426 管弦乐学部琴房": "b7a5fcb27c054d55a712f2993cd04d07",
-        "MPC427 管弦乐学部琴房": "6ba6de4ea11246d185485b52637d362b",
-        "MPC428 管弦乐学部琴房": "56bfa46d5390495e826f017da64edc6c",
-        "MPC429 管弦乐学部琴房": "de003fd87e844066b952800365abac8d",
-        "MPC430 管弦乐学部琴房": "4b7c0c08d5ee45a09ba94dba907159cd",
-        "MPC518 室内乐琴房（Double GP）": "9fa74f29bc8b494dacbecffa1a39ba0f",
-        "MPC519 室内乐琴房（Double GP）": "eabe116377d5454981ae80af5dd13616",
-        "MPC524室内乐琴房（Double GP）": "91bbe4ac68d04025bef15eb76abe5a3d",
-    }
-
     if place not in FID_MAP:
-        return "地点错误"
-
-    url = "https://booking.cuhk.edu.cn/a/field/book/bizFieldBookMain/saveData"
+        return None
 
-    # ruleId 固定
-    params = {"reBookMainId": "", "ruleId": RULE_ID}
-
-    s = uuid.uuid4().hex
+    s = book_id or uuid.uuid4().hex
     data = {
         "id": s,
         "user.id": user_id,
         "userOrgId": "",
         "approvalFlag": "0",
-        "bizFieldBookField.id": uuid.uuid4().hex,
+        "bizFieldBookField.id": field_id or uuid.uuid4().hex,
         "bizFieldBookField.FId": FID_MAP[place],
         "bizFieldBookField.BId": s,
         "bizFieldBookField.theme": theme,
@@ -230,17 +420,162 @@ def book(
         "extend16": "0",
         "bizFieldBookField.useDesc": "1",
     }
+    return data
+
+
+# 模板中 UUID 的占位符（32 位十六进制，与真实 UUID 等长，url 编码后保持不变）
+_BOOK_ID_SLOT = "b" * 32
+_FIELD_ID_SLOT = "f" * 32
+_SLOT_RE = re.compile(f"({_BOOK_ID_SLOT}|{_FIELD_ID_SLOT})".encode("ascii"))
+
+FORM_CONTENT_TYPE = "application/x-www-form-urlencoded"
+
+
+class BookingRequestTemplate:
+    """
+    预编译的 saveData 请求
+    开抢前为每个片段编译一次：FId 已解析，表单已 url 编码为字节串，
+    只在 UUID 的位置留空；每次发送只需生成两个 UUID 并拼接字节
+    """
+
+    __slots__ = ("place", "url", "_segments", "_slots")
+
+    def __init__(self, place: str, url: str, segments: list, slots: list):
+        self.place = place
+        self.url = url
+        self._segments = segments
+        self._slots = slots
+
+    @classmethod
+    def compile(
+        cls,
+        user_id: str,
+        user_name: str,
+        place: str,
+        start_time: str,
+        end_time: str,
+        user_email: str = "example@link.cuhk.edu.cn",
+        user_phone: str = "123456",
+        theme: str = "练琴",
+    ) -> "BookingRequestTemplate | None":
+        """place 不在 FID_MAP 中时返回 None"""
+        data = build_book_form(
+            user_id=user_id,
+            user_name=user_name,
+            place=place,
+            start_time=start_time,
+            end_time=end_time,
+            user_email=user_email,
+            user_phone=user_phone,
+            theme=theme,
+            book_id=_BOOK_ID_SLOT,
+            field_id=_FIELD_ID_SLOT,
+        )
+        if data is None:
+            return None
+        # 与 requests 对 dict 表单的编码方式一致
+        parts = _SLOT_RE.split(urlencode(data).encode("ascii"))
+        segments, slots = parts[0::2], [p == _BOOK_ID_SLOT.encode("ascii") for p in parts[1::2]]
+        url = f"{BOOK_URL}?{urlencode(book_params())}"
+        return cls(place, url, segments, slots)
+
+    def render(self) -> bytes:
+        """生成一份新的请求体（book_id 在 id 与 BId 两处相同，field_id 另取）"""
+        book_id = uuid.uuid4().hex.encode("ascii")
+        field_id = uuid.uuid4().hex.encode("ascii")
+        segments = self._segments
+        out = [segments[0]]
+        for i, is_book in enumerate(self._slots):
+            out.append(book_id if is_book else field_id)
+            out.append(segments[i + 1])
+        return b"".join(out)
+
+
+def book_params() -> dict:
+    """saveData 的查询参数（ruleId 固定）"""
+    return {"reBookMainId": "", "ruleId": RULE_ID}
+
+
+def parse_book_result(content: bytes, status_code: int = 200, latency: float | None = None) -> BookingResult:
+    """
+    从 saveData 响应中得到预订结果
+    限流（429）与服务器错误（5xx）的响应体通常是 HTML 错误页，先按状态码区分，避免误报 Cookie 过期；
+    其余非 JSON 响应（被重定向到登录页）视为 Cookie 过期
+    """
+    if status_code == 429:
+        return BookingResult(BookingStatus.RATE_LIMITED, "请求过于频繁（HTTP 429）", status_code, latency)
+    if status_code >= 500:
+        return BookingResult(BookingStatus.SERVER_ERROR, f"服务器错误（HTTP {status_code}）", status_code, latency)
+    try:
+        message = json.loads(content.decode("utf-8", errors="replace"))["message"]
+    except (ValueError, KeyError, TypeError):
+        return BookingResult(BookingStatus.COOKIE_EXPIRED, "Cookie 过期", status_code, latency)
+    return BookingResult.from_message(str(message), status_code, latency)
+
+
+INVALID_PLACE = BookingResult(BookingStatus.INVALID, "地点错误")
+
 
+def network_error(latency: float | None = None) -> BookingResult:
+    return BookingResult(BookingStatus.NETWORK_ERROR, "请求失败, 检查网络、代理服务器或 VPN", None, latency)
+
+
+def book(
+    cookie: str,
+    user_id: str,
+    user_name: str,
+    place: str,
+    start_time: str,
+    end_time: str,
+    user_email: str = "example@link.cuhk.edu.cn",
+    user_phone: str = "123456",
+    theme: str = "练琴",
+    proxies: dict | None = None,
+    client: CrazyRequests | None = None,
+    template: BookingRequestTemplate | None = None,
+) -> BookingResult:
+    """预定
+
+    Args:
+        user_id (str): 学号
+        user_name (str): 姓名
+        user_email (str): 邮箱
+        user_phone (str): 电话
+        theme (str): 预定主题
+        place (str): 预定地点, 必须是 FID_MAP 的 key 之一
+        start_time (str): 开始时间, 格式 "2025-09-12 18:30"
+        end_time (str): 结束时间, 格式 "2025-09-12 19:00"
+        client (CrazyRequests): 复用的长连接客户端, 为空时从注册表按 proxies + cookie 获取
+        template (BookingRequestTemplate): 预编译的请求, 提供时跳过表单构建与编码
+
+    returns:
+        BookingResult: 预定结果（status 为结果类别, str() 为消息文本）
+    """
+    if template is None:
+        template = BookingRequestTemplate.compile(
+            user_id=user_id,
+            user_name=user_name,
+            place=place,
+            start_time=start_time,
+            end_time=end_time,
+            user_email=user_email,
+            user_phone=user_phone,
+            theme=theme,
+        )
+    if template is None:
+        return INVALID_PLACE
+
+    # 模板 url 已带上固定的 ruleId 查询参数
+    url = template.url
+
+    t0 = time.perf_counter()
     try:
-        c_request = CrazyRequests(proxies=proxies, cookie=cookie)
-        response = c_request.post(url, params=params, data=data)
+        c_request = client if client is not None else get_client(proxies=proxies, cookie=cookie)
+        response = c_request.post(url, data=template.render())
     except IOError as e:
-        return "请求失败, 检查网络、代理服务器或 VPN"
+        return network_error(time.perf_counter() - t0)
 
-    try:
-        return response.json()["message"]
-    except requests.exceptions.JSONDecodeError:
-        return "Cookie 过期"
+    return parse_book_result(response.content, response.status_code, time.perf_counter() - t0)
 
 
 def timer_run(target_time: str, func):
@@ -254,7 +589,8 @@ def timer_run(target_time: str, func):
     if delay <= 0:
         func()
     else:
-        timer = threading.Timer(delay, func)
+        # 粗睡 + 自旋的高精度定时器，func 在后台线程上触发
+        timer = PrecisionTimer(run_time, func)
         timer.start()
         return timer
 
@@ -8,35 +8,30 @@ from __future__ import annotations
 
 import os
 import sys
-import json
 import time
-import math
-from dataclasses import dataclass, asdict
-from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional, Tuple
+from datetime import datetime
+from typing import List, Optional, Tuple
 
-from PySide6 import QtCore, QtGui, QtWidgets, QtNetwork
-
-try:
-    from PySide6.QtWebEngineWidgets import QWebEngineView
-    from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage
-    WEBENGINE_AVAILABLE = True
-except ImportError:
-    WEBENGINE_AVAILABLE = False
-
-import yaml
+from PySide6 import QtCore, QtGui, QtWidgets
 
 # 导入工具函数
-from utils import app_base_dir, resource_path, parse_proxies, hhmm_to_minutes, minutes_to_hhmm, split_to_slots
+from utils import resource_path, parse_proxies, build_chunks
 
 # 导入核心逻辑
-from main import timer_run
+from main import get_client, release_client
+
+# 导入连接预热
+from prewarm import ConnectionPrewarmer
+
+# 导入空闲索引与占用缓存
+from availability import AvailabilityIndex
+from occupancy import OccupancyCache
 
 # 导入配置管理
-from config import RequestItemData, AppConfig, ConfigManager
+from config import RequestItemData, ConfigManager
 
 # 导入常量
-from constants import PLACES, REQUIRED_FIELDS
+from constants import OCCUPANCY_DISABLED_HINT, PLACES, REQUIRED_FIELDS
 
 # 导入代理检测
 try:
@@ -47,13 +42,20 @@ except ImportError:
     print("注意：未找到 proxy_detector.py，自动代理检测功能将不可用。")
 
 # 导入自定义控件
-from widgets import WheelCombo, DateWheel, TimeWheel, MinuteToggle, RequestItemWidget
+from widgets import WheelCombo, DateWheel, RequestItemWidget
 
-# 导入对话框
-from dialogs import SettingsDialog, CookieDialog, AutoLoginDialog
+# 导入对话框（AutoLoginDialog 依赖 QtWebEngine，需要登录时才导入）
+from dialogs import SettingsDialog, CookieDialog, OccupancyDialog, webengine_available
+
+# 导入多账号并行预订
+from multi_account import main_account_name, profile_jobs
 
 # 导入后台线程
-from workers import BookingWorker
+from workers import BookingWorker, ProxyDetectWorker, SniperWorker
+
+# 导入捡漏关注项与预订结果
+from sniper import WatchItem
+from retry_policy import BookingStatus
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -67,32 +69,19 @@ class MainWindow(QtWidgets.QMainWindow):
         except Exception:
             pass
 
-        # 样式（Fusion + 轻量美化 + 全局字体）
+        # 样式（Fusion + 轻量美化）；全局字体与样式表在首次绘制后再加载，见 _apply_fonts
         QtWidgets.QApplication.setStyle("Fusion")
-        app = QtWidgets.QApplication.instance()
-        if app is not None:
-            # 尝试加载打包内字体
-            try:
-                QPF = QtGui.QFontDatabase
-                fonts_dir = resource_path("fonts")
-                for fname in ("FiraCode-Regular.ttf", "FangZhengXinShuSongJianTi-1.ttf"):
-                    fpath = os.path.join(fonts_dir, fname)
-                    if os.path.exists(fpath):
-                        QPF.addApplicationFont(fpath)
-            except Exception:
-                pass
-
-            font = app.font()
-            font.setFamily("Fira Code, 方正新书宋简体")
-            app.setFont(font)
-            app.setStyleSheet("* { font-family: 'Fira Code','方正新书宋简体'; }")
+        self._fonts_applied = False
+        self.first_paint_at: float | None = None  # 首次绘制的时刻（time.perf_counter），供启动耗时测试
         self.setMinimumSize(920, 680)
 
         # 配置
         self.cfg = ConfigManager.load()
 
-        # 启动时自动检测代理（如果proxies为空或检测失败）
-        self._auto_detect_proxy_on_startup()
+        # 房间 × 时段空闲索引：预订结果返回时增量更新
+        self.availability = AvailabilityIndex()
+        # 占用查询缓存：多次打开占用一览时复用（过期后发条件请求）
+        self.occupancy_cache = OccupancyCache(ttl=self.cfg.occupancy_ttl)
 
         # 顶部工具栏：设置、Cookie
         self.btn_settings = QtWidgets.QToolButton()
@@ -103,14 +92,28 @@ class MainWindow(QtWidgets.QMainWindow):
         self.btn_cookie.setIcon(self.style().standardIcon(QtWidgets.QStyle.SP_DialogOpenButton))
         self.btn_cookie.setToolTip("设置 Cookie")
 
+        self.btn_occupancy = QtWidgets.QToolButton()
+        self.btn_occupancy.setIcon(self.style().standardIcon(QtWidgets.QStyle.SP_FileDialogContentsView))
+        self.btn_occupancy.setToolTip("房间占用一览")
+        if not self.cfg.occupancy_url:
+            # 占用接口未经核实，需在 config.yaml 中填写 occupancy_url 后才能使用
+            self.btn_occupancy.setEnabled(False)
+            self.btn_occupancy.setToolTip(OCCUPANCY_DISABLED_HINT)
+
         self.cookie_info = QtWidgets.QLabel(self._cookie_summary())
         self.cookie_info.setStyleSheet("color:#777;")
 
+        # 网络线路检测状态（检测在后台进行，不阻塞窗口显示）
+        self.net_status = QtWidgets.QLabel("")
+        self.net_status.setStyleSheet("color:#777;")
+
         topbar = QtWidgets.QHBoxLayout()
         topbar.addWidget(self.btn_settings)
         topbar.addWidget(self.btn_cookie)
+        topbar.addWidget(self.btn_occupancy)
         topbar.addWidget(self.cookie_info)
         topbar.addStretch()
+        topbar.addWidget(self.net_status)
 
         # 目标时间（滚轮）+ 立即启动
         tgt_group = QtWidgets.QGroupBox("启动时间")
@@ -140,6 +143,15 @@ class MainWindow(QtWidgets.QMainWindow):
         self.cb_immediate.setChecked(self.cfg.start_immediately)
         tgt_lay.addWidget(self.cb_immediate)
 
+        self.cb_watch = QtWidgets.QCheckBox("捡漏")
+        self.cb_watch.setToolTip("开抢结束后继续监视没订到的时段，有人取消时立即预订；取消勾选即停止")
+        self.cb_watch.setChecked(self.cfg.watch_after_release)
+        if not self.cfg.occupancy_url:
+            self.cb_watch.setChecked(False)
+            self.cb_watch.setEnabled(False)
+            self.cb_watch.setToolTip(OCCUPANCY_DISABLED_HINT)
+        tgt_lay.addWidget(self.cb_watch)
+
         # 请求列表
         self.req_container = QtWidgets.QWidget()
         self.req_vbox = QtWidgets.QVBoxLayout(self.req_container)
@@ -185,8 +197,10 @@ class MainWindow(QtWidgets.QMainWindow):
         # 信号
         self.btn_settings.clicked.connect(self.open_settings)
         self.btn_cookie.clicked.connect(self.open_cookie)
+        self.btn_occupancy.clicked.connect(self.open_occupancy)
         self.btn_add.clicked.connect(self.add_request_item)
         self.btn_start.clicked.connect(self.on_start_clicked)
+        self.cb_watch.toggled.connect(self._on_watch_toggled)
 
         # 载入配置中的请求
         for r in self.cfg.requests:
@@ -194,10 +208,55 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # 状态
         self.worker = None
-        self.scheduled_timer = None  # threading.Timer 来自用户 core.timer_run()
-        self.qt_timer = None         # Qt 定时器，保障到点必触发
+        self.sniper_worker = None    # 开抢结束后的捡漏线程
+        self.proxy_worker = None     # 启动时的网络线路检测线程
+        self.prewarmer = None        # 到点前的连接预热线程
         self._has_started = False    # 防止重复触发
 
+        # 启动时自动检测代理：事件循环开始后在后台进行，窗口立即可用
+        QtCore.QTimer.singleShot(0, self._auto_detect_proxy_on_startup)
+
+    def closeEvent(self, event):
+        # 开抢线程可能正在等待目标时间、捡漏线程一直在轮询：取消后等待其结束再销毁，
+        # 并断开结束信号，不再触发结束后的捡漏与界面更新
+        self._stop_prewarm()
+        for worker in (self.worker, self.sniper_worker):
+            if worker is not None and worker.isRunning():
+                worker.finished_all.disconnect()
+                worker.stop()
+                worker.wait()
+        # 检测线程受总时限约束，等待其结束后再销毁
+        if self.proxy_worker is not None and self.proxy_worker.isRunning():
+            self.proxy_worker.wait()
+        super().closeEvent(event)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._fonts_applied:
+            self._fonts_applied = True
+            self.first_paint_at = time.perf_counter()
+            QtCore.QTimer.singleShot(0, self._apply_fonts)
+
+    def _apply_fonts(self):
+        """加载打包内字体并设置全局字体（注册字体文件与重新套用样式表较慢，放在窗口显示之后）"""
+        app = QtWidgets.QApplication.instance()
+        if app is None:
+            return
+        try:
+            QPF = QtGui.QFontDatabase
+            fonts_dir = resource_path("fonts")
+            for fname in ("FiraCode-Regular.ttf", "FangZhengXinShuSongJianTi-1.ttf"):
+                fpath = os.path.join(fonts_dir, fname)
+                if os.path.exists(fpath):
+                    QPF.addApplicationFont(fpath)
+        except Exception:
+            pass
+
+        font = app.font()
+        font.setFamily("Fira Code, 方正新书宋简体")
+        app.setFont(font)
+        app.setStyleSheet("* { font-family: 'Fira Code','方正新书宋简体'; }")
+
     # --- helpers ---
     def _cookie_summary(self) -> str:
         if self.cfg.cookie and self.cfg.cookie_updated_at:
@@ -208,37 +267,46 @@ class MainWindow(QtWidgets.QMainWindow):
             return "Cookie 未设置"
 
     def _auto_detect_proxy_on_startup(self):
-        """启动时自动检测网络配置（优先检测Reqable代理）"""
+        """启动时在后台自动检测网络配置（优先检测Reqable），进度显示在顶栏，结果经信号应用"""
         if not PROXY_DETECTOR_AVAILABLE:
             return
-
         print("[启动] 开始自动检测网络配置（优先检测Reqable）...")
+        self.net_status.setText("正在检测网络…")
+        self._proxies_before_detect = self.cfg.proxies
+        self.proxy_worker = ProxyDetectWorker(self.cfg.proxy_detect_deadline, self.cfg.route_cache_ttl, self)
+        self.proxy_worker.progress.connect(lambda msg: self.net_status.setText(f"网络检测：{msg}"))
+        self.proxy_worker.detected.connect(self._on_proxy_detected)
+        self.proxy_worker.failed.connect(self._on_proxy_detect_failed)
+        self.proxy_worker.start()
+
+    def _on_proxy_detected(self, proxy_dict):
+        proxy_str = ProxyDetector.format_for_config(proxy_dict)
+        if proxy_dict:
+            # 检测到代理（Reqable等）
+            print(f"[启动] [OK] 已自动检测并应用代理: {proxy_str}")
+            self.net_status.setText(f"代理：{proxy_str}")
+        else:
+            # 可以直接连接（校园网或VPN），或所有线路都不可用
+            print("[启动] [OK] 未检测到可用代理，使用直接连接（校园网内或 AnyConnect VPN）")
+            print("[启动] [WARNING] 注意：booking接口可能需要Reqable代理才能正常工作")
+            self.net_status.setText("直接连接（未检测到代理）")
+        self.net_status.setToolTip(self.net_status.text())
+        if self.cfg.proxies != self._proxies_before_detect:
+            # 检测期间用户已在设置中修改了代理，以用户的设置为准
+            self.net_status.setText("已使用设置中的代理")
+            return
+        if proxy_str != self.cfg.proxies:
+            self.cfg.proxies = proxy_str
+            # 缓存的线路复核失败时会再收到一次检测结果，那次不应被当作用户的修改
+            self._proxies_before_detect = proxy_str
+            ConfigManager.save(self.cfg)
+            if self.worker is not None and self.worker.isRunning():
+                self._append_log("网络检测完成，新的代理设置将在下次启动预订时生效。")
 
-        # 禁用SSL警告
-        try:
-            import urllib3
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        except Exception:
-            pass
-
-        # 自动检测网络配置（总是执行，不跳过）
-        try:
-            proxy_dict = ProxyDetector.auto_detect()
-            proxy_str = ProxyDetector.format_for_config(proxy_dict)
-
-            if proxy_dict:
-                # 检测到代理（Reqable等）
-                self.cfg.proxies = proxy_str
-                ConfigManager.save(self.cfg)
-                print(f"[启动] [OK] 已自动检测并应用代理: {proxy_str}")
-            else:
-                # 可以直接连接（校园网或VPN）
-                self.cfg.proxies = ""
-                ConfigManager.save(self.cfg)
-                print("[启动] [OK] 检测到可以直接连接（校园网内或 AnyConnect VPN）")
-                print("[启动] [WARNING] 注意：booking接口可能需要Reqable代理才能正常工作")
-        except Exception as e:
-            print(f"[启动] [ERROR] 自动检测网络配置失败: {e}")
+    def _on_proxy_detect_failed(self, error: str):
+        print(f"[启动] [ERROR] 自动检测网络配置失败: {error}")
+        self.net_status.setText("网络检测失败，沿用已保存的代理设置")
+        self.net_status.setToolTip(error)
 
     def add_request_item(self, data: RequestItemData | None = None):
         item = RequestItemWidget(data)
@@ -275,6 +343,7 @@ class MainWindow(QtWidgets.QMainWindow):
         # 同步保存 config（避免意外退出丢失）
         self.cfg.target_time = self.current_target_time()
         self.cfg.start_immediately = self.cb_immediate.isChecked()
+        self.cfg.watch_after_release = self.cb_watch.isChecked()
         ConfigManager.save(self.cfg)
 
     def current_target_time(self) -> str:
@@ -290,13 +359,17 @@ class MainWindow(QtWidgets.QMainWindow):
         dlg.saved.connect(lambda _: self._on_settings_saved())
         dlg.exec()
 
+    def open_occupancy(self):
+        dlg = OccupancyDialog(self.cfg, self.availability, self.occupancy_cache, self)
+        dlg.exec()
+
     def _on_settings_saved(self):
         ConfigManager.save(self.cfg)
         QtWidgets.QMessageBox.information(self, "已保存", "设置已保存。")
 
     def open_cookie(self):
         """打开Cookie设置对话框，提供手动粘贴和自动登录两种方式"""
-        if WEBENGINE_AVAILABLE:
+        if webengine_available():
             # 提供选择：自动登录 或 手动粘贴
             choice = QtWidgets.QMessageBox()
             choice.setWindowTitle("设置Cookie")
@@ -323,21 +396,30 @@ class MainWindow(QtWidgets.QMainWindow):
             # 如果 QtWebEngine 不可用，只提供手动粘贴
             self._open_manual_cookie()
 
+    def _update_cookie(self, cookie: str, proxies: Optional[str] = None):
+        """保存新的 Cookie（与代理），并关闭旧 Cookie 对应的长连接客户端"""
+        old_cookie, old_proxies = self.cfg.cookie, self.cfg.proxies
+        self.cfg.cookie = cookie or ""
+        if proxies is not None:
+            self.cfg.proxies = proxies or ""
+        self.cfg.cookie_updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if (old_cookie, old_proxies) != (self.cfg.cookie, self.cfg.proxies):
+            release_client(parse_proxies(old_proxies), old_cookie)
+        self.cookie_info.setText(self._cookie_summary())
+        ConfigManager.save(self.cfg)
+
     def _open_manual_cookie(self):
         """手动粘贴Cookie与代理"""
         dlg = CookieDialog(self.cfg.cookie, self.cfg.proxies, self)
         def _save_cookie_and_proxy(new_cookie: str, new_proxies: str):
-            self.cfg.cookie = new_cookie or ""
-            self.cfg.cookie_updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.cfg.proxies = new_proxies or ""
-            self.cookie_info.setText(self._cookie_summary())
-            ConfigManager.save(self.cfg)
+            self._update_cookie(new_cookie, new_proxies)
         dlg.saved.connect(_save_cookie_and_proxy)
         dlg.exec()
 
     def _open_auto_login(self):
         """打开自动登录对话框"""
         try:
+            from dialogs import AutoLoginDialog
             dlg = AutoLoginDialog(
                 proxies_config=self.cfg.proxies,
                 user_id=self.cfg.user_id,
@@ -346,10 +428,7 @@ class MainWindow(QtWidgets.QMainWindow):
             )
 
             def _on_cookie_captured(cookie_str: str):
-                self.cfg.cookie = cookie_str
-                self.cfg.cookie_updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.cookie_info.setText(self._cookie_summary())
-                ConfigManager.save(self.cfg)
+                self._update_cookie(cookie_str)
                 QtWidgets.QMessageBox.information(
                     self, "成功",
                     f"已自动捕获Cookie！\n共{len(cookie_str)}个字符\n更新时间：{self.cfg.cookie_updated_at}"
@@ -364,31 +443,12 @@ class MainWindow(QtWidgets.QMainWindow):
             )
             self._open_manual_cookie()
 
-    def _collect_chunks(self) -> List[Tuple[str, str, str]]:
+    def _collect_chunks(self) -> List[Tuple[List[str], str, str]]:
         """
         将 UI 中的每组请求拆分为若干 <= 2h 的片段。
-        返回 [(place, 'YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), ...]
+        返回 [([首选地点, 备选地点...], 'YYYY-MM-DD HH:MM','YYYY-MM-DD HH:MM'), ...]
         """
-        chunks: List[Tuple[str, str, str]] = []
-        for w in self._iter_items():
-            d = w.to_data()
-
-            # 基础校验
-            place = (d.place or "").strip()
-            if not place:
-                raise ValueError("存在空的地点（place）。")
-            # 时间
-            s_minutes = hhmm_to_minutes(d.start)
-            e_minutes = hhmm_to_minutes(d.end)
-            if e_minutes < s_minutes:
-                raise ValueError(f"{place} 的结束时间早于开始时间。")
-
-            # 拆分
-            for s_hm, e_hm in split_to_slots(d.start, d.end, max_minutes=120):
-                start_ts = f"{d.date} {s_hm}"
-                end_ts = f"{d.date} {e_hm}"
-                chunks.append((place, start_ts, end_ts))
-        return chunks
+        return build_chunks([w.to_data() for w in self._iter_items()], PLACES)
 
     def _append_log(self, text: str):
         self.te_log.appendPlainText(text)
@@ -407,19 +467,56 @@ class MainWindow(QtWidgets.QMainWindow):
         self.cb_immediate.setEnabled(enabled)
         self.btn_start.setEnabled(enabled)
 
-    def _start_worker_now(self):
+    def _start_prewarm(self, target: str):
+        """目标时间前预热连接（与 BookingWorker 共用同一个长连接客户端）"""
+        self._stop_prewarm()
+        if not self.cfg.prewarm_enabled:
+            return
+        try:
+            client = get_client(
+                proxies=parse_proxies(self.cfg.proxies),
+                cookie=self.cfg.cookie,
+                pool_size=max(self.cfg.pool_size, self.cfg.burst_size),
+                keep_alive=self.cfg.keep_alive,
+            )
+            self.prewarmer = ConnectionPrewarmer(
+                client,
+                datetime.strptime(target, "%Y-%m-%d %H:%M:%S"),
+                lead_seconds=self.cfg.prewarm_seconds,
+                # 突发模式下每个请求各占一条预热好的连接
+                connections=max(self.cfg.prewarm_connections, self.cfg.burst_size),
+                ping_interval=self.cfg.prewarm_ping_interval,
+            )
+            self.prewarmer.start()
+            self._append_log(f"将在目标时间前 {self.cfg.prewarm_seconds} 秒预热 {self.prewarmer.connections} 条连接")
+        except Exception as e:
+            self.prewarmer = None
+            self._append_log(f"连接预热启动失败：{e}")
+
+    def _stop_prewarm(self):
+        if self.prewarmer is not None:
+            self.prewarmer.stop()
+            self.prewarmer = None
+
+    def _start_worker_now(self, fire_at: datetime | None = None) -> bool:
+        """
+        启动预订线程，返回是否成功启动
+        fire_at 不为空时线程立即启动，但在线程内部高精度等待到点再发请求
+        """
         # 防重复：若已触发过则直接返回
         if getattr(self, "_has_started", False):
-            return
+            return False
         self._has_started = True
 
         # 组装 chunks 并启动线程
         try:
             chunks = self._collect_chunks()
+            # 额外账号（config.yaml 中的 profiles）各自的片段，与主账号同时开抢
+            profiles = profile_jobs(self.cfg, PLACES, on_log=self._append_log)
         except Exception as e:
             QtWidgets.QMessageBox.warning(self, "参数错误", str(e))
             self._set_controls_enabled(True)
-            return
+            return False
 
         # 提示 proxies 解析情况
         proxies = parse_proxies(self.cfg.proxies)
@@ -427,14 +524,25 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "proxies 格式错误", "请在设置中以 JSON 或 YAML 格式填写 proxies，例如：\n"
                                               '{"http":"10.101.28.225:9000","https":"10.101.28.225:9000"}')
             self._set_controls_enabled(True)
-            return
+            return False
 
-        self._append_log(f"开始执行，共 {len(chunks)} 个片段…")
-        self.worker = BookingWorker(self.cfg, chunks)
+        if profiles:
+            names = [main_account_name(self.cfg)] + [name for name, _, _ in profiles]
+            self._append_log(f"多账号模式：{'、'.join(names)}（共用并发上限与限速）")
+            chunks_total = len(chunks) + sum(len(c) for _, _, c in profiles)
+        else:
+            chunks_total = len(chunks)
+        if fire_at is None:
+            self._append_log(f"开始执行，共 {chunks_total} 个片段…")
+        else:
+            self._append_log(f"已就绪，共 {chunks_total} 个片段，将在 {fire_at:%Y-%m-%d %H:%M:%S} 准时发出…")
+        self.worker = BookingWorker(self.cfg, chunks, fire_at=fire_at, availability=self.availability,
+                                    profiles=profiles)
         self.worker.log.connect(self._append_log)
         self.worker.popup.connect(self._on_popup)
         self.worker.finished_all.connect(self._on_worker_finished)
         self.worker.start()
+        return True
 
     def _on_popup(self, level: str, message: str):
         if level == "info":
@@ -445,15 +553,45 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.critical(self, "错误", message)
 
     def _on_worker_finished(self):
+        self._stop_prewarm()
         self._append_log("所有片段执行完毕。")
+        if self.cb_watch.isChecked() and self._start_sniper():
+            return
         self._set_controls_enabled(True)
         # 允许再次启动
         self._has_started = False
 
+    def _start_sniper(self) -> bool:
+        """对没订到的片段启动捡漏线程（与开抢共用长连接），返回是否启动"""
+        engine = getattr(self.worker, "engine", None)
+        if engine is None or self.worker._stop_event.is_set():
+            return False
+        items = [WatchItem(list(st.candidates), st.start_ts, st.end_ts)
+                 for st in engine.states if st.status is not BookingStatus.SUCCESS]
+        if not items:
+            return False
+        self._append_log(f"{len(items)} 个片段没订到，开始捡漏（取消勾选“捡漏”即停止）…")
+        self.sniper_worker = SniperWorker(self.cfg, items, availability=self.availability, client=self.worker.client)
+        self.sniper_worker.log.connect(self._append_log)
+        self.sniper_worker.popup.connect(self._on_popup)
+        self.sniper_worker.finished_all.connect(self._on_sniper_finished)
+        self.sniper_worker.start()
+        return True
+
+    def _on_watch_toggled(self, checked: bool):
+        if not checked and self.sniper_worker is not None and self.sniper_worker.isRunning():
+            self.sniper_worker.stop()
+
+    def _on_sniper_finished(self):
+        self.sniper_worker = None
+        self._set_controls_enabled(True)
+        self._has_started = False
+
     def on_start_clicked(self):
         # 保存一份配置快照
         self.cfg.target_time = self.current_target_time()
         self.cfg.start_immediately = self.cb_immediate.isChecked()
+        self.cfg.watch_after_release = self.cb_watch.isChecked()
         ConfigManager.save(self.cfg)
 
         # 必填校验（设置弹窗里的）
@@ -474,7 +612,7 @@ class MainWindow(QtWidgets.QMainWindow):
             return
 
         # 每次运行前自动登录获取Cookie
-        if WEBENGINE_AVAILABLE:
+        if webengine_available():
             self._append_log("正在自动登录获取Cookie...")
             self._auto_login_and_start()
         else:
@@ -491,6 +629,7 @@ class MainWindow(QtWidgets.QMainWindow):
     def _auto_login_and_start(self):
         """自动登录获取Cookie，然后开始预定"""
         try:
+            from dialogs import AutoLoginDialog
             dlg = AutoLoginDialog(
                 proxies_config=self.cfg.proxies,
                 user_id=self.cfg.user_id,
@@ -499,10 +638,7 @@ class MainWindow(QtWidgets.QMainWindow):
             )
 
             def _on_cookie_captured(cookie_str: str):
-                self.cfg.cookie = cookie_str
-                self.cfg.cookie_updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.cookie_info.setText(self._cookie_summary())
-                ConfigManager.save(self.cfg)
+                self._update_cookie(cookie_str)
                 self._append_log(f"Cookie获取成功！更新时间：{self.cfg.cookie_updated_at}")
 
                 # Cookie获取成功后，继续预定流程
@@ -533,46 +669,23 @@ class MainWindow(QtWidgets.QMainWindow):
             self._append_log('"立即启动"已勾选，马上开始…')
             self._start_worker_now()
         else:
-            # 使用 Qt 定时器保证触发，并保留核心 timer_run 作为后备
+            # 预订线程内部使用高精度定时（粗睡 + 自旋），不受 GUI 事件循环卡顿影响
             target = self.current_target_time()
             self._append_log(f"已预约在 {target} 启动…（窗口保持打开即可）")
 
-            # 计算延迟
             try:
                 run_dt = datetime.strptime(target, "%Y-%m-%d %H:%M:%S")
-                delay_ms = int(max(0, (run_dt - datetime.now()).total_seconds()) * 1000)
             except Exception:
-                delay_ms = 0
+                run_dt = datetime.now()
 
-            if delay_ms == 0:
+            if run_dt <= datetime.now():
                 self._append_log("目标时间已到或已过，立即开始…")
                 self._start_worker_now()
                 return
 
-            # 主调度：Qt 单次定时器
-            if self.qt_timer is not None:
-                try:
-                    self.qt_timer.stop()
-                except Exception:
-                    pass
-                try:
-                    self.qt_timer.deleteLater()
-                except Exception:
-                    pass
-                self.qt_timer = None
             self._has_started = False
-            self.qt_timer = QtCore.QTimer(self)
-            self.qt_timer.setSingleShot(True)
-            self.qt_timer.timeout.connect(self._start_worker_now)
-            self.qt_timer.start(delay_ms)
-
-            # 后备：仍调用用户核心 timer_run（若触发也会因为 _has_started 防重）
-            def _go():
-                QtCore.QTimer.singleShot(0, self._start_worker_now)
-            try:
-                self.scheduled_timer = timer_run(target, _go)
-            except Exception:
-                self.scheduled_timer = None
+            if self._start_worker_now(fire_at=run_dt):
+                self._start_prewarm(target)
 
 def main():
     app = QtWidgets.QApplication(sys.argv)
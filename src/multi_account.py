@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+多账号并行预订
+每个账号一个 BookingEngine（各自的 Cookie、长连接客户端与预编译请求），到点同时开抢；
+所有引擎共用同一个在途请求信号量与按主机限速器，因此多账号加起来也不会超过 max_concurrency / rate_limit。
+结果按账号汇报。不依赖 Qt。
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from booking_engine import BookingEngine, ChunkState, HostRateLimiter
+from main import get_client
+from retry_policy import BookingStatus
+from utils import build_chunks, parse_proxies
+
+# 账号信息字段：一律取自该账号，只有留空的 theme 沿用主账号的主题
+PROFILE_FIELDS = ("cookie", "user_id", "user_name", "user_email", "user_phone", "theme")
+INHERITED_FIELDS = ("theme",)
+
+
+def main_account_name(cfg) -> str:
+    return cfg.user_name or cfg.user_id or "主账号"
+
+
+def profile_jobs(
+    cfg, places: Sequence[str], on_log: Callable[[str], None] = print
+) -> List[Tuple[str, object, List[Tuple]]]:
+    """
+    启用的额外账号 [(账号名, AccountProfile, chunks)]
+    缺少 Cookie 或学号的账号跳过并记录日志（否则会以主账号的身份预订）；
+    账号名为空或与其他账号（含主账号）重复时抛出 ValueError
+    """
+    jobs = []
+    for p in cfg.profiles:
+        if not p.enabled:
+            continue
+        if not p.cookie or not p.user_id:
+            on_log(f"账号 {p.label or '（未命名）'} 缺少 Cookie 或学号，已跳过")
+            continue
+        jobs.append((p.label, p, build_chunks(p.requests, places)))
+    names = [main_account_name(cfg)] + [name for name, _, _ in jobs]
+    if len(set(names)) != len(names) or not all(names):
+        raise ValueError("账号名为空或重复：" + "、".join(names))
+    return jobs
+
+
+def profile_config(cfg, profile):
+    """主配置的副本，个人信息与 Cookie 替换为该账号的（profile 为 None 时即主账号，返回 cfg 本身）"""
+    if profile is None:
+        return cfg
+    out = copy.copy(cfg)
+    for name in PROFILE_FIELDS:
+        value = getattr(profile, name, "")
+        if value or name not in INHERITED_FIELDS:
+            setattr(out, name, value)
+    return out
+
+
+class MultiAccountEngine:
+    """
+    多账号并行预订引擎
+
+    :param cfg: AppConfig（主账号信息及共用的并发、限速、重试、突发设置）
+    :param jobs: [(账号名, AccountProfile 或 None（主账号）, chunks)]
+    :param clients: {账号名: 长连接客户端}；缺省按账号的 Cookie 取得独立的客户端
+    :param on_log: 日志回调，消息前加上 "[账号名] "
+    :param on_popup: 弹窗回调 (level, message)
+    :param stop_event: 外部取消（所有账号共用）
+    :param book_func: 单次预订函数，缺省由 BookingEngine 按 cfg 选择（测试时可替换）
+    :param availability: 空闲索引（所有账号共用）
+    """
+
+    def __init__(
+        self,
+        cfg,
+        jobs: Sequence[Tuple[str, object, List[Tuple]]],
+        clients: Optional[Dict[str, object]] = None,
+        on_log: Callable[[str], None] = print,
+        on_popup: Optional[Callable[[str, str], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+        book_func=None,
+        availability=None,
+    ):
+        self.cfg = cfg
+        self.on_log = on_log
+        self.on_popup = on_popup or (lambda level, message: None)
+        self.stop_event = stop_event or threading.Event()
+        # 所有账号共用的并发上限与限速
+        self.inflight = threading.BoundedSemaphore(max(1, int(cfg.max_concurrency)))
+        self.rate = HostRateLimiter(cfg.rate_limit)
+        clients = clients or {}
+        self.engines: Dict[str, BookingEngine] = {}
+        for name, profile, chunks in jobs:
+            if name in self.engines:
+                raise ValueError(f"账号名重复：{name}")
+            pcfg = profile_config(cfg, profile)
+            client = clients.get(name)
+            if client is None:
+                client = get_client(
+                    proxies=parse_proxies(pcfg.proxies),
+                    cookie=pcfg.cookie,
+                    pool_size=max(pcfg.pool_size, pcfg.burst_size),
+                    keep_alive=pcfg.keep_alive,
+                )
+            self.engines[name] = BookingEngine(
+                pcfg,
+                chunks,
+                client=client,
+                on_log=lambda m, n=name: self.on_log(f"[{n}] {m}"),
+                on_popup=lambda level, m, n=name: self.on_popup(level, f"[{n}] {m}"),
+                stop_event=self.stop_event,
+                book_func=book_func,
+                availability=availability,
+                inflight=self.inflight,
+                rate=self.rate,
+            )
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self, fire_at: Optional[datetime] = None) -> Dict[str, List[ChunkState]]:
+        """所有账号在 fire_at 同时开抢，全部结束后返回 {账号名: 各片段状态}"""
+        engines = [(name, e) for name, e in self.engines.items() if e.states]
+        if engines:
+            with ThreadPoolExecutor(max_workers=len(engines), thread_name_prefix="account") as pool:
+                for fut in [pool.submit(e.run, fire_at) for _, e in engines]:
+                    fut.result()
+        return self.results()
+
+    def results(self) -> Dict[str, List[ChunkState]]:
+        return {name: e.states for name, e in self.engines.items()}
+
+    def summary(self) -> List[str]:
+        """每个账号一行：订到的片段数及每个片段的结果"""
+        lines = []
+        for name, states in self.results().items():
+            ok = sum(1 for st in states if st.status is BookingStatus.SUCCESS)
+            detail = "；".join(f"{st.label} {st.last_message or '未完成'}" for st in states)
+            lines.append(f"[{name}] 订到 {ok}/{len(states)} 个片段" + (f"：{detail}" if detail else ""))
+        return lines
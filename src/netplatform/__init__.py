@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Network platform backends
+按操作系统选择实现：网卡枚举、默认网关、系统代理与 VPN 检测，全部直接读取系统接口，不启动子进程
+- Linux：/proc 与 /sys、环境变量（netplatform.linux）
+- Windows：iphlpapi（ctypes）与注册表（netplatform.windows）
+- 其他平台：标准库的通用实现（netplatform.base）
+"""
+
+import sys
+import threading
+
+from .base import Interface, NetBackend, normalize_proxies
+
+__all__ = [
+    'Interface',
+    'NetBackend',
+    'normalize_proxies',
+    'get_backend',
+]
+
+_backend = None
+_lock = threading.Lock()
+
+
+def get_backend() -> NetBackend:
+    """当前平台的后端（首次调用时创建，之后复用）"""
+    global _backend
+    with _lock:
+        if _backend is None:
+            if sys.platform.startswith("linux"):
+                from .linux import LinuxBackend
+                _backend = LinuxBackend()
+            elif sys.platform == "win32":
+                from .windows import WindowsBackend
+                _backend = WindowsBackend()
+            else:
+                _backend = NetBackend()
+        return _backend
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+平台后端的公共接口与通用实现
+通用实现只用标准库（socket / urllib），在没有专门后端的平台（如 macOS）上使用
+"""
+
+from __future__ import annotations
+
+import socket
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# VPN 虚拟网卡的常见名称前缀（Linux / macOS）与适配器描述中的关键字（Windows），均为小写
+VPN_NAME_PREFIXES = ("cscotun", "tun", "utun", "vpn", "ppp", "wg", "ipsec")
+VPN_DESCRIPTION_MARKERS = ("cisco anyconnect", "vpn")
+
+
+@dataclass
+class Interface:
+    """一块网卡"""
+    name: str
+    description: str = ""                           # Windows 的适配器描述；Linux 与 name 相同
+    up: bool = False
+    virtual: bool = False                           # 点对点 / 隧道设备（VPN 常用）
+    addresses: List[str] = field(default_factory=list)
+
+    @property
+    def looks_like_vpn(self) -> bool:
+        name, description = self.name.lower(), self.description.lower()
+        return (self.virtual or name.startswith(VPN_NAME_PREFIXES)
+                or any(marker in description for marker in VPN_DESCRIPTION_MARKERS))
+
+
+def normalize_proxies(proxies: Dict[str, str]) -> Optional[Dict[str, str]]:
+    """只保留 http / https，并补全 http:// 前缀（与 requests 的 proxies 参数格式一致）"""
+    out = {}
+    for scheme in ("http", "https"):
+        addr = (proxies.get(scheme) or "").strip()
+        if addr:
+            out[scheme] = addr if "://" in addr else f"http://{addr}"
+    return out or None
+
+
+class NetBackend:
+    """网卡枚举、默认网关、系统代理与 VPN 检测（通用实现）"""
+
+    name = "generic"
+
+    def interfaces(self) -> List[Interface]:
+        out = []
+        try:
+            names = [name for _, name in socket.if_nameindex()]
+        except (OSError, AttributeError):
+            names = []
+        for name in names:
+            out.append(Interface(name, name, up=True))
+        return out
+
+    def default_gateway(self) -> Optional[Tuple[str, str]]:
+        """默认路由的 (网卡名, 网关地址)；未知时返回 None"""
+        return None
+
+    def system_proxy(self) -> Optional[Dict[str, str]]:
+        """系统（或环境变量）中设置的代理，格式同 requests 的 proxies；没有设置时返回 None"""
+        return normalize_proxies(urllib.request.getproxies())
+
+    def vpn_interface(self) -> Optional[Interface]:
+        """已连接（启用且分配了地址）的 VPN 网卡；没有时返回 None"""
+        for iface in self.interfaces():
+            if iface.up and iface.addresses and iface.looks_like_vpn:
+                return iface
+        return None
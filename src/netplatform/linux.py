@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Linux 后端：直接读取 /proc 与 /sys，不启动子进程
+- 网卡及其状态、类型：/sys/class/net/<网卡>/{flags,type}
+- IPv4 地址：/proc/net/fib_trie 中的本机地址，按 /proc/net/route 的直连路由归属到网卡
+- IPv6 地址：/proc/net/if_inet6
+- 默认网关：/proc/net/route
+- 代理：环境变量 http_proxy / https_proxy / all_proxy
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import os
+import socket
+import struct
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from .base import Interface, NetBackend, normalize_proxies
+
+IFF_UP = 0x1
+RTF_UP = 0x1
+RTF_GATEWAY = 0x2
+
+ARPHRD_PPP = 512
+ARPHRD_LOOPBACK = 772
+ARPHRD_NONE = 65534  # tun 设备（OpenConnect / AnyConnect 的 cscotun0 等）
+
+Route = Tuple[str, int, int, int, int, int]  # (网卡, 目的网络, 网关, 标志, 掩码, 跃点数)，地址为主机字节序整数
+
+
+def _hex_ip(value: str) -> int:
+    """/proc/net/route 中的地址是小端序十六进制"""
+    return struct.unpack(">L", struct.pack("<L", int(value, 16)))[0]
+
+
+class LinuxBackend(NetBackend):
+    """
+    :param root: 文件系统根目录（测试时指向伪造的目录树）
+    :param environ: 读取代理设置的环境变量（缺省为 os.environ）
+    """
+
+    name = "linux"
+
+    def __init__(self, root: str = "/", environ: Optional[Mapping[str, str]] = None):
+        self.root = root
+        self.environ = os.environ if environ is None else environ
+
+    def _read(self, *parts: str) -> str:
+        try:
+            with open(os.path.join(self.root, *parts), "r", encoding="ascii", errors="replace") as f:
+                return f.read()
+        except OSError:
+            return ""
+
+    def _int(self, *parts: str, base: int = 10) -> int:
+        try:
+            return int(self._read(*parts).strip(), base)
+        except ValueError:
+            return 0
+
+    def routes(self) -> List[Route]:
+        out = []
+        for line in self._read("proc", "net", "route").splitlines()[1:]:
+            fields = line.split()
+            if len(fields) < 8:
+                continue
+            try:
+                out.append((fields[0], _hex_ip(fields[1]), _hex_ip(fields[2]), int(fields[3], 16),
+                            _hex_ip(fields[7]), int(fields[6])))
+            except ValueError:
+                continue
+        return out
+
+    def _local_ipv4(self) -> List[str]:
+        """fib_trie 中标记为 "/32 host LOCAL" 的本机地址"""
+        out, last = [], None
+        for line in self._read("proc", "net", "fib_trie").splitlines():
+            text = line.strip()
+            if text.startswith("|--"):
+                last = text[3:].strip()
+            elif last and text.startswith("/32 host LOCAL") and last not in out:
+                out.append(last)
+        return out
+
+    def _ipv4_by_interface(self, loopbacks: List[str]) -> Dict[str, List[str]]:
+        """按直连路由（无网关、掩码最长者）把本机地址归属到网卡；127.0.0.0/8 归属回环网卡"""
+        direct = [(iface, dest, mask) for iface, dest, _, flags, mask, _ in self.routes()
+                  if flags & RTF_UP and not flags & RTF_GATEWAY]
+        out: Dict[str, List[str]] = {}
+        for ip in self._local_ipv4():
+            try:
+                value = int(ipaddress.IPv4Address(ip))
+            except ValueError:
+                continue
+            if ip.startswith("127.") and loopbacks:
+                owner = loopbacks[0]
+            else:
+                matches = [(mask, iface) for iface, dest, mask in direct if value & mask == dest]
+                if not matches:
+                    continue
+                owner = max(matches)[1]
+            out.setdefault(owner, []).append(ip)
+        return out
+
+    def _ipv6_by_interface(self) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {}
+        for line in self._read("proc", "net", "if_inet6").splitlines():
+            fields = line.split()
+            if len(fields) < 6 or len(fields[0]) != 32:
+                continue
+            try:
+                ip = str(ipaddress.IPv6Address(bytes.fromhex(fields[0])))
+            except ValueError:
+                continue
+            out.setdefault(fields[5], []).append(ip)
+        return out
+
+    def interfaces(self) -> List[Interface]:
+        try:
+            names = sorted(os.listdir(os.path.join(self.root, "sys", "class", "net")))
+        except OSError:
+            return super().interfaces()
+        types = {name: self._int("sys", "class", "net", name, "type") for name in names}
+        v4 = self._ipv4_by_interface([n for n in names if types[n] == ARPHRD_LOOPBACK])
+        v6 = self._ipv6_by_interface()
+        return [
+            Interface(
+                name,
+                name,
+                up=bool(self._int("sys", "class", "net", name, "flags", base=16) & IFF_UP),
+                virtual=types[name] in (ARPHRD_NONE, ARPHRD_PPP),
+                addresses=v4.get(name, []) + v6.get(name, []),
+            )
+            for name in names
+        ]
+
+    def default_gateway(self) -> Optional[Tuple[str, str]]:
+        defaults = [(metric, iface, gateway) for iface, dest, gateway, flags, mask, metric in self.routes()
+                    if dest == 0 and mask == 0 and flags & RTF_UP]
+        if not defaults:
+            return None
+        _, iface, gateway = min(defaults)
+        return iface, socket.inet_ntoa(struct.pack(">L", gateway))
+
+    def system_proxy(self) -> Optional[Dict[str, str]]:
+        env = self.environ
+        fallback = env.get("all_proxy") or env.get("ALL_PROXY") or ""
+        return normalize_proxies({
+            scheme: env.get(f"{scheme}_proxy") or env.get(f"{scheme.upper()}_PROXY") or fallback
+            for scheme in ("http", "https")
+        })
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Windows 后端：通过 ctypes 调用 iphlpapi，读取注册表，不启动 tasklist / ipconfig 子进程，也不解析 GBK 文本
+- 网卡、地址、网关：GetAdaptersAddresses
+- 默认网关：GetBestInterface 选出访问公网所用的网卡，取其网关
+- 系统代理：HKCU\\Software\\Microsoft\\Windows\\CurrentVersion\\Internet Settings
+"""
+
+from __future__ import annotations
+
+import ctypes
+import socket
+import struct
+import winreg
+from ctypes import wintypes
+from typing import Dict, List, Optional, Tuple
+
+from .base import Interface, NetBackend
+
+AF_UNSPEC = 0
+AF_INET = 2
+AF_INET6 = 23
+
+GAA_FLAG_SKIP_ANYCAST = 0x2
+GAA_FLAG_SKIP_MULTICAST = 0x4
+GAA_FLAG_SKIP_DNS_SERVER = 0x8
+GAA_FLAG_INCLUDE_GATEWAYS = 0x80
+
+ERROR_BUFFER_OVERFLOW = 111
+IF_OPER_STATUS_UP = 1
+IF_TYPE_PPP = 23
+
+# 用于选出默认路由所在网卡的公网地址（只查路由表）
+_PROBE_ADDRESS = "8.8.8.8"
+
+INTERNET_SETTINGS = r"Software\Microsoft\Windows\CurrentVersion\Internet Settings"
+
+
+class SOCKET_ADDRESS(ctypes.Structure):
+    _fields_ = [("lpSockaddr", ctypes.c_void_p), ("iSockaddrLength", ctypes.c_int)]
+
+
+class IP_ADAPTER_UNICAST_ADDRESS(ctypes.Structure):
+    pass
+
+
+# 只声明需要读取的前几个字段（结构体只通过指针访问，后面的字段可以省略）
+IP_ADAPTER_UNICAST_ADDRESS._fields_ = [
+    ("Length", wintypes.ULONG),
+    ("Flags", wintypes.DWORD),
+    ("Next", ctypes.POINTER(IP_ADAPTER_UNICAST_ADDRESS)),
+    ("Address", SOCKET_ADDRESS),
+]
+
+
+class IP_ADAPTER_GATEWAY_ADDRESS(ctypes.Structure):
+    pass
+
+
+IP_ADAPTER_GATEWAY_ADDRESS._fields_ = [
+    ("Length", wintypes.ULONG),
+    ("Reserved", wintypes.DWORD),
+    ("Next", ctypes.POINTER(IP_ADAPTER_GATEWAY_ADDRESS)),
+    ("Address", SOCKET_ADDRESS),
+]
+
+
+class IP_ADAPTER_ADDRESSES(ctypes.Structure):
+    pass
+
+
+IP_ADAPTER_ADDRESSES._fields_ = [
+    ("Length", wintypes.ULONG),
+    ("IfIndex", wintypes.DWORD),
+    ("Next", ctypes.POINTER(IP_ADAPTER_ADDRESSES)),
+    ("AdapterName", ctypes.c_char_p),
+    ("FirstUnicastAddress", ctypes.POINTER(IP_ADAPTER_UNICAST_ADDRESS)),
+    ("FirstAnycastAddress", ctypes.c_void_p),
+    ("FirstMulticastAddress", ctypes.c_void_p),
+    ("FirstDnsServerAddress", ctypes.c_void_p),
+    ("DnsSuffix", ctypes.c_wchar_p),
+    ("Description", ctypes.c_wchar_p),
+    ("FriendlyName", ctypes.c_wchar_p),
+    ("PhysicalAddress", ctypes.c_ubyte * 8),
+    ("PhysicalAddressLength", wintypes.ULONG),
+    ("Flags", wintypes.ULONG),
+    ("Mtu", wintypes.ULONG),
+    ("IfType", wintypes.DWORD),
+    ("OperStatus", ctypes.c_int),
+    ("Ipv6IfIndex", wintypes.DWORD),
+    ("ZoneIndices", wintypes.DWORD * 16),
+    ("FirstPrefix", ctypes.c_void_p),
+    ("TransmitLinkSpeed", ctypes.c_ulonglong),
+    ("ReceiveLinkSpeed", ctypes.c_ulonglong),
+    ("FirstWinsServerAddress", ctypes.c_void_p),
+    ("FirstGatewayAddress", ctypes.POINTER(IP_ADAPTER_GATEWAY_ADDRESS)),
+]
+
+
+def _sockaddr_ip(address: SOCKET_ADDRESS) -> Optional[str]:
+    if not address.lpSockaddr or address.iSockaddrLength < 8:
+        return None
+    raw = ctypes.string_at(address.lpSockaddr, address.iSockaddrLength)
+    family = struct.unpack_from("<H", raw)[0]
+    if family == AF_INET:
+        return socket.inet_ntop(socket.AF_INET, raw[4:8])
+    if family == AF_INET6 and len(raw) >= 24:
+        return socket.inet_ntop(socket.AF_INET6, raw[8:24])
+    return None
+
+
+def _walk(first):
+    node = first
+    while node:
+        yield node.contents
+        node = node.contents.Next
+
+
+class WindowsBackend(NetBackend):
+    name = "windows"
+
+    def __init__(self):
+        self._iphlpapi = ctypes.WinDLL("iphlpapi")
+
+    def _adapters(self) -> List[Tuple[int, Interface, List[str]]]:
+        """[(IPv4 接口序号, 网卡, 网关地址)]"""
+        flags = (GAA_FLAG_SKIP_ANYCAST | GAA_FLAG_SKIP_MULTICAST | GAA_FLAG_SKIP_DNS_SERVER
+                 | GAA_FLAG_INCLUDE_GATEWAYS)
+        size = wintypes.ULONG(16 * 1024)
+        for _ in range(3):
+            buf = ctypes.create_string_buffer(size.value)
+            ret = self._iphlpapi.GetAdaptersAddresses(AF_UNSPEC, flags, None, buf, ctypes.byref(size))
+            if ret != ERROR_BUFFER_OVERFLOW:
+                break
+        if ret != 0:
+            print(f"[netplatform] [WARNING] GetAdaptersAddresses 失败，错误码 {ret}")
+            return []
+
+        out = []
+        for a in _walk(ctypes.cast(buf, ctypes.POINTER(IP_ADAPTER_ADDRESSES))):
+            addresses = [ip for ip in (_sockaddr_ip(u.Address) for u in _walk(a.FirstUnicastAddress))
+                         if ip and ip != "0.0.0.0"]
+            gateways = [ip for ip in (_sockaddr_ip(g.Address) for g in _walk(a.FirstGatewayAddress)) if ip]
+            iface = Interface(
+                a.FriendlyName or (a.AdapterName or b"").decode("ascii", "replace"),
+                a.Description or "",
+                up=a.OperStatus == IF_OPER_STATUS_UP,
+                virtual=a.IfType == IF_TYPE_PPP,
+                addresses=addresses,
+            )
+            out.append((a.IfIndex, iface, gateways))
+        return out
+
+    def interfaces(self) -> List[Interface]:
+        return [iface for _, iface, _ in self._adapters()]
+
+    def default_gateway(self) -> Optional[Tuple[str, str]]:
+        best = wintypes.DWORD()
+        dest = struct.unpack("<L", socket.inet_aton(_PROBE_ADDRESS))[0]
+        if self._iphlpapi.GetBestInterface(wintypes.DWORD(dest), ctypes.byref(best)) != 0:
+            return None
+        for index, iface, gateways in self._adapters():
+            v4 = [g for g in gateways if ":" not in g]
+            if index == best.value and v4:
+                return iface.name, v4[0]
+        return None
+
+    def system_proxy(self) -> Optional[Dict[str, str]]:
+        """
+        从注册表读取系统代理设置
+        返回格式：{"http": "http://127.0.0.1:9000", "https": "http://127.0.0.1:9000"} 或 None
+        """
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, INTERNET_SETTINGS, 0, winreg.KEY_READ) as key:
+                # 检查是否启用代理
+                proxy_enable, _ = winreg.QueryValueEx(key, "ProxyEnable")
+                if not proxy_enable:
+                    return None
+                # 读取代理服务器地址
+                proxy_server, _ = winreg.QueryValueEx(key, "ProxyServer")
+        except OSError as e:
+            print(f"[netplatform] 读取系统代理失败: {e}")
+            return None
+
+        if not proxy_server:
+            return None
+
+        # 解析代理地址
+        # 格式1: "127.0.0.1:9000"
+        # 格式2: "http=127.0.0.1:9000;https=127.0.0.1:9000"
+        if "=" in proxy_server:
+            # 多协议代理
+            proxies = {}
+            for part in proxy_server.split(";"):
+                if "=" in part:
+                    protocol, addr = part.split("=", 1)
+                    proxies[protocol.strip()] = f"http://{addr.strip()}"
+            return proxies or None
+        # 单一代理地址
+        return {"http": f"http://{proxy_server}", "https": f"http://{proxy_server}"}
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+房间占用数据获取
+通过共用的长连接客户端并发查询每个房间某天的已有预订，结果写入 TTL 缓存；
+缓存过期后带 If-None-Match / If-Modified-Since 发条件请求，服务器返回 304 时直接沿用缓存的记录。
+获取的数据可写入 availability.AvailabilityIndex，供规划与热力图使用。
+
+占用接口的地址与参数可通过配置覆盖（occupancy_url）；响应为 JSON，
+可以是记录列表，或 {"list"/"rows"/"data": [...]} 形式，每条记录含 startTime / endTime（"YYYY-MM-DD HH:MM[:SS]"）。
+
+注意：接口地址与上述响应格式都是按预订页面其他接口的命名推测的（如 /a/field/book/bizFieldBookMain/listData），
+尚未对照真实响应核实，因此没有默认地址：未配置 occupancy_url 时热力图与捡漏停用。
+测试用的 tests/fixtures/occupancy_2025-09-17.json 也是按这一假设手工构造的，不是录制的。
+响应格式无法识别时 parse_occupancy 抛出 ValueError，查询沿用缓存的旧数据。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from constants import OCCUPANCY_DISABLED_HINT
+from main import FID_MAP
+
+# 缓存有效期（秒）：期内直接使用缓存，过期后发条件请求
+OCCUPANCY_TTL = 60.0
+
+# 并发查询数（同时也是连接池大小的参考值）
+DEFAULT_WORKERS = 8
+
+Record = Tuple[str, str]  # (start_ts, end_ts)，格式 "YYYY-MM-DD HH:MM"
+
+
+def parse_occupancy(content: bytes, day: date) -> List[Record]:
+    """
+    解析占用接口的响应，只保留与 day 相交的记录（跨天的记录截断到当天）
+    响应不是 JSON（被重定向到登录页），或是 JSON 但找不到记录列表（出错信息、格式不符）时抛出 ValueError
+    """
+    data = json.loads(content.decode("utf-8", errors="replace"))
+    if isinstance(data, dict):
+        rows = next((data[k] for k in ("list", "rows", "data") if isinstance(data.get(k), list)), None)
+    else:
+        rows = data
+    if not isinstance(rows, list):
+        raise ValueError(f"无法识别的占用数据: {str(data)[:80]}")
+    d = day.strftime("%Y-%m-%d")
+    out: List[Record] = []
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        start = str(row.get("startTime") or "")[:16]
+        end = str(row.get("endTime") or "")[:16]
+        if len(start) != 16 or len(end) != 16 or start >= end:
+            continue
+        if end[:10] < d or start[:10] > d:
+            continue
+        out.append((max(start, f"{d} 00:00"), min(end, f"{d} 24:00")))
+    return sorted(out)
+
+
+@dataclass
+class CacheEntry:
+    records: List[Record]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class OccupancyCache:
+    """按 (房间, 日期) 缓存占用记录及其校验信息"""
+
+    def __init__(self, ttl: float = OCCUPANCY_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: Dict[Tuple[str, date], CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, place: str, day: date) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._entries.get((place, day))
+
+    def fresh(self, entry: CacheEntry) -> bool:
+        return self.clock() - entry.fetched_at < self.ttl
+
+    def put(self, place: str, day: date, records: List[Record],
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> CacheEntry:
+        entry = CacheEntry(records, etag, last_modified, self.clock())
+        with self._lock:
+            self._entries[(place, day)] = entry
+        return entry
+
+    def touch(self, place: str, day: date):
+        """条件请求返回 304：记录不变，重新计时"""
+        with self._lock:
+            entry = self._entries.get((place, day))
+            if entry is not None:
+                entry.fetched_at = self.clock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class OccupancyFetcher:
+    """
+    并发获取所有房间的占用数据
+
+    :param client: 长连接客户端（main.CrazyRequests），所有查询共用其连接池
+    :param url: 占用查询接口
+    :param cache: 占用缓存（可跨多个 fetcher 共用）
+    :param max_workers: 并发查询数
+    """
+
+    def __init__(self, client, url: str, cache: Optional[OccupancyCache] = None,
+                 max_workers: int = DEFAULT_WORKERS):
+        if not url:
+            raise ValueError(OCCUPANCY_DISABLED_HINT)
+        self.client = client
+        self.url = url
+        self.cache = cache if cache is not None else OccupancyCache()
+        self.max_workers = max(1, max_workers)
+        self.n_requests = 0
+        self.n_not_modified = 0
+        self.n_cache_hits = 0
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def fetch(self, place: str, day: date) -> Optional[List[Record]]:
+        """单个房间某天的占用记录；失败时返回过期的缓存（没有缓存则为 None）"""
+        entry = self.cache.get(place, day)
+        if entry is not None and self.cache.fresh(entry):
+            self._count("n_cache_hits")
+            return entry.records
+        fid = FID_MAP.get(place)
+        if fid is None:
+            return None
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        stale = entry.records if entry is not None else None
+        try:
+            self._count("n_requests")
+            response = self.client.get(self.url, params={"fid": fid, "date": day.strftime("%Y-%m-%d")},
+                                       headers=headers or None)
+        except IOError as e:
+            print(f"[Occupancy] [WARNING] 查询失败 {place}: {type(e).__name__}")
+            return stale
+        if response.status_code == 304 and entry is not None:
+            self._count("n_not_modified")
+            self.cache.touch(place, day)
+            return entry.records
+        if response.status_code != 200:
+            print(f"[Occupancy] [WARNING] 查询失败 {place}: HTTP {response.status_code}")
+            return stale
+        try:
+            records = parse_occupancy(response.content, day)
+        except ValueError:
+            print(f"[Occupancy] [WARNING] {place} 的响应无法解析，Cookie 可能已过期或接口格式不符")
+            return stale
+        self.cache.put(place, day, records, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return records
+
+    def fetch_all(self, day: date, places: Optional[Iterable[str]] = None) -> Dict[str, List[Record]]:
+        """并发查询所有（指定的）房间，返回 {place: records}；查询失败的房间不出现"""
+        places = list(places) if places is not None else list(FID_MAP)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(places) or 1),
+                                thread_name_prefix="occupancy") as pool:
+            results = list(pool.map(lambda p: self.fetch(p, day), places))
+        return {p: r for p, r in zip(places, results) if r is not None}
+
+    def fill(self, index, day: date, places: Optional[Iterable[str]] = None) -> Dict[str, List[Record]]:
+        """查询并写入空闲索引（以本次结果整体替换这些房间当天的记录）"""
+        results = self.fetch_all(day, places)
+        index.load_occupancy(
+            ((place, start, end) for place, records in results.items() for start, end in records),
+            day=day,
+            places=list(results),
+        )
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.n_requests,
+                "not_modified": self.n_not_modified,
+                "cache_hits": self.n_cache_hits,
+            }
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+连接预热模块
+在目标时间前 N 秒解析并固定 DNS、建立并保活若干条连接，
+让到点后的第一个 saveData POST 直接走已握手的连接
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from dns_cache import DNS_CACHE
+
+# 预热/保活请求的目标（HEAD 请求，不跟随重定向，响应体为空）
+PREWARM_URL = "https://booking.cuhk.edu.cn/"
+
+# 到点前多久停止保活，避免 ping 恰好占用连接
+PING_QUIET_SECONDS = 0.5
+
+
+class ConnectionPrewarmer(threading.Thread):
+    """
+    到点前预热连接的后台线程
+
+    使用与 BookingWorker 相同的长连接客户端（main.get_client 按 proxies + cookie 共享），
+    因此预热建立的连接会留在同一个连接池里供预订请求复用
+    """
+
+    def __init__(
+        self,
+        client,
+        target_time: datetime,
+        lead_seconds: float = 15.0,
+        connections: int = 2,
+        ping_interval: float = 5.0,
+        url: str = PREWARM_URL,
+    ):
+        super().__init__(daemon=True)
+        self.client = client
+        self.target_time = target_time
+        self.lead_seconds = max(0.0, float(lead_seconds))
+        # 同时保活的连接数不能超过连接池容量，否则多余的连接会被丢弃
+        self.connections = max(1, min(int(connections), client.pool_size))
+        self.ping_interval = max(0.5, float(ping_interval))
+        self.url = url
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _seconds_until(self, dt: datetime) -> float:
+        return (dt - datetime.now()).total_seconds()
+
+    def resolve_dns(self):
+        """提前解析并固定目标主机（直连）或代理主机（代理模式）的地址，到点后建连不再查询 DNS"""
+        if self.client.use_proxy:
+            proxy = self.client.proxies.get("https") or self.client.proxies.get("http") or ""
+            if "://" not in proxy:
+                proxy = "http://" + proxy
+            parts = urlsplit(proxy)
+        else:
+            parts = urlsplit(self.url)
+        host = parts.hostname
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        if not host:
+            return
+        try:
+            infos = DNS_CACHE.pin(host, port)
+            addrs = sorted({info[4][0] for info in infos})
+            print(f"[Prewarm] DNS 已固定: {host} -> {', '.join(addrs)}")
+        except OSError as e:
+            print(f"[Prewarm] [WARNING] DNS 解析失败: {host}: {e}")
+
+    def _ping(self, _=None) -> bool:
+        try:
+            self.client.head(self.url)
+            return True
+        except Exception as e:
+            print(f"[Prewarm] [WARNING] 保活请求失败: {type(e).__name__}: {str(e)[:100]}")
+            return False
+
+    def ping_all(self, pool: ThreadPoolExecutor) -> int:
+        """并发发出 connections 个请求，使连接池中保持同样数量的活动连接"""
+        return sum(pool.map(self._ping, range(self.connections)))
+
+    def run(self):
+        delay = self._seconds_until(self.target_time) - self.lead_seconds
+        if delay > 0 and self._stop_event.wait(delay):
+            return
+
+        print(f"[Prewarm] 开始预热 {self.connections} 条连接（目标时间 {self.target_time:%H:%M:%S}）")
+        self.resolve_dns()
+        with ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="prewarm") as pool:
+            ok = self.ping_all(pool)
+            st = self.client.stats()
+            print(f"[Prewarm] [OK] 已建立 {ok}/{self.connections} 条连接，累计新建连接 {st['connections']} 次")
+            for ip, ip_st in DNS_CACHE.stats().items():
+                if ip_st.latency is not None:
+                    print(f"[Prewarm] 地址 {ip} 建连耗时 {ip_st.latency * 1000:.1f} ms（成功 {ip_st.successes} 次，失败 {ip_st.failures} 次）")
+
+            # 保活：直到目标时间前 PING_QUIET_SECONDS 秒
+            while not self._stop_event.is_set():
+                remaining = self._seconds_until(self.target_time) - PING_QUIET_SECONDS
+                if remaining <= 0:
+                    break
+                if self._stop_event.wait(min(self.ping_interval, remaining)):
+                    break
+                if self._seconds_until(self.target_time) - PING_QUIET_SECONDS > 0:
+                    self.ping_all(pool)
+        print("[Prewarm] 预热结束，连接已就绪")
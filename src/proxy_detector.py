@@ -2,12 +2,22 @@
 """
 智能代理检测模块
 自动检测并配置可用的代理，无需手动输入
+所有端口并发扫描，直连 / 本地代理 / 系统代理三类候选并行验证，整体受总时限约束
 """
 
-import winreg
 import socket
+import time
 import requests
-from typing import Optional, Dict, List, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, Dict, List, Tuple
+
+from netplatform import get_backend
+
+# 自动检测的默认总时限（秒）
+DETECT_DEADLINE = 6.0
+
+# 已有候选验证通过后，最多再等待更高优先级的候选多少秒
+PRIORITY_GRACE = 1.0
 
 
 class ProxyDetector:
@@ -37,44 +47,17 @@ class ProxyDetector:
     def is_anyconnect_connected() -> bool:
         """
         检测Cisco AnyConnect VPN是否已连接
-        通过检查进程和网络适配器来判断
+        通过平台后端查找已启用且分配了地址的 VPN 网卡（Windows 为 AnyConnect 虚拟适配器，Linux 为 cscotun0 等 tun 设备）
         """
-        import subprocess
-        import re
-
         try:
-            # 方法1：检查AnyConnect进程是否在运行
-            tasklist_output = subprocess.check_output("tasklist", shell=True).decode('gbk', errors='ignore')
-            if "vpnagent.exe" in tasklist_output.lower() or "vpnui.exe" in tasklist_output.lower():
-                print("[ProxyDetector] 检测到 AnyConnect 进程正在运行")
-
-                # 方法2：检查是否有Cisco虚拟适配器
-                try:
-                    ipconfig_output = subprocess.check_output("ipconfig /all", shell=True).decode('gbk', errors='ignore')
-                    # 查找Cisco AnyConnect虚拟适配器
-                    if "cisco anyconnect" in ipconfig_output.lower() or "vpn" in ipconfig_output.lower():
-                        # 检查是否有IP地址分配（表示已连接）
-                        lines = ipconfig_output.split('\n')
-                        in_cisco_adapter = False
-                        for line in lines:
-                            if "cisco anyconnect" in line.lower() or "vpn" in line.lower():
-                                in_cisco_adapter = True
-                            elif in_cisco_adapter and "ipv4" in line.lower():
-                                # 找到了IP地址
-                                match = re.search(r'(\d+\.\d+\.\d+\.\d+)', line)
-                                if match and match.group(1) != "0.0.0.0":
-                                    print(f"[ProxyDetector] AnyConnect 已连接，VPN IP: {match.group(1)}")
-                                    return True
-                            elif line.strip() and not line.startswith(' '):
-                                in_cisco_adapter = False
-
-                except Exception as e:
-                    print(f"[ProxyDetector] 检查网络适配器失败: {e}")
-
+            iface = get_backend().vpn_interface()
         except Exception as e:
             print(f"[ProxyDetector] 检测 AnyConnect 失败: {e}")
-
-        return False
+            return False
+        if iface is None:
+            return False
+        print(f"[ProxyDetector] AnyConnect 已连接（{iface.description or iface.name}），VPN IP: {iface.addresses[0]}")
+        return True
 
     @staticmethod
     def test_direct_connection(timeout: float = 5.0) -> bool:
@@ -156,49 +139,11 @@ class ProxyDetector:
     @staticmethod
     def get_system_proxy() -> Optional[Dict[str, str]]:
         """
-        从Windows注册表读取系统代理设置
-        返回格式：{"http": "127.0.0.1:9000", "https": "127.0.0.1:9000"} 或 None
+        读取系统代理设置（Windows 为注册表，Linux 为 http_proxy 等环境变量）
+        返回格式：{"http": "http://127.0.0.1:9000", "https": "http://127.0.0.1:9000"} 或 None
         """
         try:
-            # 打开注册表项
-            key = winreg.OpenKey(
-                winreg.HKEY_CURRENT_USER,
-                r"Software\Microsoft\Windows\CurrentVersion\Internet Settings",
-                0,
-                winreg.KEY_READ
-            )
-
-            # 检查是否启用代理
-            proxy_enable, _ = winreg.QueryValueEx(key, "ProxyEnable")
-            if not proxy_enable:
-                winreg.CloseKey(key)
-                return None
-
-            # 读取代理服务器地址
-            proxy_server, _ = winreg.QueryValueEx(key, "ProxyServer")
-            winreg.CloseKey(key)
-
-            if not proxy_server:
-                return None
-
-            # 解析代理地址
-            # 格式1: "127.0.0.1:9000"
-            # 格式2: "http=127.0.0.1:9000;https=127.0.0.1:9000"
-            if "=" in proxy_server:
-                # 多协议代理
-                proxies = {}
-                for part in proxy_server.split(";"):
-                    if "=" in part:
-                        protocol, addr = part.split("=", 1)
-                        proxies[protocol.strip()] = f"http://{addr.strip()}"
-                return proxies if proxies else None
-            else:
-                # 单一代理地址
-                return {
-                    "http": f"http://{proxy_server}",
-                    "https": f"http://{proxy_server}"
-                }
-
+            return get_backend().system_proxy()
         except Exception as e:
             print(f"[ProxyDetector] 读取系统代理失败: {e}")
             return None
@@ -252,102 +197,207 @@ class ProxyDetector:
         return False
 
     @staticmethod
-    def detect_local_proxies() -> List[Tuple[str, int]]:
+    def detect_local_proxies(timeout: float = 0.5) -> List[Tuple[str, int]]:
         """
-        检测本地正在运行的代理软件
-        返回：[(软件名, 端口)]
+        检测本地正在运行的代理软件（所有端口并发探测，总耗时约为单个端口的超时）
+        返回：[(软件名, 端口)]，顺序与 COMMON_PROXY_PORTS 一致
         """
+        ports = sorted({port for _, port in ProxyDetector.COMMON_PROXY_PORTS})
+        with ThreadPoolExecutor(max_workers=len(ports), thread_name_prefix="port-scan") as pool:
+            open_ports = dict(zip(ports, pool.map(
+                lambda port: ProxyDetector.is_port_open("127.0.0.1", port, timeout=timeout), ports)))
+
         available = []
         for name, port in ProxyDetector.COMMON_PROXY_PORTS:
-            if ProxyDetector.is_port_open("127.0.0.1", port, timeout=0.5):
+            if open_ports[port]:
                 print(f"[ProxyDetector] 检测到 {name} 正在运行（端口 {port}）")
                 available.append((name, port))
         return available
 
     @staticmethod
-    def auto_detect() -> Optional[Dict[str, str]]:
+    def _candidates(local_proxies: List[Tuple[str, int]], timeout: float) -> List[Tuple[str, Callable[[], Tuple[bool, Optional[Dict[str, str]]]]]]:
         """
-        自动检测可用的网络配置
+        按优先级排列的候选线路：本地代理（Reqable 等）> 直接连接 > 系统代理
+        每个候选返回 (是否可用, 代理字典)，代理字典为 None 表示直接连接
+        """
+        candidates = []
+        for name, port in local_proxies:
+            proxy_dict = {
+                "http": f"http://127.0.0.1:{port}",
+                "https": f"http://127.0.0.1:{port}"
+            }
+
+            def check_local(proxy_dict=proxy_dict, name=name, port=port):
+                print(f"[ProxyDetector] 测试 {name} (127.0.0.1:{port})...")
+                ok = ProxyDetector.test_proxy(proxy_dict, timeout=min(3.0, timeout))
+                if not ok:
+                    print(f"[ProxyDetector] [FAIL] {name} 代理无法访问学校网站")
+                return ok, proxy_dict
 
-        优先级（已针对 booking.cuhk.edu.cn 的 SSL 问题优化）：
-        1. 本地代理软件（Reqable）- 优先检测，因为 booking 接口需要通过 Reqable
-        2. 直接连接测试（校园网内或 AnyConnect VPN）- 仅当 Reqable 未运行时使用
-        3. 系统代理设置
+            candidates.append((f"{name} (127.0.0.1:{port})", check_local))
 
-        返回格式：
-        - None: 表示使用直接连接（不使用代理）
-        - {"http": "127.0.0.1:9000", "https": "127.0.0.1:9000"}: 使用代理
+        def check_direct():
+            return ProxyDetector.test_direct_connection(timeout=min(5.0, timeout)), None
 
-        注意：由于 booking.cuhk.edu.cn 的 SSL 配置特殊，Python requests 库无法
-        直接连接（即使通过 VPN），因此优先检测 Reqable 代理。
+        def check_system():
+            sys_proxy = ProxyDetector.get_system_proxy()
+            if not sys_proxy:
+                return False, None
+            print(f"[ProxyDetector] 找到系统代理: {sys_proxy}")
+            ok = ProxyDetector.test_proxy(sys_proxy, timeout=min(3.0, timeout))
+            if not ok:
+                print("[ProxyDetector] [FAIL] 系统代理无法访问学校网站")
+            return ok, sys_proxy
+
+        candidates.append(("直接连接", check_direct))
+        candidates.append(("系统代理", check_system))
+        return candidates
+
+    @staticmethod
+    def _race(candidates, deadline: float,
+              on_result: Optional[Callable[[int, bool], None]] = None) -> Optional[Tuple[int, Optional[Dict[str, str]]]]:
+        """
+        并行验证所有候选，返回胜出候选的 (下标, 代理字典)（都不可用或超时时返回 None）
+        on_result(下标, 是否可用) 在每个候选验证完成时调用
+
+        优先级最高的可用候选胜出：某个候选验证通过、且比它优先的候选都已失败时立即返回；
+        若更优先的候选仍在验证，最多再等 PRIORITY_GRACE 秒。到达总时限时取已通过的最优候选
         """
+        end = time.monotonic() + deadline
+        results: List[Optional[bool]] = [None] * len(candidates)
+        routes: List[Optional[Dict[str, str]]] = [None] * len(candidates)
+        first_ok_at = None
+
+        pool = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="proxy-detect")
+        try:
+            futures = {pool.submit(check): i for i, (_, check) in enumerate(candidates)}
+            pending = set(futures)
+            while True:
+                for i, r in enumerate(results):
+                    if r is None:
+                        break
+                    if r:
+                        return i, routes[i]
+                best = next((i for i, r in enumerate(results) if r), None)
+                winner = (best, routes[best]) if best is not None else None
+                now = time.monotonic()
+                if not pending:
+                    return winner
+                if now >= end:
+                    print(f"[ProxyDetector] [WARNING] 检测超过总时限 {deadline:g} 秒，停止等待")
+                    return winner
+                if winner is not None and now >= first_ok_at + PRIORITY_GRACE:
+                    return winner
+
+                until = end if first_ok_at is None else min(end, first_ok_at + PRIORITY_GRACE)
+                done, pending = wait(pending, timeout=until - now, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    i = futures[fut]
+                    try:
+                        ok, routes[i] = fut.result()
+                    except Exception as e:
+                        print(f"[ProxyDetector] [FAIL] 测试失败: {e}")
+                        ok = False
+                    results[i] = bool(ok)
+                    if on_result is not None:
+                        on_result(i, results[i])
+                    if ok and first_ok_at is None:
+                        first_ok_at = time.monotonic()
+        finally:
+            # 不等待落后的候选：它们各自受请求超时约束，会在后台自行结束
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def validate(proxy_dict: Optional[Dict[str, str]], timeout: float = 3.0) -> bool:
+        """快速复核单条线路是否仍可用（proxy_dict 为 None 表示直接连接）"""
+        if proxy_dict is None:
+            return ProxyDetector.test_direct_connection(timeout=timeout)
+        return ProxyDetector.test_proxy(proxy_dict, timeout=timeout)
+
+    @staticmethod
+    def detect(deadline: float = DETECT_DEADLINE,
+               on_progress: Optional[Callable[[str], None]] = None) -> Optional[Tuple[str, Optional[Dict[str, str]]]]:
+        """
+        完整检测一次，返回胜出线路的 (名称, 代理字典)（代理字典为 None 表示直接连接）；
+        所有线路都不可用时返回 None。参数与优先级见 auto_detect
+        """
+        progress = on_progress or (lambda message: None)
         print("[ProxyDetector] 开始自动检测网络配置...")
         print("[ProxyDetector] 注意：booking接口需要Reqable代理才能正常工作")
+        started = time.monotonic()
+        progress("正在扫描本地代理端口…")
 
-        # 步骤1：优先检测本地代理软件（Reqable）
+        # 步骤1：并发扫描本地代理软件（Reqable等）的端口
         print("[ProxyDetector] 步骤1：检测本地代理软件（Reqable等）...")
-        local_proxies = ProxyDetector.detect_local_proxies()
-
+        local_proxies = ProxyDetector.detect_local_proxies(timeout=min(0.5, deadline))
         if local_proxies:
             print(f"[ProxyDetector] 找到 {len(local_proxies)} 个代理软件")
-            # 逐个测试本地代理
-            for name, port in local_proxies:
-                proxy_dict = {
-                    "http": f"http://127.0.0.1:{port}",
-                    "https": f"http://127.0.0.1:{port}"
-                }
-                print(f"[ProxyDetector] 测试 {name} (127.0.0.1:{port})...")
-                if ProxyDetector.test_proxy(proxy_dict, timeout=3):
-                    print(f"[ProxyDetector] [OK] 找到可用代理: {name} (127.0.0.1:{port})")
-                    print(f"[ProxyDetector] 建议：使用 {name} 代理进行预订")
-                    return proxy_dict
-                else:
-                    print(f"[ProxyDetector] [FAIL] {name} 代理无法访问学校网站")
         else:
             print("[ProxyDetector] 未检测到 Reqable 等代理软件正在运行")
 
-        # 步骤2：测试直接连接（校园网内或 AnyConnect VPN）
-        print("[ProxyDetector] 步骤2：测试直接连接（校园网内或VPN）...")
-        if ProxyDetector.test_direct_connection(timeout=5):
-            print("[ProxyDetector] [OK] 可以直接连接到学校网站！")
+        # 步骤2：本地代理、直接连接、系统代理并行验证
+        print("[ProxyDetector] 步骤2：并行验证本地代理、直接连接（校园网内或VPN）与系统代理...")
+        remaining = max(0.1, deadline - (time.monotonic() - started))
+        candidates = ProxyDetector._candidates(local_proxies, timeout=remaining)
+        progress(f"正在验证 {len(candidates)} 条线路…")
+
+        def on_result(i: int, ok: bool):
+            progress(f"{candidates[i][0]} {'可用' if ok else '不可用'}")
+
+        winner = ProxyDetector._race(candidates, remaining, on_result=on_result)
+        elapsed = time.monotonic() - started
+
+        if winner is not None:
+            index, proxy_dict = winner
+            label = candidates[index][0]
+            print(f"[ProxyDetector] [OK] 找到可用线路: {label}（耗时 {elapsed:.1f} 秒）")
+            progress(f"使用 {label}（检测耗时 {elapsed:.1f} 秒）")
+            if proxy_dict is not None:
+                print(f"[ProxyDetector] 建议：使用 {label} 代理进行预订")
+                return label, proxy_dict
 
             # 检测是否通过 AnyConnect VPN 连接
             if ProxyDetector.is_anyconnect_connected():
                 print("[ProxyDetector] 检测到 AnyConnect VPN 已连接")
                 print("[ProxyDetector] [WARNING] 警告：即使VPN可访问，booking接口仍可能需要Reqable")
-                print("[ProxyDetector] 建议：如果预订失败，请启动Reqable并重新检测")
             else:
                 print("[ProxyDetector] 可能在校园网内，可以直接访问")
-                print("[ProxyDetector] 建议：如果预订失败，请启动Reqable并重新检测")
-
-            return None  # 返回 None 表示不使用代理
-
-        # 如果直接连接失败，检查是否有 AnyConnect 进程但未连接
-        print("[ProxyDetector] 直接连接失败，检查 AnyConnect 状态...")
-        if ProxyDetector.is_anyconnect_connected():
-            print("[ProxyDetector] [WARNING] AnyConnect 进程在运行但无法访问学校网站")
-            print("[ProxyDetector] 可能原因：VPN 未完全建立或网络不稳定")
-            print("[ProxyDetector] 建议：检查 AnyConnect 连接状态，或启动 Reqable")
-
-        # 步骤3：检测系统代理
-        print("[ProxyDetector] 步骤3：检查系统代理设置...")
-        sys_proxy = ProxyDetector.get_system_proxy()
-        if sys_proxy:
-            print(f"[ProxyDetector] 找到系统代理: {sys_proxy}")
-            if ProxyDetector.test_proxy(sys_proxy, timeout=3):
-                print("[ProxyDetector] [OK] 系统代理可用！")
-                return sys_proxy
-            else:
-                print("[ProxyDetector] [FAIL] 系统代理无法访问学校网站")
+            print("[ProxyDetector] 建议：如果预订失败，请启动Reqable并重新检测")
+            return label, None  # 代理字典为 None 表示不使用代理
 
         # 所有方法都失败
-        print("[ProxyDetector] [FAIL] 所有检测方法都无法访问学校网站")
+        print(f"[ProxyDetector] [FAIL] 所有检测方法都无法访问学校网站（耗时 {elapsed:.1f} 秒）")
+        progress("所有线路都无法访问学校网站，请启动 Reqable、连接 VPN 或在设置中填写代理")
         print("[ProxyDetector] 建议：")
         print("  1. 启动 Reqable 代理软件（推荐，解决booking接口SSL问题）")
         print("  2. 连接 AnyConnect VPN（可用于自动登录，但预订可能需要Reqable）")
         print("  3. 或在校园网内使用")
         return None
 
+    @staticmethod
+    def auto_detect(deadline: float = DETECT_DEADLINE,
+                    on_progress: Optional[Callable[[str], None]] = None) -> Optional[Dict[str, str]]:
+        """
+        自动检测可用的网络配置
+
+        优先级（已针对 booking.cuhk.edu.cn 的 SSL 问题优化）：
+        1. 本地代理软件（Reqable）- 优先，因为 booking 接口需要通过 Reqable
+        2. 直接连接测试（校园网内或 AnyConnect VPN）- 仅当 Reqable 不可用时使用
+        3. 系统代理设置
+
+        所有候选并行验证，按上述优先级取可用者；整个检测不超过 deadline 秒。
+        on_progress(消息) 用于在界面上逐步显示检测进度（在检测线程中调用）。
+
+        返回格式：
+        - None: 表示使用直接连接（不使用代理）
+        - {"http": "127.0.0.1:9000", "https": "127.0.0.1:9000"}: 使用代理
+
+        注意：由于 booking.cuhk.edu.cn 的 SSL 配置特殊，Python requests 库无法
+        直接连接（即使通过 VPN），因此优先检测 Reqable 代理。
+        """
+        found = ProxyDetector.detect(deadline, on_progress)
+        return found[1] if found else None
+
     @staticmethod
     def format_for_config(proxy_dict: Optional[Dict[str, str]]) -> str:
         """
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+预发送（pre-staged）请求模块（可选）
+到点前在已握手的 TLS 连接上写出完整的 saveData 请求，只保留最后几个字节；
+到点时只需写出剩余字节，服务器随即收到完整请求。响应用 async_client.ResponseParser 增量解析，
+返回与 main.book() 相同的 BookingResult，交由 BookingEngine 的统一结果处理。
+"""
+
+from __future__ import annotations
+
+import socket
+import ssl
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from async_client import HttpProtocolError, ResponseParser
+from dns_cache import DNS_CACHE
+from main import FORM_CONTENT_TYPE, USER_AGENT, BookingRequestTemplate, parse_book_result
+from retry_policy import BookingResult
+from tls_policy import TLS_POLICY, ssl_context
+
+# 到点前多久建立连接并写出请求头与大部分请求体（秒）
+STAGE_LEAD = 1.0
+
+# 预发送时保留、到点才写出的字节数
+HOLD_BACK_BYTES = 1
+
+# 建连与读取响应的超时（秒），与 CrazyRequests 保持一致
+DEFAULT_TIMEOUT = 10.0
+
+_READ_SIZE = 65536
+
+
+class StagedRequest:
+    """已写出大部分字节、等待到点发送剩余部分的请求"""
+
+    def __init__(self, sock: socket.socket, tail: bytes, timeout: float = DEFAULT_TIMEOUT):
+        self.sock = sock
+        self.tail = tail
+        self.timeout = timeout
+        self.sent_at: Optional[float] = None
+        self.elapsed: Optional[float] = None
+
+    def send(self):
+        """写出剩余字节（到点时在调度线程上调用，只有一次 sendall）"""
+        if self.sent_at is None:
+            self.sock.sendall(self.tail)
+            self.sent_at = time.perf_counter()
+
+    def fire(self) -> BookingResult:
+        """写出剩余字节（若尚未写出）并读取响应，返回与 book() 相同的结果；连接异常时抛出 IOError"""
+        try:
+            self.send()
+            parser = ResponseParser()
+            while not parser.complete:
+                data = self.sock.recv(_READ_SIZE)
+                if not data:
+                    parser.feed_eof()
+                    break
+                parser.feed(data)
+            self.elapsed = time.perf_counter() - self.sent_at
+        finally:
+            self.close()
+        return parse_book_result(bytes(parser.body), parser.status_code, self.elapsed)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RawSender:
+    """
+    在原始（TLS）套接字上预发送预订请求
+
+    直连时沿用 tls_policy 中按主机缓存的验证策略与共享 SSLContext（会话可复用），
+    代理模式下经 CONNECT 隧道并禁用验证，与 CrazyRequests 一致
+    """
+
+    def __init__(self, proxies: Optional[Dict[str, str]], cookie: str, timeout: float = DEFAULT_TIMEOUT):
+        self.proxies = proxies or {}
+        self.use_proxy = bool(self.proxies)
+        self.cookie = cookie
+        self.timeout = timeout
+
+    def build_request(self, template: BookingRequestTemplate) -> bytes:
+        """组装完整的 HTTP/1.1 请求字节串（每次调用生成新的 UUID）"""
+        parts = urlsplit(template.url)
+        body = template.render()
+        target = parts.path + ("?" + parts.query if parts.query else "")
+        head = (
+            f"POST {target} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"User-Agent: {USER_AGENT}\r\n"
+            f"Cookie: {self.cookie}\r\n"
+            "Accept: */*\r\n"
+            f"Content-Type: {FORM_CONTENT_TYPE}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n"
+            "\r\n"
+        )
+        return head.encode("latin-1", errors="replace") + body
+
+    def _proxy_address(self):
+        proxy = self.proxies.get("https") or self.proxies.get("http")
+        if "://" not in proxy:
+            proxy = "http://" + proxy
+        parts = urlsplit(proxy)
+        return parts.hostname, parts.port or 80
+
+    def _tunnel(self, sock: socket.socket, host: str, port: int):
+        sock.sendall(f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode("ascii"))
+        parser = ResponseParser(head_request=True)  # CONNECT 的成功响应没有响应体
+        while not parser.complete:
+            data = sock.recv(_READ_SIZE)
+            if not data:
+                raise HttpProtocolError("代理在 CONNECT 完成前关闭了连接")
+            parser.feed(data)
+        if parser.status_code != 200:
+            raise IOError(f"代理 CONNECT 失败: {parser.status_code} {parser.reason}")
+
+    def _connect(self, host: str, port: int, tls: bool, verify: bool) -> socket.socket:
+        if self.use_proxy:
+            # HTTP 与 HTTPS 都经 CONNECT 隧道，请求字节与直连完全相同
+            sock = DNS_CACHE.connect(*self._proxy_address(), timeout=self.timeout)
+            try:
+                self._tunnel(sock, host, port)
+            except BaseException:
+                sock.close()
+                raise
+        else:
+            sock = DNS_CACHE.connect(host, port, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if not tls:
+            return sock
+        try:
+            return ssl_context(verify).wrap_socket(sock, server_hostname=host)
+        except BaseException:
+            sock.close()
+            raise
+
+    def open(self, url: str) -> socket.socket:
+        """建立到 url 所在主机的连接（HTTPS 时完成 TLS 握手）"""
+        parts = urlsplit(url)
+        tls = parts.scheme == "https"
+        host = parts.hostname
+        port = parts.port or (443 if tls else 80)
+        if self.use_proxy or not tls:
+            return self._connect(host, port, tls, verify=False)
+
+        verify = TLS_POLICY.get(host)
+        if verify is False:
+            return self._connect(host, port, tls, verify=False)
+        try:
+            sock = self._connect(host, port, tls, verify=True)
+        except ssl.SSLError as e:
+            print(f"[RawSender] SSL验证失败，尝试禁用验证: {str(e)[:100]}")
+            TLS_POLICY.set(host, False)
+            return self._connect(host, port, tls, verify=False)
+        if verify is None:
+            TLS_POLICY.set(host, True)
+        return sock
+
+    def stage(self, template: BookingRequestTemplate) -> StagedRequest:
+        """建立连接并写出除最后 HOLD_BACK_BYTES 字节以外的整个请求"""
+        request = self.build_request(template)
+        sock = self.open(template.url)
+        try:
+            sock.settimeout(self.timeout)
+            sock.sendall(request[:-HOLD_BACK_BYTES])
+        except BaseException:
+            sock.close()
+            raise
+        return StagedRequest(sock, request[-HOLD_BACK_BYTES:], self.timeout)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+重试策略模块
+book() 返回带类别的 BookingResult，按类别决定下一次重试的间隔：
+  - 尚未开放 / 未知消息：开抢后的热窗口内紧密重试，之后按常规间隔重试
+  - 网络错误 / 服务器错误 / 限流：指数退避 + 抖动，连续出错超过期限后放弃
+  - 成功 / 已被预订 / Cookie 过期 / 地点错误：终止，不再重试
+时钟与随机数均可注入，便于用假时钟做单元测试。
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Optional
+
+
+class BookingStatus(Enum):
+    SUCCESS = "success"
+    TAKEN = "taken"
+    COOKIE_EXPIRED = "cookie_expired"
+    INVALID = "invalid"
+    NOT_OPEN = "not_open"
+    RATE_LIMITED = "rate_limited"
+    SERVER_ERROR = "server_error"
+    NETWORK_ERROR = "network_error"
+    UNKNOWN = "unknown"
+
+    @property
+    def terminal(self) -> bool:
+        """命中后不再重试"""
+        return self in _TERMINAL
+
+    @property
+    def is_error(self) -> bool:
+        """按指数退避重试的错误类别"""
+        return self in _ERRORS
+
+
+_TERMINAL = {BookingStatus.SUCCESS, BookingStatus.TAKEN, BookingStatus.COOKIE_EXPIRED, BookingStatus.INVALID}
+_ERRORS = {BookingStatus.RATE_LIMITED, BookingStatus.SERVER_ERROR, BookingStatus.NETWORK_ERROR}
+
+# 按顺序匹配服务器返回的 message；Cookie 过期、限流、服务器错误、网络错误等由状态码与异常直接判定
+_MESSAGE_RULES = [
+    ("保存成功", BookingStatus.SUCCESS),
+    ("手速太慢", BookingStatus.TAKEN),
+    ("已经被预订", BookingStatus.TAKEN),
+    ("请求过于频繁", BookingStatus.RATE_LIMITED),
+    ("未开放", BookingStatus.NOT_OPEN),
+    ("未开始", BookingStatus.NOT_OPEN),
+    ("尚未", BookingStatus.NOT_OPEN),
+    ("不在预约时间", BookingStatus.NOT_OPEN),
+]
+
+
+def classify_message(msg: str) -> BookingStatus:
+    """将服务器返回的 message 归类（仅用于 HTTP 200 且为 JSON 的响应）"""
+    for key, status in _MESSAGE_RULES:
+        if key in msg:
+            return status
+    return BookingStatus.UNKNOWN
+
+
+@dataclass(frozen=True)
+class BookingResult:
+    """
+    单次预订请求的结果
+    status 在产生结果处确定（按状态码、响应格式、异常类型），调用方直接按 status 分支，不再匹配消息文本
+    """
+    status: BookingStatus
+    message: str
+    http_status: Optional[int] = None
+    latency: Optional[float] = None  # 发出请求到收到完整响应的耗时（秒）
+
+    @classmethod
+    def from_message(cls, message: str, http_status: Optional[int] = None,
+                     latency: Optional[float] = None) -> "BookingResult":
+        return cls(classify_message(message), message, http_status, latency)
+
+    def __str__(self) -> str:
+        return self.message
+
+
+@dataclass
+class RetryState:
+    """单个片段的重试状态（由 RetryPolicy.start() 创建）"""
+    started: float
+    consecutive_errors: int = 0
+    first_error_at: Optional[float] = None
+    reason: str = ""
+
+
+class RetryPolicy:
+    """
+    按结果类别计算重试间隔
+
+    :param hot_window: 开抢后多少秒内使用 hot_interval 紧密重试
+    :param hot_interval: 热窗口内的重试间隔（秒）
+    :param interval: 热窗口之后的常规重试间隔（秒）
+    :param backoff_base: 出错时首次退避（秒），之后每次乘以 backoff_factor
+    :param backoff_factor: 退避倍数
+    :param backoff_cap: 退避上限（秒）
+    :param error_deadline: 连续出错超过多少秒后放弃（0 表示不限）
+    :param deadline: 从开抢算起多少秒后放弃（0 表示不限）
+    :param clock: 单调时钟（秒），测试时可替换
+    :param rng: [0, 1) 随机数，测试时可替换
+    """
+
+    def __init__(
+        self,
+        hot_window: float = 5.0,
+        hot_interval: float = 0.05,
+        interval: float = 0.2,
+        backoff_base: float = 0.2,
+        backoff_factor: float = 2.0,
+        backoff_cap: float = 5.0,
+        error_deadline: float = 60.0,
+        deadline: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.hot_window = hot_window
+        self.hot_interval = hot_interval
+        self.interval = interval
+        self.backoff_base = backoff_base
+        self.backoff_factor = backoff_factor
+        self.backoff_cap = backoff_cap
+        self.error_deadline = error_deadline
+        self.deadline = deadline
+        self.clock = clock
+        self.rng = rng
+
+    @classmethod
+    def from_config(cls, cfg) -> "RetryPolicy":
+        return cls(
+            hot_window=cfg.retry_hot_window,
+            hot_interval=cfg.retry_hot_interval,
+            interval=cfg.retry_interval,
+            backoff_cap=cfg.retry_backoff_cap,
+            error_deadline=cfg.retry_error_deadline,
+            deadline=cfg.retry_deadline,
+        )
+
+    def start(self) -> RetryState:
+        """开抢时为每个片段创建状态，热窗口与总期限从此刻算起"""
+        return RetryState(started=self.clock())
+
+    def backoff(self, errors: int) -> float:
+        """第 errors 次连续出错后的退避：上限内指数增长，取 [d/2, d) 的抖动，避免多个片段同时重试"""
+        delay = min(self.backoff_cap, self.backoff_base * self.backoff_factor ** (errors - 1))
+        return delay / 2 + self.rng() * delay / 2
+
+    def next_delay(self, state: RetryState, status: BookingStatus) -> Optional[float]:
+        """
+        根据本次结果返回下一次重试前应等待的秒数；
+        返回 None 表示不再重试（原因写入 state.reason）
+        """
+        now = self.clock()
+        if status.terminal:
+            state.reason = status.value
+            return None
+        if self.deadline and now - state.started >= self.deadline:
+            state.reason = f"超过 {self.deadline:g} 秒仍未成功"
+            return None
+
+        if status.is_error:
+            if state.consecutive_errors == 0:
+                state.first_error_at = now
+            state.consecutive_errors += 1
+            if self.error_deadline and now - state.first_error_at >= self.error_deadline:
+                state.reason = f"连续出错超过 {self.error_deadline:g} 秒"
+                return None
+            return self.backoff(state.consecutive_errors)
+
+        state.consecutive_errors = 0
+        state.first_error_at = None
+        if now - state.started < self.hot_window:
+            return self.hot_interval
+        return self.interval
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+网络线路检测结果缓存
+把检测出的线路（直接连接 / 本地代理端口 / 系统代理）按网络指纹持久化到 route_cache.json，带有效期。
+启动时网络指纹与上次相同则跳过完整检测，先沿用缓存的线路，只在后台快速复核这一条；复核失败才重新完整检测。
+
+网络指纹由几项廉价的本机信息组成（经 netplatform 后端读取）：已启用的网卡及其地址、默认网关、系统/环境代理设置、本地代理端口是否在监听。
+换了 Wi-Fi、连上 VPN、改了系统代理或启动了 Reqable，指纹都会变化。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+from netplatform import get_backend
+from proxy_detector import DETECT_DEADLINE, ProxyDetector
+from utils import app_base_dir
+
+ROUTE_CACHE_FILE = os.path.join(app_base_dir(), "route_cache.json")
+
+# 缓存有效期（秒）
+ROUTE_CACHE_TTL = 24 * 3600.0
+
+# 最多保留的网络数（宿舍、琴房、VPN……），超出时丢弃最早检测的
+MAX_ENTRIES = 16
+
+# 命中缓存后复核线路的超时（秒）
+VALIDATE_TIMEOUT = 3.0
+
+
+def fingerprint_of(addresses: Iterable[str], gateway: str, proxies: Dict[str, str],
+                   local_ports: Iterable[int]) -> str:
+    """由网络信息计算指纹（与顺序无关）"""
+    data = {
+        "addresses": sorted(set(addresses)),
+        "gateway": gateway or "",
+        "proxies": sorted((k, v) for k, v in proxies.items()),
+        "local_ports": sorted(set(local_ports)),
+    }
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def network_fingerprint() -> str:
+    """当前网络的指纹（毫秒级，只读取本机信息，不访问网络）"""
+    backend = get_backend()
+    addresses = []
+    for iface in backend.interfaces():
+        if iface.up:
+            addresses.append(iface.name)
+            addresses.extend(f"{iface.name} {ip}" for ip in iface.addresses)
+    gateway = backend.default_gateway()
+    local_ports = [port for _, port in ProxyDetector.detect_local_proxies(timeout=0.2)]
+    return fingerprint_of(addresses, " ".join(gateway) if gateway else "", backend.system_proxy() or {}, local_ports)
+
+
+@dataclass
+class CachedRoute:
+    label: str                              # 线路名称，如 "直接连接"、"Reqable (127.0.0.1:9000)"
+    proxies: Optional[Dict[str, str]]       # 代理字典；None 表示直接连接
+    detected_at: float                      # 检测时间（time.time()）
+
+
+class RouteCache:
+    """按网络指纹保存的线路检测结果（JSON 文件，首次访问时读取，每次修改后写回）"""
+
+    def __init__(self, path: str = ROUTE_CACHE_FILE, ttl: float = ROUTE_CACHE_TTL, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: Optional[Dict[str, CachedRoute]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, CachedRoute]:
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                for fp, item in raw.items():
+                    self._entries[fp] = CachedRoute(str(item["label"]), item.get("proxies"),
+                                                    float(item["detected_at"]))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[RouteCache] [WARNING] 读取线路缓存失败，忽略: {e}")
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({fp: asdict(r) for fp, r in self._entries.items()}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[RouteCache] [WARNING] 保存线路缓存失败: {e}")
+
+    def get(self, fingerprint: str) -> Optional[CachedRoute]:
+        """未过期的缓存线路；没有或已过期时返回 None"""
+        if self.ttl <= 0 or not fingerprint:
+            return None
+        with self._lock:
+            route = self._load().get(fingerprint)
+        if route is None or not 0 <= self.clock() - route.detected_at < self.ttl:
+            return None
+        return route
+
+    def put(self, fingerprint: str, label: str, proxies: Optional[Dict[str, str]]) -> CachedRoute:
+        route = CachedRoute(label, proxies, self.clock())
+        if self.ttl <= 0 or not fingerprint:
+            return route
+        with self._lock:
+            entries = self._load()
+            entries.pop(fingerprint, None)
+            entries[fingerprint] = route
+            for fp in sorted(entries, key=lambda k: entries[k].detected_at)[:max(0, len(entries) - MAX_ENTRIES)]:
+                del entries[fp]
+            self._save()
+        return route
+
+    def invalidate(self, fingerprint: str):
+        with self._lock:
+            if self._load().pop(fingerprint, None) is not None:
+                self._save()
+
+
+def cached_detect(
+    cache: RouteCache,
+    deadline: float = DETECT_DEADLINE,
+    on_progress: Optional[Callable[[str], None]] = None,
+    on_cached: Optional[Callable[[Optional[Dict[str, str]]], None]] = None,
+    fingerprint: Callable[[], str] = network_fingerprint,
+) -> Optional[Dict[str, str]]:
+    """
+    带缓存的线路检测，返回值与 ProxyDetector.auto_detect 相同
+
+    网络指纹命中未过期的缓存时，先调用 on_cached(缓存的代理字典) 让调用方立即使用，
+    再只复核这一条线路；复核通过即返回，不做完整检测。没有命中或复核失败时完整检测，成功则写入缓存。
+    """
+    progress = on_progress or (lambda message: None)
+    try:
+        fp = fingerprint()
+    except Exception as e:
+        print(f"[RouteCache] [WARNING] 计算网络指纹失败，不使用缓存: {e}")
+        fp = ""
+
+    route = cache.get(fp)
+    if route is not None:
+        print(f"[RouteCache] 网络未变化，沿用上次检测的线路: {route.label}")
+        progress(f"网络未变化，使用上次的线路 {route.label}，正在复核…")
+        if on_cached is not None:
+            on_cached(route.proxies)
+        if ProxyDetector.validate(route.proxies, timeout=min(VALIDATE_TIMEOUT, deadline)):
+            cache.put(fp, route.label, route.proxies)
+            progress(f"使用 {route.label}（已复核）")
+            return route.proxies
+        print(f"[RouteCache] [WARNING] 缓存的线路 {route.label} 已不可用，重新检测")
+        progress(f"{route.label} 已不可用，重新检测…")
+        cache.invalidate(fp)
+
+    found = ProxyDetector.detect(deadline, on_progress)
+    if found is None:
+        return None
+    label, proxies = found
+    cache.put(fp, label, proxies)
+    return proxies
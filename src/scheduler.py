@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+高精度定时触发模块
+先粗粒度睡眠，最后几十毫秒在 perf_counter_ns 上自旋等待，
+在非 GUI 线程上触发，并记录实际触发时刻相对目标时间的偏差
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+# 最后 SPIN_SECONDS 秒改为自旋（Windows 下 sleep 粒度可达 15ms，留足余量）
+SPIN_SECONDS = 0.03
+
+# 粗睡阶段每次最多睡 COARSE_SLICE 秒，以便跟随系统时钟校正并及时响应取消
+COARSE_SLICE = 0.5
+
+# 最近的触发偏差记录（毫秒，正数表示晚于目标）
+FIRE_SKEWS_MS: List[float] = []
+_FIRE_SKEWS_LIMIT = 100
+_FIRE_SKEWS_LOCK = threading.Lock()
+
+
+def _record_skew(skew_ms: float):
+    with _FIRE_SKEWS_LOCK:
+        FIRE_SKEWS_MS.append(skew_ms)
+        del FIRE_SKEWS_MS[:-_FIRE_SKEWS_LIMIT]
+
+
+def wait_until(
+    target: datetime,
+    stop_event: Optional[threading.Event] = None,
+    spin_seconds: float = SPIN_SECONDS,
+) -> Optional[float]:
+    """
+    阻塞当前线程直到本地时间到达 target
+
+    Args:
+        target: 目标时间（本地时间，naive datetime）
+        stop_event: 被 set 时提前返回
+        spin_seconds: 最后多少秒改为自旋等待
+
+    Returns:
+        实际触发偏差（毫秒，正数表示晚于目标）；若被 stop_event 取消则返回 None
+    """
+    target_ns = int(round(target.timestamp() * 1_000_000)) * 1000
+
+    # 阶段1：粗睡。每轮重新读取墙钟，系统对时后也能对准目标
+    while True:
+        remaining = (target_ns - time.time_ns()) / 1e9
+        if remaining <= spin_seconds:
+            break
+        nap = min(remaining - spin_seconds, COARSE_SLICE)
+        if stop_event is not None:
+            if stop_event.wait(nap):
+                return None
+        else:
+            time.sleep(nap)
+
+    if stop_event is not None and stop_event.is_set():
+        return None
+
+    # 阶段2：自旋。把墙钟目标换算到单调高精度时钟上，避免自旋期间受对时影响
+    deadline = time.perf_counter_ns() + (target_ns - time.time_ns())
+    while time.perf_counter_ns() < deadline:
+        pass
+
+    # 热路径上不做输出，偏差由调用方记录日志
+    skew_ms = (time.time_ns() - target_ns) / 1e6
+    _record_skew(skew_ms)
+    return skew_ms
+
+
+class PrecisionTimer(threading.Thread):
+    """
+    高精度单次定时器，接口与 threading.Timer 类似：start() / cancel()
+    func 在本线程（非 GUI 线程）上执行
+    与 threading.Timer 一样默认不是守护线程：调用方返回后进程仍会等到定时器触发；daemon=True 时随进程退出
+    """
+
+    def __init__(self, target: datetime, func: Callable[[], object], spin_seconds: float = SPIN_SECONDS,
+                 daemon: bool = False):
+        super().__init__(daemon=daemon)
+        self.target = target
+        self.func = func
+        self.spin_seconds = spin_seconds
+        self.skew_ms: Optional[float] = None
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        self.skew_ms = wait_until(self.target, self._cancel_event, self.spin_seconds)
+        if self.skew_ms is not None:
+            self.func()
+            print(f"[Scheduler] 触发偏差 {self.skew_ms:+.3f} ms（目标 {self.target:%H:%M:%S.%f}）")
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+捡漏模式：开抢之后持续监视关注的时段，有人取消时立即预订
+单个轮询线程按日期批量查询关注房间的占用（共用长连接与 occupancy 的条件请求，未变化时服务器只回 304），
+不为每个时段单独开线程；轮询间隔自适应：占用数据有变化时缩短到最小间隔，连续无变化时逐步放宽到最大间隔。
+发现空闲后把空闲的房间作为候选交给 BookingEngine（同一时段只会订到一个房间）。
+预订在单独的线程池中进行，轮询不会因预订而停顿；每次预订最多重试 BOOK_DEADLINE 秒，没订到就继续关注。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from availability import AvailabilityIndex
+from booking_engine import BookingEngine
+from occupancy import OccupancyCache, OccupancyFetcher
+from retry_policy import BookingStatus, RetryPolicy
+
+# 轮询间隔（秒）：有变化时回到最小值，无变化时每次乘以 BACKOFF，直到最大值
+MIN_INTERVAL = 2.0
+MAX_INTERVAL = 30.0
+BACKOFF = 1.5
+
+# 每次预订的重试期限（秒）：空位一般很快又被别人订走，超时仍未成功就回到轮询
+BOOK_DEADLINE = 10.0
+
+
+@dataclass
+class WatchItem:
+    """关注的时段：places 中任一房间在 [start_ts, end_ts) 空闲即可"""
+    places: List[str]
+    start_ts: str
+    end_ts: str
+    booked: Optional[str] = None  # 订到的房间
+    booking: bool = False  # 预订进行中
+    busy_seen_at: Dict[str, float] = field(default_factory=dict)  # 每个房间最近一次看到被占用的时刻
+
+    @property
+    def day(self) -> date:
+        return datetime.strptime(self.start_ts[:10], "%Y-%m-%d").date()
+
+    @property
+    def label(self) -> str:
+        return f"{self.start_ts} - {self.end_ts}"
+
+
+class AdaptiveInterval:
+    """自适应轮询间隔"""
+
+    def __init__(self, min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+                 backoff: float = BACKOFF):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.current = min_interval
+
+    def update(self, changed: bool) -> float:
+        if changed:
+            self.current = self.min_interval
+        else:
+            self.current = min(self.max_interval, self.current * self.backoff)
+        return self.current
+
+
+class Sniper:
+    """
+    捡漏轮询器
+
+    :param cfg: AppConfig（用户信息、代理、重试与突发设置，供 BookingEngine 使用）
+    :param items: 关注的时段
+    :param client: 长连接客户端，占用查询与预订共用
+    :param url: 占用查询接口（cfg.occupancy_url；为空时抛出 ValueError）
+    :param index: 空闲索引（与 GUI 共用时热力图同步更新）
+    :param book_func: 单次预订函数，缺省由 BookingEngine 按 cfg 选择（测试时可替换）
+    :param clock: 单调时钟（秒）
+    :param book_deadline: 每次预订的重试期限（秒），cfg.retry_deadline 更短时以其为准
+    """
+
+    def __init__(
+        self,
+        cfg,
+        items: Sequence[WatchItem],
+        client,
+        url: str,
+        index: Optional[AvailabilityIndex] = None,
+        interval: Optional[AdaptiveInterval] = None,
+        on_log: Callable[[str], None] = print,
+        on_popup: Optional[Callable[[str, str], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+        book_func=None,
+        clock=time.monotonic,
+        book_deadline: float = BOOK_DEADLINE,
+    ):
+        self.cfg = cfg
+        self.items = list(items)
+        self.client = client
+        # 每次轮询都发条件请求（TTL 为 0），未变化时服务器只回 304
+        self.fetcher = OccupancyFetcher(client, url=url, cache=OccupancyCache(ttl=0.0, clock=clock))
+        self.index = index or AvailabilityIndex(start_date=min((it.day for it in self.items), default=None))
+        self.interval = interval or AdaptiveInterval()
+        self.on_log = on_log
+        self.on_popup = on_popup or (lambda level, message: None)
+        self.stop_event = stop_event or threading.Event()
+        self.book_func = book_func
+        self.clock = clock
+        self.book_deadline = book_deadline
+        self.started_at: Optional[float] = None
+        self.polls = 0
+        self.detections: List[float] = []  # 每次发现空闲的检测延迟上界（秒）
+        self.bookings = 0
+        self._last: Dict[Tuple[str, date], List[Tuple[str, str]]] = {}
+        # 每个时段同时最多一个预订
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.items)), thread_name_prefix="sniper-book")
+        self._pending: List[Future] = []
+        self._lock = threading.Lock()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def active(self) -> List[WatchItem]:
+        return [it for it in self.items if it.booked is None]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待已发起的预订全部结束，返回是否都已结束"""
+        with self._lock:
+            pending = list(self._pending)
+        return not wait_futures(pending, timeout).not_done
+
+    def poll_once(self) -> bool:
+        """
+        查询一次所有关注房间的占用，对空闲的时段立即发起预订（在线程池中进行，不等待结果）
+        返回占用数据是否有变化
+        """
+        if self.started_at is None:
+            self.started_at = self.clock()
+        self.polls += 1
+        wanted: Dict[date, set] = {}
+        for it in self.active():
+            wanted.setdefault(it.day, set()).update(it.places)
+
+        changed = False
+        for day, places in wanted.items():
+            results = self.fetcher.fill(self.index, day, sorted(places))
+            for place, records in results.items():
+                if self._last.get((place, day)) != records:
+                    changed = changed or (place, day) in self._last
+                    self._last[(place, day)] = records
+
+        now = self.clock()
+        for it in self.active():
+            if it.booking:
+                continue
+            known = [p for p in it.places if (p, it.day) in self._last]
+            free = [p for p in known if self.index.is_free(p, it.start_ts, it.end_ts)]
+            for p in known:
+                if p not in free:
+                    it.busy_seen_at[p] = now
+            if not free:
+                continue
+            # 之前看到过被占用、现在空出来的房间才算“有人取消”，记录检测延迟（距上次看到被占用的时间）
+            freed = [p for p in free if p in it.busy_seen_at]
+            if freed:
+                latency = now - max(it.busy_seen_at[p] for p in freed)
+                self.detections.append(latency)
+                self.on_log(f"发现空闲：{'、'.join(free)}  {it.label}（检测延迟 ≤ {latency:.1f}s）")
+            else:
+                self.on_log(f"发现空闲：{'、'.join(free)}  {it.label}")
+            it.booking = True
+            self.bookings += 1
+            future = self._pool.submit(self._book, it, free)
+            with self._lock:
+                self._pending = [f for f in self._pending if not f.done()]
+                self._pending.append(future)
+        return changed
+
+    def _policy(self) -> RetryPolicy:
+        policy = RetryPolicy.from_config(self.cfg)
+        if self.book_deadline > 0 and not 0 < policy.deadline <= self.book_deadline:
+            policy.deadline = self.book_deadline
+        return policy
+
+    def _book(self, it: WatchItem, free: List[str]):
+        try:
+            engine = BookingEngine(
+                self.cfg,
+                [(free, it.start_ts, it.end_ts)],
+                client=self.client,
+                on_log=self.on_log,
+                on_popup=self.on_popup,
+                stop_event=self.stop_event,
+                book_func=self.book_func,
+                policy=self._policy(),
+                availability=self.index,
+            )
+            st = engine.run()[0]
+        except Exception as e:
+            self.on_log(f"捡漏预订异常：{type(e).__name__}: {e}")
+            st = None
+        if st is not None and st.status is BookingStatus.SUCCESS:
+            it.booked = st.place
+        else:
+            # 没订到（又被别人抢走、超过期限等）：作为“被占用”继续关注
+            for p in free:
+                it.busy_seen_at[p] = self.clock()
+        it.booking = False
+
+    def run(self):
+        """轮询直到被取消或所有关注的时段都已订到"""
+        self.on_log(f"开始捡漏：关注 {len(self.items)} 个时段")
+        while not self.stop_event.is_set() and self.active():
+            try:
+                changed = self.poll_once()
+            except Exception as e:
+                self.on_log(f"捡漏轮询异常：{type(e).__name__}: {e}")
+                changed = False
+            delay = self.interval.update(changed)
+            if self.stop_event.wait(delay):
+                break
+        self.wait()
+        self._pool.shutdown()
+        m = self.metrics()
+        self.on_log(f"捡漏结束：轮询 {m['polls']} 次，{m['requests_per_minute']:.1f} 次请求/分钟"
+                    f"（304 占 {m['not_modified_ratio'] * 100:.0f}%），发现空闲 {m['detections']} 次，订到 {m['booked']} 个时段")
+
+    def metrics(self) -> dict:
+        """轮询开销与检测延迟"""
+        st = self.fetcher.stats()
+        minutes = max(1e-9, (self.clock() - self.started_at) / 60) if self.started_at is not None else None
+        return {
+            "polls": self.polls,
+            "requests": st["requests"],
+            "requests_per_minute": st["requests"] / minutes if minutes else 0.0,
+            "not_modified_ratio": st["not_modified"] / st["requests"] if st["requests"] else 0.0,
+            "interval": self.interval.current,
+            "detections": len(self.detections),
+            "detection_latency_avg": sum(self.detections) / len(self.detections) if self.detections else None,
+            "detection_latency_max": max(self.detections) if self.detections else None,
+            "booking_attempts": self.bookings,
+            "booked": sum(1 for it in self.items if it.booked is not None),
+        }
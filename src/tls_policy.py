@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+TLS 验证策略缓存与会话复用
+直连时部分网络（AnyConnect 中间人证书等）无法通过证书验证。按主机记住上一次的验证结果（带 TTL），
+之后的请求直接使用对应策略，不再每次先失败一次握手再降级；
+两种策略各自只构建一个 SSLContext（CA 证书包只加载一次），所有会话与连接共用。
+
+共享的 SSLContext 同时按主机缓存 TLS 会话（session / ticket）：连接被服务器或代理断开后，
+重连时带上缓存的会话即可恢复（简化握手），直连与经代理 CONNECT 隧道的连接都适用。
+"""
+
+from __future__ import annotations
+
+import os
+import ssl
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from requests.utils import DEFAULT_CA_BUNDLE_PATH
+
+# 策略记忆时长（秒）：过期后重新尝试证书验证，网络环境变化（如断开 VPN）后能自动恢复
+TLS_POLICY_TTL = 600.0
+
+
+class TlsPolicyCache:
+    """按主机缓存是否启用证书验证"""
+
+    def __init__(self, ttl: float = TLS_POLICY_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: Dict[str, Tuple[bool, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> Optional[bool]:
+        """返回 True（验证）/ False（不验证）；未知或已过期返回 None"""
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry is None:
+                return None
+            verify, expires = entry
+            if self.clock() >= expires:
+                del self._entries[host]
+                return None
+            return verify
+
+    def set(self, host: str, verify: bool):
+        with self._lock:
+            self._entries[host] = (verify, self.clock() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 进程内共享：同一主机的验证结果对所有 CrazyRequests 实例有效
+TLS_POLICY = TlsPolicyCache()
+
+
+class TlsSessionCache:
+    """按主机保存最近一次可复用的 TLS 会话"""
+
+    def __init__(self):
+        self._sessions: Dict[str, ssl.SSLSession] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> Optional[ssl.SSLSession]:
+        with self._lock:
+            return self._sessions.get(host)
+
+    def put(self, host: str, session: ssl.SSLSession):
+        with self._lock:
+            self._sessions[host] = session
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+
+class _ResumingSSLSocket(ssl.SSLSocket):
+    """
+    握手后把会话存入缓存
+    TLS 1.3 的 ticket 在握手完成后才由服务器发来，因此在读到数据后再保存一次，直到拿到 ticket
+    """
+
+    _session_host: Optional[str] = None
+    _session_cache: Optional[TlsSessionCache] = None
+    _session_saved = False
+
+    def _save_session(self):
+        session = self.session
+        if session is None or self._session_cache is None or not self._session_host:
+            return
+        self._session_cache.put(self._session_host, session)
+        if session.has_ticket or self.version() != "TLSv1.3":
+            self._session_saved = True
+
+    def recv_into(self, buffer, nbytes=None, flags=0):
+        n = super().recv_into(buffer, nbytes, flags)
+        if not self._session_saved:
+            self._save_session()
+        return n
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """自动为同一主机的新连接带上缓存会话的 SSLContext"""
+
+    sslsocket_class = _ResumingSSLSocket
+
+    def __new__(cls, *args, **kwargs):
+        self = super().__new__(cls, *args, **kwargs)
+        self.sessions = TlsSessionCache()
+        return self
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True, server_hostname=None, session=None):
+        if session is None and not server_side and server_hostname:
+            session = self.sessions.get(server_hostname)
+        ssock = super().wrap_socket(sock, server_side, do_handshake_on_connect,
+                                    suppress_ragged_eofs, server_hostname, session)
+        if not server_side:
+            ssock._session_host = server_hostname
+            ssock._session_cache = self.sessions
+            if do_handshake_on_connect:
+                ssock._save_session()
+        return ssock
+
+
+def _build_context(verify: bool) -> ResumingSSLContext:
+    """与 urllib3 的默认设置一致，但允许 TLS 1.2 session ticket（urllib3 默认关闭）以便复用会话"""
+    ctx = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+    ctx.options |= ssl.OP_NO_COMPRESSION
+    ctx.options &= ~ssl.OP_NO_TICKET
+    if getattr(ctx, "post_handshake_auth", None) is not None:
+        ctx.post_handshake_auth = True
+    if verify:
+        ctx.verify_mode = ssl.CERT_REQUIRED
+        ctx.check_hostname = True
+        ctx.load_verify_locations(DEFAULT_CA_BUNDLE_PATH)
+    else:
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+    ctx.hostname_checks_common_name = False
+    if os.environ.get("SSLKEYLOGFILE"):
+        ctx.keylog_filename = os.path.expandvars(os.environ["SSLKEYLOGFILE"])
+    return ctx
+
+
+_CONTEXTS: Dict[bool, ResumingSSLContext] = {}
+_CONTEXTS_LOCK = threading.Lock()
+
+
+def ssl_context(verify: bool) -> ResumingSSLContext:
+    """返回对应策略的共享 SSLContext（首次调用时构建）"""
+    with _CONTEXTS_LOCK:
+        ctx = _CONTEXTS.get(verify)
+        if ctx is None:
+            ctx = _CONTEXTS[verify] = _build_context(verify)
+        return ctx
+
+
+def clear_sessions():
+    """丢弃所有缓存的 TLS 会话"""
+    with _CONTEXTS_LOCK:
+        for ctx in _CONTEXTS.values():
+            ctx.sessions.clear()
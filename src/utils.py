@@ -9,7 +9,8 @@ from __future__ import annotations
 import os
 import sys
 import json
-from typing import Dict, List, Optional, Tuple
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 import yaml
 
@@ -71,18 +72,26 @@ def _load_core():
     raise ImportError("未找到核心文件 main.py 或 main.txt，或其缺少 book()/timer_run() 函数。")
 
 
-CORE = _load_core()
-book = CORE.book
-timer_run = CORE.timer_run
+_CORE = None
 
 
-# ---- 导入代理检测模块 ----
-try:
-    from proxy_detector import ProxyDetector
-    PROXY_DETECTOR_AVAILABLE = True
-except ImportError:
-    PROXY_DETECTOR_AVAILABLE = False
-    print("注意：未找到 proxy_detector.py，自动代理检测功能将不可用。")
+def __getattr__(name):
+    """
+    CORE / book / timer_run 在首次访问时才加载核心模块：
+    加载 main.py 会导入 requests 等网络库，只用到本模块工具函数的地方（配置、命令行 --dry-run）不必为此付出启动时间
+    """
+    global _CORE
+    if name in ("CORE", "book", "timer_run"):
+        if _CORE is None:
+            _CORE = _load_core()
+        return _CORE if name == "CORE" else getattr(_CORE, name)
+    if name == "PROXY_DETECTOR_AVAILABLE":
+        try:
+            import proxy_detector  # noqa: F401
+            return True
+        except ImportError:
+            return False
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ---- 工具函数 ----
@@ -191,3 +200,61 @@ def split_to_slots(start_hm: str, end_hm: str, max_minutes: int = 120) -> List[T
         out.append((minutes_to_hhmm(cur), minutes_to_hhmm(nxt)))
         cur = nxt
     return out
+
+
+def expand_places(place: str, fallbacks: Iterable[str], places: Sequence[str]) -> List[str]:
+    """
+    将首选地点与备选项展开为按优先级排列、去重的候选地点列表
+    备选项可以是完整地点名，也可以是通配符模式（按 places 的顺序展开）
+
+    Args:
+        place: 首选地点
+        fallbacks: 备选项，如 ["MPC412 室内乐琴房（GP）", "MPC4*（GP）"]
+        places: 全部地点（通常为 constants.PLACES）
+
+    Returns:
+        候选地点列表，首选地点在最前
+
+    Example:
+        >>> expand_places("MPC418 管弦乐学部琴房（GP）", ["MPC4*（GP）"], PLACES)
+        ['MPC418 管弦乐学部琴房（GP）', 'MPC412 室内乐琴房（GP）', 'MPC419 管弦乐学部琴房（GP）', ...]
+    """
+    out: List[str] = []
+    for item in [place, *fallbacks]:
+        item = (item or "").strip()
+        if not item:
+            continue
+        if any(ch in item for ch in "*?["):
+            matches = [p for p in places if fnmatchcase(p, item)]
+        else:
+            matches = [item]
+        out.extend(m for m in matches if m not in out)
+    return out
+
+
+def build_chunks(items: Iterable, places: Sequence[str]) -> List[Tuple[List[str], str, str]]:
+    """
+    将每组请求（RequestItemData）拆分为若干 <= 2h 的片段
+
+    Args:
+        items: 请求列表，每项含 place / date / start / end / fallbacks
+        places: 全部地点（用于展开备选项中的通配符）
+
+    Returns:
+        [([首选地点, 备选地点...], 'YYYY-MM-DD HH:MM', 'YYYY-MM-DD HH:MM'), ...]
+
+    Raises:
+        ValueError: 地点为空或结束时间早于开始时间
+    """
+    chunks: List[Tuple[List[str], str, str]] = []
+    for d in items:
+        place = (d.place or "").strip()
+        if not place:
+            raise ValueError("存在空的地点（place）。")
+        if hhmm_to_minutes(d.end) < hhmm_to_minutes(d.start):
+            raise ValueError(f"{place} 的结束时间早于开始时间。")
+
+        candidates = expand_places(place, d.fallbacks, places)
+        for s_hm, e_hm in split_to_slots(d.start, d.end, max_minutes=120):
+            chunks.append((candidates, f"{d.date} {s_hm}", f"{d.date} {e_hm}"))
+    return chunks
@@ -6,16 +6,9 @@ RequestItemWidget控件
 
 from __future__ import annotations
 
-import os
-import sys
-import json
-import time
-import math
-from dataclasses import dataclass, asdict
-from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional, Tuple
+from datetime import datetime
 
-from PySide6 import QtCore, QtGui, QtWidgets
+from PySide6 import QtCore, QtWidgets
 
 # 导入常量
 from constants import PLACES
@@ -59,6 +52,11 @@ class RequestItemWidget(QtWidgets.QFrame):
         self.place.setCompleter(completer)
         self.place.setCurrentText(self.data.place)
 
+        # 备选地点：首选被抢走时依次改抢（逗号分隔，可用通配符）
+        self.fallbacks = QtWidgets.QLineEdit(", ".join(self.data.fallbacks))
+        self.fallbacks.setPlaceholderText("可选，逗号分隔，支持通配符，如 MPC412 室内乐琴房（GP）, MPC4*（GP）")
+        self.fallbacks.setToolTip("首选地点已被预订时，按顺序立即改抢这些地点（同一时段只会订到一个）")
+
         # 日期轮（默认明天）
         d = datetime.strptime(self.data.date, "%Y-%m-%d").date()
         self.date_wheel = DateWheel(default=d)
@@ -96,6 +94,12 @@ class RequestItemWidget(QtWidgets.QFrame):
         g.addWidget(self.btn_remove, r, 4, 1, 1, QtCore.Qt.AlignRight)
         r += 1
 
+        _lbl_fallbacks = QtWidgets.QLabel("备选")
+        _lbl_fallbacks.setStyleSheet("font-size:16px; font-weight:700;")
+        g.addWidget(_lbl_fallbacks, r, 0)
+        g.addWidget(self.fallbacks, r, 1, 1, 4)
+        r += 1
+
         _lbl_date = QtWidgets.QLabel("日期")
         _lbl_date.setStyleSheet("font-size:16px; font-weight:700;")
         g.addWidget(_lbl_date, r, 0)
@@ -119,6 +123,7 @@ class RequestItemWidget(QtWidgets.QFrame):
         # 信号
         self.btn_remove.clicked.connect(lambda: self.removed.emit(self))
         self.place.currentTextChanged.connect(self._on_changed)
+        self.fallbacks.editingFinished.connect(self._on_changed)
         self.date_wheel.valueChanged.connect(self._on_changed)
         self.start_wheel.valueChanged.connect(self._on_changed)
         self.end_wheel.valueChanged.connect(self._on_changed)
@@ -131,6 +136,7 @@ class RequestItemWidget(QtWidgets.QFrame):
             date=self.date_wheel.value(),
             start=self.start_wheel.value(),
             end=self.end_wheel.value(),
+            fallbacks=[x.strip() for x in self.fallbacks.text().replace("，", ",").split(",") if x.strip()],
         )
 
     def _on_changed(self, *args):
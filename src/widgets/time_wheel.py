@@ -6,15 +6,6 @@ TimeWheel控件
 
 from __future__ import annotations
 
-import os
-import sys
-import json
-import time
-import math
-from dataclasses import dataclass, asdict
-from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional, Tuple
-
 from PySide6 import QtCore, QtGui, QtWidgets
 
 # 导入其他控件
@@ -6,31 +6,33 @@ BookingWorker线程
 
 from __future__ import annotations
 
-import os
-import sys
-import json
 import time
-import math
-from dataclasses import dataclass, asdict
-from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional, Tuple
+import threading
+from datetime import datetime, date
+from typing import List, Optional, Tuple
 
-from PySide6 import QtCore, QtGui, QtWidgets, QtNetwork
+from PySide6 import QtCore
 
-try:
-    from PySide6.QtWebEngineWidgets import QWebEngineView
-    from PySide6.QtWebEngineCore import QWebEngineProfile, QWebEnginePage
-    WEBENGINE_AVAILABLE = True
-except ImportError:
-    WEBENGINE_AVAILABLE = False
+# 导入核心预订函数
+from main import get_client
 
-import yaml
+# 导入并发预订引擎
+from booking_engine import BookingEngine
 
-# 导入核心预订函数
-from main import book
+# 导入多账号并行预订
+from multi_account import MultiAccountEngine, main_account_name
+
+# 导入时钟同步
+from clock_sync import align_fire_time
+
+# 导入占用数据获取
+from occupancy import DEFAULT_WORKERS, OccupancyCache, OccupancyFetcher
+
+# 导入捡漏轮询
+from sniper import AdaptiveInterval, Sniper, WatchItem
 
 # 导入配置管理
-from config import AppConfig
+from config import AccountProfile, AppConfig
 
 # 导入工具函数
 from utils import parse_proxies
@@ -41,56 +43,191 @@ class BookingWorker(QtCore.QThread):
     popup = QtCore.Signal(str, str)   # (level, message) level in {"info","warn","error"}
     finished_all = QtCore.Signal()
 
-    def __init__(self, cfg: AppConfig, chunks: List[Tuple[str, str, str]], parent=None):
+    def __init__(self, cfg: AppConfig, chunks: List[Tuple[List[str], str, str]], fire_at: Optional[datetime] = None,
+                 availability=None, profiles: Optional[List[Tuple[str, AccountProfile, list]]] = None, parent=None):
         """
-        :param chunks: [(place, start_ts, end_ts)]，ts 格式 "YYYY-MM-DD HH:MM"
+        :param chunks: [(候选地点列表, start_ts, end_ts)]，ts 格式 "YYYY-MM-DD HH:MM"
+        :param fire_at: 计划触发时间；为 None 时立即开始。线程内部高精度等待到点，不依赖 GUI 事件循环
+        :param availability: 空闲索引，预订结果返回时增量更新
+        :param profiles: 额外账号 [(账号名, AccountProfile, chunks)]，与主账号同时开抢
         """
         super().__init__(parent)
         self.cfg = cfg
         self.chunks = chunks
-        self._stop_flag = False
+        self.fire_at = fire_at
+        self.availability = availability
+        self.profiles = profiles or []
+        self._stop_event = threading.Event()
+        self.engine = None  # 主账号的 BookingEngine
+        self.multi = None   # 有额外账号时的 MultiAccountEngine
+        # 长连接客户端：整个重试循环共用，重试时复用已握手的连接
+        self.client = get_client(
+            proxies=parse_proxies(cfg.proxies),
+            cookie=cfg.cookie,
+            pool_size=max(cfg.pool_size, cfg.burst_size),
+            keep_alive=cfg.keep_alive,
+        )
 
     def stop(self):
-        self._stop_flag = True
+        self._stop_event.set()
 
-    def _try_once(self, place: str, start_ts: str, end_ts: str) -> str:
-        return book(
-            cookie=self.cfg.cookie,
-            user_id=self.cfg.user_id,
-            user_name=self.cfg.user_name,
-            place=place,
-            start_time=start_ts,
-            end_time=end_ts,
-            user_email=self.cfg.user_email,
-            user_phone=self.cfg.user_phone,
-            theme=self.cfg.theme or "练琴",
+    def _align_fire_time(self, fire_at: datetime) -> Optional[datetime]:
+        """目标时间按服务器时钟解释，换算为本地应发出请求的时间。被取消时返回 None"""
+        if not self.cfg.clock_sync_enabled:
+            return fire_at
+        return align_fire_time(self.client, fire_at, samples=self.cfg.clock_sync_samples,
+                               stop_event=self._stop_event, on_log=self.log.emit)
+
+    def run(self):
+        fire_at = None
+        if self.fire_at is not None:
+            fire_at = self._align_fire_time(self.fire_at)
+            if fire_at is None:
+                self.log.emit("已取消定时任务。")
+                self.finished_all.emit()
+                return
+
+        # 所有片段并行开抢（引擎内部高精度等待到点并按突发偏移发出），日志/弹窗通过信号回到 GUI 线程
+        if self.profiles:
+            # 多账号：各账号独立的会话，共用并发上限与限速
+            main_name = main_account_name(self.cfg)
+            self.multi = MultiAccountEngine(
+                self.cfg,
+                [(main_name, None, self.chunks), *self.profiles],
+                clients={main_name: self.client},
+                on_log=self.log.emit,
+                on_popup=self.popup.emit,
+                stop_event=self._stop_event,
+                availability=self.availability,
+            )
+            self.engine = self.multi.engines[main_name]
+            self.multi.run(fire_at=fire_at)
+            for line in self.multi.summary():
+                self.log.emit(line)
+        else:
+            self.engine = BookingEngine(
+                self.cfg,
+                self.chunks,
+                client=self.client,
+                on_log=self.log.emit,
+                on_popup=self.popup.emit,
+                stop_event=self._stop_event,
+                availability=self.availability,
+            )
+            self.engine.run(fire_at=fire_at)
+        if self._stop_event.is_set():
+            self.log.emit("已取消。")
+
+        st = self.client.stats()
+        self.log.emit(f"连接复用（累计）：共 {st['requests']} 次请求，新建连接 {st['connections']} 次，"
+                      f"节省握手 {st['handshakes_avoided']} 次；TLS 完整握手 {st['tls_full_handshakes']} 次，"
+                      f"会话复用 {st['tls_resumed']} 次")
+        self.finished_all.emit()
+
+
+class OccupancyWorker(QtCore.QThread):
+    """后台并发查询所有房间某天的占用数据并写入空闲索引"""
+    done = QtCore.Signal(object)   # {place: [(start_ts, end_ts)]}
+    log = QtCore.Signal(str)
+
+    def __init__(self, cfg: AppConfig, day: date, availability, cache: OccupancyCache, parent=None):
+        super().__init__(parent)
+        self.cfg = cfg
+        self.day = day
+        self.availability = availability
+        self.cache = cache
+
+    def run(self):
+        # 与开抢、预热共用同一个客户端，连接池大小也与它们一致，刷新热力图不会重建客户端、关闭预热好的连接
+        client = get_client(
             proxies=parse_proxies(self.cfg.proxies),
+            cookie=self.cfg.cookie,
+            pool_size=max(self.cfg.pool_size, self.cfg.burst_size),
+            keep_alive=self.cfg.keep_alive,
+        )
+        fetcher = OccupancyFetcher(client, url=self.cfg.occupancy_url, cache=self.cache,
+                                   max_workers=min(DEFAULT_WORKERS, client.pool_size))
+        t0 = time.perf_counter()
+        results = fetcher.fill(self.availability, self.day)
+        st = fetcher.stats()
+        self.log.emit(f"占用查询：{len(results)} 个房间，耗时 {(time.perf_counter() - t0) * 1000:.0f} ms，"
+                      f"请求 {st['requests']} 次（未变化 {st['not_modified']} 次），缓存命中 {st['cache_hits']} 次")
+        self.done.emit(results)
+
+
+class SniperWorker(QtCore.QThread):
+    """捡漏：单线程轮询关注时段的占用，有人取消时立即预订"""
+    log = QtCore.Signal(str)
+    popup = QtCore.Signal(str, str)
+    finished_all = QtCore.Signal()
+
+    def __init__(self, cfg: AppConfig, items: List[WatchItem], availability=None, client=None, parent=None):
+        super().__init__(parent)
+        self.cfg = cfg
+        self.items = items
+        self.availability = availability
+        # 可沿用开抢时的长连接
+        self.client = client or get_client(
+            proxies=parse_proxies(cfg.proxies),
+            cookie=cfg.cookie,
+            pool_size=max(cfg.pool_size, cfg.burst_size),
+            keep_alive=cfg.keep_alive,
         )
+        self._stop_event = threading.Event()
+        self.sniper: Optional[Sniper] = None
+
+    def stop(self):
+        self._stop_event.set()
 
     def run(self):
-        MUST_STOP = ["Cookie 过期", "保存成功", "手速太慢，该时间段已经被预订啦", "请求失败, 检查网络、代理服务器或 VPN"]
-        for (place, start_ts, end_ts) in self.chunks:
-            if self._stop_flag:
-                break
-            self.log.emit(f"开始预定：{place}  {start_ts} - {end_ts}")
-            # 重试直到命中 MUST_STOP 之一
-            while not self._stop_flag:
-                try:
-                    msg = self._try_once(place, start_ts, end_ts)
-                except Exception as e:
-                    msg = f"异常：{e!r}"
-
-                self.log.emit(f"返回：{msg}")
-                if any(key in msg for key in MUST_STOP):
-                    # 弹窗
-                    if "保存成功" in msg:
-                        self.popup.emit("info", f"保存成功：{place}  {start_ts} - {end_ts}")
-                    elif "手速太慢" in msg:
-                        self.popup.emit("warn", f"已被预订：{place}  {start_ts} - {end_ts}")
-                    elif "Cookie 过期" in msg:
-                        self.popup.emit("error", "Cookie 过期，请在右上角按钮中重新设置 Cookie。")
-                    elif "请求失败" in msg:
-                        self.popup.emit("error", "请求失败，请检查网络、代理服务器或 VPN。")
-                    break
-                time.sleep(0.2)
+        self.sniper = Sniper(
+            self.cfg,
+            self.items,
+            self.client,
+            url=self.cfg.occupancy_url,
+            index=self.availability,
+            interval=AdaptiveInterval(self.cfg.sniper_min_interval, self.cfg.sniper_max_interval),
+            on_log=self.log.emit,
+            on_popup=self.popup.emit,
+            stop_event=self._stop_event,
+        )
+        self.sniper.run()
         self.finished_all.emit()
+
+
+class ProxyDetectWorker(QtCore.QThread):
+    """
+    后台检测网络线路（本地代理 / 直接连接 / 系统代理），逐步汇报进度，检测结果通过信号交给 GUI 线程应用
+    网络未变化时先发出缓存的线路，复核失败、重新检测出不同的线路时再发出一次
+    """
+    progress = QtCore.Signal(str)
+    detected = QtCore.Signal(object)   # 代理字典；None 表示直接连接
+    failed = QtCore.Signal(str)
+
+    def __init__(self, deadline: float, cache_ttl: float = 0.0, parent=None):
+        super().__init__(parent)
+        self.deadline = deadline
+        self.cache_ttl = cache_ttl
+
+    def run(self):
+        # 禁用SSL警告（检测时可能以不验证证书的方式重试）
+        try:
+            import urllib3
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        except Exception:
+            pass
+        emitted = []
+
+        def on_cached(proxy_dict):
+            emitted.append(proxy_dict)
+            self.detected.emit(proxy_dict)
+
+        try:
+            from route_cache import RouteCache, cached_detect
+            proxy_dict = cached_detect(RouteCache(ttl=self.cache_ttl), self.deadline,
+                                       on_progress=self.progress.emit, on_cached=on_cached)
+        except Exception as e:
+            self.failed.emit(f"{type(e).__name__}: {e}")
+            return
+        if not emitted or emitted[-1] != proxy_dict:
+            self.detected.emit(proxy_dict)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+pytest 以包方式导入测试模块，tests 目录本身不在 sys.path 中；加入后 `from helpers import ...` 与直接运行脚本时一致
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+测试共用的替身与本地服务器（只依赖标准库）
+直接运行测试脚本时 tests 目录即在 sys.path 中；pytest 下由 conftest.py 加入
+"""
+
+import os
+import socket
+import ssl
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CERT_FILE = os.path.join(TESTS_DIR, "certs", "localhost.pem")
+
+
+class FakeClock:
+    """可手动拨动的时钟（替代 time.monotonic）"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def AppConfig(**overrides):
+    """AppConfig 的最小替身（引擎只读取这些字段）"""
+    fields = dict(cookie="", user_id="1", user_name="n", user_email="e", user_phone="p", theme="练琴",
+                  proxies="", pool_size=4, keep_alive=True, max_concurrency=4, rate_limit=0,
+                  burst_size=1, burst_offsets_ms=[0], burst_budget=0,
+                  retry_hot_window=5.0, retry_hot_interval=0.05, retry_interval=0.2,
+                  retry_backoff_cap=5.0, retry_error_deadline=60.0, retry_deadline=0.0, raw_sender=False,
+                  async_client=False)
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+class HttpsServer(ThreadingHTTPServer):
+    """使用 certs/localhost.pem 的本地 HTTPS 服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 所有连接共用一个服务端 context，ticket 密钥一致才能复用会话
+        self.ssl_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.ssl_ctx.load_cert_chain(CERT_FILE)
+
+    def get_request(self):
+        sock, addr = super().get_request()
+        return self.ssl_ctx.wrap_socket(sock, server_side=True, do_handshake_on_connect=False), addr
+
+    def handle_error(self, request, client_address):
+        # 客户端验证证书失败时会中断握手，属预期情况
+        pass
+
+
+def listen():
+    """监听本机随机端口的套接字"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    return sock
+
+
+def closed_port():
+    """本机上没有监听的端口"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+测试异步预订客户端
+使用本地 HTTP / HTTPS 服务器（BOOK_URL 被替换为本地地址），无需访问学校网络
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "src"))
+
+import dns_cache
+import main as core
+from async_client import AsyncCrazyRequests, ResponseParser, async_book, book_sync
+from booking_engine import BookingEngine
+from dns_cache import DNS_CACHE
+from helpers import AppConfig, HttpsServer
+from retry_policy import BookingStatus
+from tls_policy import TLS_POLICY
+
+
+class _BookingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    seen_paths = []
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+        _BookingHandler.seen_paths.append(self.path)
+        body = ('{"message": "保存成功 %s"}' % form["bizFieldBookField.startTime"][0]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # chunked 响应
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for piece in (b"hello ", b"world"):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(server_cls=ThreadingHTTPServer):
+    server = server_cls(("127.0.0.1", 0), _BookingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_parser_incremental():
+    raw = (b"HTTP/1.1 100 Continue\r\n\r\n"
+           b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\nX-A: 1\r\n\r\n"
+           b"5\r\nhello\r\n6;ext=1\r\n world\r\n0\r\n\r\n")
+    parser = ResponseParser()
+    for i in range(len(raw)):
+        done = parser.feed(raw[i:i + 1])
+        assert done == (i == len(raw) - 1)
+    assert parser.status_code == 200
+    assert parser.headers["x-a"] == "1"
+    assert bytes(parser.body) == b"hello world"
+    assert parser.keep_alive
+
+
+def test_parser_close_delimited():
+    parser = ResponseParser()
+    parser.feed(b"HTTP/1.0 200 OK\r\n\r\nabc")
+    assert not parser.complete
+    parser.feed_eof()
+    assert parser.complete and bytes(parser.body) == b"abc" and not parser.keep_alive
+
+
+def test_many_concurrent_bookings_on_one_loop():
+    server = _start_server()
+    old_url = core.BOOK_URL
+    core.BOOK_URL = f"http://127.0.0.1:{server.server_address[1]}/saveData"
+    try:
+        async def run():
+            client = AsyncCrazyRequests(proxies=None, cookie="", pool_size=8)
+            jobs = [
+                async_book(client, user_id="1", user_name="n", place="MPC327 管弦乐学部琴房（UP）",
+                           start_time=f"2025-09-17 {h % 24:02d}:00", end_time="2025-09-17 23:00")
+                for h in range(200)
+            ]
+            results = await asyncio.gather(*jobs)
+            chunked = await client.get(f"http://127.0.0.1:{server.server_address[1]}/")
+            client.close()
+            return results, chunked, client.stats()
+
+        results, chunked, st = asyncio.run(run())
+        print(f"[OK] 200 个并发预订完成，连接统计: {st}")
+        assert all(r.status is BookingStatus.SUCCESS and r.http_status == 200 for r in results)
+        assert results[5].message.endswith("05:00")
+        assert chunked.content == b"hello world"
+        assert st["connections"] <= 8
+        assert st["requests"] == 201
+        assert all(p.startswith("/saveData?reBookMainId=&ruleId=") for p in _BookingHandler.seen_paths)
+    finally:
+        core.BOOK_URL = old_url
+        server.shutdown()
+
+
+def test_book_sync_shim():
+    server = _start_server()
+    old_url = core.BOOK_URL
+    core.BOOK_URL = f"http://127.0.0.1:{server.server_address[1]}/saveData"
+    try:
+        msg = book_sync(cookie="", user_id="1", user_name="n", place="MPC327 管弦乐学部琴房（UP）",
+                        start_time="2025-09-17 20:00", end_time="2025-09-17 22:00")
+        assert msg.status is BookingStatus.SUCCESS and str(msg) == "保存成功 2025-09-17 20:00"
+        assert book_sync(cookie="", user_id="1", user_name="n", place="不存在",
+                         start_time="2025-09-17 20:00", end_time="2025-09-17 22:00").status is BookingStatus.INVALID
+    finally:
+        core.BOOK_URL = old_url
+        server.shutdown()
+
+
+def test_network_error_message():
+    async def run():
+        client = AsyncCrazyRequests(proxies={"http": "127.0.0.1:1", "https": "127.0.0.1:1"}, cookie="")
+        return await async_book(client, user_id="1", user_name="n", place="MPC327 管弦乐学部琴房（UP）",
+                                start_time="2025-09-17 20:00", end_time="2025-09-17 22:00")
+
+    assert asyncio.run(run()).status is BookingStatus.NETWORK_ERROR
+
+
+def test_https_fallback_uses_shared_policy():
+    """自签名证书：验证失败后降级并记入 TLS_POLICY，与同步客户端共用策略"""
+    TLS_POLICY.clear()
+    server = _start_server(HttpsServer)
+    url = f"https://127.0.0.1:{server.server_address[1]}/"
+    try:
+        async def run():
+            client = AsyncCrazyRequests(proxies=None, cookie="")
+            first = await client.get(url)
+            policy = TLS_POLICY.get("127.0.0.1")
+            second = await client.get(url)
+            client.close()
+            return first, policy, second, client.stats()
+
+        first, policy, second, st = asyncio.run(run())
+        assert first.content == second.content == b"hello world"
+        assert policy is False
+        # 降级后的连接被复用，第二次请求不再握手
+        assert st["connections"] == 1 and st["requests"] == 2
+    finally:
+        TLS_POLICY.clear()
+        server.shutdown()
+
+
+def test_connects_through_dns_cache():
+    """建连使用 DNS_CACHE 固定的地址，不再自行解析"""
+    server = _start_server()
+    port = server.server_address[1]
+    saved = dns_cache.socket.getaddrinfo
+    calls = []
+
+    def fake(host, *args, **kwargs):
+        if host == "booking.test":
+            calls.append(host)
+            return saved("127.0.0.1", *args, **kwargs)
+        return saved(host, *args, **kwargs)
+
+    dns_cache.socket.getaddrinfo = fake
+    try:
+        DNS_CACHE.pin("booking.test", port)
+
+        async def run():
+            client = AsyncCrazyRequests(proxies=None, cookie="", pool_size=2)
+            responses = await asyncio.gather(*(client.get(f"http://booking.test:{port}/") for _ in range(4)))
+            client.close()
+            return responses, client.stats()
+
+        responses, st = asyncio.run(run())
+        assert all(r.content == b"hello world" for r in responses)
+        assert len(calls) == 1 and st["connections"] == 2
+        assert DNS_CACHE.stats()["127.0.0.1"].successes >= 2
+    finally:
+        dns_cache.socket.getaddrinfo = saved
+        DNS_CACHE.unpin("booking.test", port)
+        server.shutdown()
+
+
+def test_engine_uses_async_client_when_configured():
+    server = _start_server()
+    old_url = core.BOOK_URL
+    core.BOOK_URL = f"http://127.0.0.1:{server.server_address[1]}/saveData"
+    cfg = AppConfig(async_client=True)
+    try:
+        engine = BookingEngine(cfg, [("MPC327 管弦乐学部琴房（UP）", "2025-09-17 18:00", "2025-09-17 20:00")],
+                               on_log=lambda m: None)
+        assert engine.book_func is book_sync
+        st = engine.run()[0]
+        assert st.status is BookingStatus.SUCCESS and st.last_message == "保存成功 2025-09-17 18:00"
+        sync_cfg = AppConfig(async_client=False)
+        assert BookingEngine(sync_cfg, [], on_log=lambda m: None).book_func is core.book
+    finally:
+        core.BOOK_URL = old_url
+        server.shutdown()
+
+
+def main():
+    print("=" * 60)
+    print("异步预订客户端测试")
+    print("=" * 60)
+    test_parser_incremental()
+    test_parser_close_delimited()
+    test_many_concurrent_bookings_on_one_loop()
+    test_book_sync_shim()
+    test_network_error_message()
+    test_https_fallback_uses_shared_policy()
+    test_connects_through_dns_cache()
+    test_engine_uses_async_client_when_configured()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
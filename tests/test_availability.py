@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+测试房间 × 时段空闲索引
+"""
+
+import os
+import sys
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from availability import AvailabilityIndex
+from booking_engine import BookingEngine
+from constants import PLACES
+from helpers import AppConfig
+from retry_policy import BookingResult, BookingStatus
+
+DAY = date(2025, 9, 17)
+D = DAY.strftime("%Y-%m-%d")
+UP_ROOMS = [p for p in PLACES if p.endswith("（UP）")]
+
+
+def test_mark_and_query():
+    index = AvailabilityIndex(start_date=DAY, days=2)
+    room = UP_ROOMS[0]
+    assert index.is_free(room, f"{D} 18:00", f"{D} 20:00")
+    assert index.mark_busy(room, f"{D} 18:30", f"{D} 19:00")
+    assert not index.is_free(room, f"{D} 18:00", f"{D} 20:00")
+    assert index.is_free(room, f"{D} 19:00", f"{D} 21:00")
+    # 不足半小时按整个时段计
+    index.mark_busy(room, f"{D} 21:10", f"{D} 21:20")
+    assert not index.is_free(room, f"{D} 21:00", f"{D} 21:30")
+    index.mark_free(room, f"{D} 21:00", f"{D} 21:30")
+    assert index.is_free(room, f"{D} 21:00", f"{D} 21:30")
+    # 索引范围外的更新被忽略
+    assert not index.mark_busy(room, f"{DAY + timedelta(days=5):%Y-%m-%d} 18:00", f"{D} 20:00")
+    assert not index.mark_busy("不存在", f"{D} 18:00", f"{D} 20:00")
+
+
+def test_first_free_block_in_any_up_room():
+    index = AvailabilityIndex(start_date=DAY, days=2)
+    # 除最后一个 UP 琴房外，18:00 之后都只剩零散的半小时
+    for room in UP_ROOMS[:-1]:
+        index.load_occupancy([(room, f"{D} 18:00", f"{D} 19:00"), (room, f"{D} 19:30", f"{D} 23:00")])
+    index.mark_busy(UP_ROOMS[-1], f"{D} 18:00", f"{D} 19:30")
+    block = index.first_free(DAY, 120, after="18:00", rooms="*（UP）")
+    assert block == (UP_ROOMS[-1], f"{D} 19:30", f"{D} 21:30")
+    # 非 UP 房间不受影响，18:00 即有空
+    assert index.first_free(DAY, 120, after="18:00") == (PLACES[0], f"{D} 18:00", f"{D} 20:00")
+    # 窗口不足 2 小时
+    assert index.first_free(DAY, 120, after="22:00", rooms="*（UP）") is None
+    # 每个房间各自的第一个空闲段
+    assert index.free_blocks(DAY, 30, after="18:00", rooms=UP_ROOMS[:2]) == [
+        (UP_ROOMS[0], f"{D} 19:00", f"{D} 19:30"), (UP_ROOMS[1], f"{D} 19:00", f"{D} 19:30")]
+    assert index.free_blocks(DAY, 60, after="18:00", rooms=UP_ROOMS[:2]) == []
+
+
+def test_load_occupancy_replaces_day():
+    index = AvailabilityIndex(start_date=DAY, days=1)
+    room = PLACES[0]
+    index.mark_busy(room, f"{D} 08:00", f"{D} 10:00")
+    index.load_occupancy([(room, f"{D} 12:00", f"{D} 13:00")], day=DAY, places=[room])
+    assert index.is_free(room, f"{D} 08:00", f"{D} 10:00")
+    assert not index.is_free(room, f"{D} 12:00", f"{D} 13:00")
+    heat = index.occupancy(DAY)
+    assert heat.shape == (len(PLACES), 34)
+    assert heat[0].sum() == 2 and heat[1:].sum() == 0
+
+
+def test_engine_updates_index():
+    index = AvailabilityIndex(start_date=DAY, days=1)
+    rooms = [PLACES[2], PLACES[11]]
+
+    def fake(place, **kwargs):
+        if place == rooms[0]:
+            return BookingResult.from_message("手速太慢，该时间段已经被预订啦", 200)
+        return BookingResult.from_message("保存成功", 200)
+
+    cfg = AppConfig()
+    engine = BookingEngine(cfg, [(rooms, f"{D} 18:00", f"{D} 20:00")], on_log=lambda m: None,
+                           book_func=fake, availability=index)
+    states = engine.run()
+    assert states[0].status is BookingStatus.SUCCESS
+    assert not index.is_free(rooms[0], f"{D} 18:00", f"{D} 20:00")
+    assert not index.is_free(rooms[1], f"{D} 18:00", f"{D} 20:00")
+    assert index.first_free(DAY, 120, after="18:00", rooms=rooms) == (rooms[0], f"{D} 20:00", f"{D} 22:00")
+
+
+def test_benchmark():
+    index = AvailabilityIndex(start_date=DAY, days=8)
+    for i, room in enumerate(PLACES):
+        index.mark_busy(room, f"{D} {6 + i % 12:02d}:00", f"{D} {8 + i % 12:02d}:30")
+    n = 2000
+    t = timeit.timeit(lambda: index.first_free(DAY, 120, after="18:00", rooms="*（UP）"), number=n) / n
+    print(f"[OK] 查询 {len(PLACES)} 个房间的第一个 2 小时空闲段：{t * 1e6:.1f} us/次")
+
+
+def main():
+    print("=" * 60)
+    print("房间 × 时段空闲索引测试")
+    print("=" * 60)
+    test_mark_and_query()
+    test_first_free_block_in_any_up_room()
+    test_load_occupancy_replaces_day()
+    test_engine_updates_index()
+    test_benchmark()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
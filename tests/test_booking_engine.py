@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+测试并发预订引擎（使用假的 book 函数，不访问网络）
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from booking_engine import BookingEngine, RateLimiter
+from constants import PLACES
+from helpers import AppConfig
+from main import network_error
+from retry_policy import BookingResult, BookingStatus
+from utils import expand_places
+
+CHUNKS = [
+    ("MPC319 管弦乐学部", "2025-09-17 18:00", "2025-09-17 20:00"),
+    ("MPC320 管弦乐学部", "2025-09-17 18:00", "2025-09-17 20:00"),
+    ("MPC321 室内乐琴房（GP）", "2025-09-17 18:00", "2025-09-17 20:00"),
+]
+
+
+class FakeBook:
+    """记录并发度的假 book()：前 fail_times 次返回未知消息，之后按地点返回结果"""
+
+    def __init__(self, delay=0.1, fail_times=0):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.calls = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, place, **kwargs):
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.inflight -= 1
+        if n <= self.fail_times:
+            return BookingResult.from_message("系统繁忙", 200)
+        if "GP" in place:
+            return BookingResult.from_message("手速太慢，该时间段已经被预订啦", 200)
+        return BookingResult.from_message("保存成功", 200)
+
+
+def _run(cfg, fake):
+    logs, popups = [], []
+    engine = BookingEngine(cfg, CHUNKS, on_log=logs.append,
+                           on_popup=lambda level, msg: popups.append((level, msg)), book_func=fake)
+    t0 = time.monotonic()
+    states = engine.run()
+    return states, popups, time.monotonic() - t0
+
+
+def test_chunks_fire_in_parallel():
+    cfg = AppConfig(max_concurrency=8, rate_limit=0)
+    fake = FakeBook(delay=0.2)
+    states, popups, elapsed = _run(cfg, fake)
+    print(f"[OK] 3 个片段耗时 {elapsed:.3f}s，最大并发 {fake.max_inflight}")
+    assert fake.max_inflight == 3
+    assert all(st.done for st in states)
+    assert sorted(level for level, _ in popups) == ["info", "info", "warn"]
+
+
+def test_concurrency_cap():
+    cfg = AppConfig(max_concurrency=1, rate_limit=0)
+    fake = FakeBook(delay=0.05, fail_times=3)
+    states, popups, _ = _run(cfg, fake)
+    assert fake.max_inflight == 1
+    assert sum(st.attempts for st in states) == 6
+
+
+def test_stop_event_cancels_retries():
+    cfg = AppConfig(max_concurrency=4, rate_limit=0)
+    fake = FakeBook(delay=0.01, fail_times=10 ** 6)
+    engine = BookingEngine(cfg, CHUNKS, on_log=lambda m: None, book_func=fake)
+    t = threading.Thread(target=engine.run)
+    t.start()
+    time.sleep(0.3)
+    engine.stop()
+    t.join(timeout=2)
+    assert not t.is_alive()
+    assert not any(st.done for st in engine.states)
+
+
+def test_slow_first_request_does_not_block_other_chunks():
+    """某个片段的首轮请求迟迟不返回时，其他片段照常重试"""
+    release = threading.Event()
+    calls = {}
+    lock = threading.Lock()
+
+    def fake(place, **kwargs):
+        with lock:
+            calls[place] = n = calls.get(place, 0) + 1
+        if place == CHUNKS[0][0]:
+            # 直到另一个片段重试成功才返回（超时说明它的重试被这个请求挡住了）
+            assert release.wait(5), "其他片段的重试被挡住"
+            return BookingResult.from_message("保存成功", 200)
+        if n == 1:
+            return BookingResult.from_message("系统繁忙", 200)
+        release.set()
+        return BookingResult.from_message("保存成功", 200)
+
+    engine = BookingEngine(AppConfig(), CHUNKS[:2], on_log=lambda m: None, book_func=fake)
+    states = engine.run()
+    assert release.is_set()
+    assert all(st.status is BookingStatus.SUCCESS for st in states)
+    assert calls == {CHUNKS[0][0]: 1, CHUNKS[1][0]: 2}
+
+
+def test_burst_suppresses_duplicates():
+    cfg = AppConfig(max_concurrency=16, burst_size=3, burst_offsets_ms=[-20, 0, 20])
+    fake = FakeBook(delay=0.05)
+    logs, popups = [], []
+    engine = BookingEngine(cfg, CHUNKS, on_log=logs.append,
+                           on_popup=lambda level, msg: popups.append((level, msg)), book_func=fake)
+    fire_at = datetime.now() + timedelta(milliseconds=100)
+    states = engine.run(fire_at=fire_at)
+    assert fake.calls == 9
+    assert all(st.done and st.attempts == 3 for st in states)
+    # 每个片段只弹一次窗，其余两个结果只记日志
+    assert sorted(level for level, _ in popups) == ["info", "info", "warn"]
+    assert sum("已有结果，忽略" in m for m in logs) == 6
+
+
+def test_burst_budget():
+    cfg = AppConfig(max_concurrency=16, burst_size=2, burst_offsets_ms=[0, 10], burst_budget=4)
+    fake = FakeBook(delay=0.01, fail_times=10 ** 6)
+    popups = []
+    engine = BookingEngine(cfg, CHUNKS[:1], on_log=lambda m: None,
+                           on_popup=lambda level, msg: popups.append((level, msg)), book_func=fake)
+    states = engine.run()
+    assert fake.calls == 4
+    assert states[0].sent == 4 and not states[0].done
+    assert popups and popups[0][0] == "warn" and "上限" in popups[0][1]
+
+
+def test_network_errors_back_off_then_give_up():
+    cfg = AppConfig(retry_error_deadline=0.5, retry_backoff_cap=0.2)
+    calls = []
+
+    def failing(place, **kwargs):
+        calls.append(time.monotonic())
+        return network_error()
+
+    popups = []
+    engine = BookingEngine(cfg, CHUNKS[:1], on_log=lambda m: None,
+                           on_popup=lambda level, msg: popups.append((level, msg)), book_func=failing)
+    states = engine.run()
+    assert not states[0].done and "连续出错" in states[0].retry.reason
+    # 退避间隔下限决定调用次数上限；机器繁忙时调用可能更少
+    assert 2 <= len(calls) <= 8
+    assert popups == [("error", "请求失败，请检查网络、代理服务器或 VPN。")]
+
+
+GP_ROOMS = ["MPC412 室内乐琴房（GP）", "MPC418 管弦乐学部琴房（GP）", "MPC419 管弦乐学部琴房（GP）"]
+
+
+def test_expand_places():
+    candidates = expand_places(GP_ROOMS[1], ["MPC412 室内乐琴房（GP）", "MPC4*（GP）"], PLACES)
+    assert candidates[:3] == [GP_ROOMS[1], GP_ROOMS[0], GP_ROOMS[2]]
+    assert len(candidates) == len(set(candidates))
+    assert all(p.startswith("MPC4") and p.endswith("（GP）") for p in candidates)
+    assert expand_places("MPC319 管弦乐学部", ["", "不存在*"], PLACES) == ["MPC319 管弦乐学部"]
+
+
+def test_failover_to_next_candidate():
+    calls = []
+
+    def fake(place, **kwargs):
+        calls.append(place)
+        if place == GP_ROOMS[2]:
+            return BookingResult.from_message("保存成功", 200)
+        return BookingResult.from_message("手速太慢，该时间段已经被预订啦", 200)
+
+    logs, popups = [], []
+    # 重试间隔设得很长：切换候选若等待了重试间隔，耗时会远超下面的上限
+    cfg = AppConfig(retry_hot_interval=10.0, retry_interval=10.0)
+    engine = BookingEngine(cfg, [(GP_ROOMS, "2025-09-17 18:00", "2025-09-17 20:00")], on_log=logs.append,
+                           on_popup=lambda level, msg: popups.append((level, msg)), book_func=fake)
+    t0 = time.monotonic()
+    states = engine.run()
+    # 切换候选不等待重试间隔
+    assert time.monotonic() - t0 < 5.0
+    assert calls == GP_ROOMS
+    assert states[0].done and states[0].place == GP_ROOMS[2] and states[0].status is BookingStatus.SUCCESS
+    assert popups == [("info", f"保存成功：{states[0].label}")]
+    assert sum("改抢候选" in m for m in logs) == 2
+
+
+def test_failover_waits_for_inflight_requests():
+    """突发中先返回“已被预订”、较慢的请求随后成功（是自己订到的）：不应再去抢下一个候选"""
+    calls = []
+    lock = threading.Lock()
+
+    def fake(place, **kwargs):
+        with lock:
+            calls.append(place)
+            n = len(calls)
+        if n == 1:
+            time.sleep(0.5)
+            return BookingResult.from_message("保存成功", 200)
+        return BookingResult.from_message("手速太慢，该时间段已经被预订啦", 200)
+
+    # 第三个请求在“已被预订”返回之后、成功返回之前发出，仍应发往首选地点
+    cfg = AppConfig(burst_size=3, burst_offsets_ms=[0, 20, 80])
+    popups = []
+    engine = BookingEngine(cfg, [(GP_ROOMS, "2025-09-17 18:00", "2025-09-17 20:00")], on_log=lambda m: None,
+                           on_popup=lambda level, msg: popups.append((level, msg)), book_func=fake)
+    states = engine.run()
+    assert calls == [GP_ROOMS[0]] * 3
+    assert states[0].done and states[0].place == GP_ROOMS[0] and states[0].status is BookingStatus.SUCCESS
+    assert [level for level, _ in popups] == ["info"]
+
+
+def test_all_candidates_taken():
+    def fake(place, **kwargs):
+        return BookingResult.from_message("手速太慢，该时间段已经被预订啦", 200)
+
+    popups = []
+    engine = BookingEngine(AppConfig(), [(GP_ROOMS, "2025-09-17 18:00", "2025-09-17 20:00")], on_log=lambda m: None,
+                           on_popup=lambda level, msg: popups.append((level, msg)), book_func=fake)
+    states = engine.run()
+    assert states[0].done and states[0].attempts == 3
+    assert len(popups) == 1 and popups[0][0] == "warn" and "3 个候选地点均已被预订" in popups[0][1]
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(rate=20, burst=1)
+    t0 = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    elapsed = time.monotonic() - t0
+    # 令牌桶容量为 1：后 4 个请求各需等待 1/20 秒。只断言下限（等待不会提前结束），上限留足余量
+    assert 0.15 <= elapsed < 5.0
+
+
+def main():
+    print("=" * 60)
+    print("并发预订引擎测试")
+    print("=" * 60)
+    test_chunks_fire_in_parallel()
+    test_concurrency_cap()
+    test_stop_event_cancels_retries()
+    test_slow_first_request_does_not_block_other_chunks()
+    test_burst_suppresses_duplicates()
+    test_burst_budget()
+    test_network_errors_back_off_then_give_up()
+    test_expand_places()
+    test_failover_to_next_candidate()
+    test_failover_waits_for_inflight_requests()
+    test_all_candidates_taken()
+    test_rate_limiter()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+测试命令行（无界面）预订
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import cli
+from config import ConfigManager
+from constants import PLACES
+from retry_policy import BookingResult
+from utils import build_chunks
+
+CONFIG = f"""
+target_time: "2030-01-01 21:00:00"
+cookie: "JSESSIONID=x"
+user_id: "1"
+user_name: "n"
+user_email: "e"
+user_phone: "p"
+clock_sync_enabled: false
+prewarm_enabled: false
+requests:
+  - {{place: "{PLACES[0]}", date: "2030-01-02", start: "18:00", end: "21:00", fallbacks: ["{PLACES[1]}"]}}
+"""
+
+
+def _write_config(text: str = CONFIG) -> str:
+    fd, path = tempfile.mkstemp(suffix=".yaml")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def test_dry_run_without_qt():
+    path = _write_config()
+    try:
+        code = (
+            "import sys; sys.path.insert(0, 'src'); import cli; "
+            f"rc = cli.main(['--config', {path!r}, '--dry-run']); "
+            "assert not [m for m in sys.modules if m.startswith('PySide6')], 'imported Qt'; "
+            "sys.exit(rc)"
+        )
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+        assert out.returncode == 0, out.stderr
+        assert "共 2 个片段" in out.stdout
+        # python -m src 入口
+        out = subprocess.run([sys.executable, "-m", "src", "--config", path, "--dry-run"],
+                             cwd=ROOT, capture_output=True, text=True, timeout=60)
+        assert out.returncode == 0, out.stderr
+        assert f"{PLACES[0]} > {PLACES[1]}" in out.stdout
+    finally:
+        os.remove(path)
+
+
+def test_config_errors():
+    path = _write_config(CONFIG.replace('cookie: "JSESSIONID=x"', 'cookie: ""'))
+    try:
+        assert cli.main(["--config", path, "--dry-run"]) == 2
+    finally:
+        os.remove(path)
+    path = _write_config()
+    try:
+        assert cli.main(["--config", path, "--at", "21:00", "--dry-run"]) == 2
+    finally:
+        os.remove(path)
+
+
+def test_run_books_all_chunks():
+    path = _write_config()
+    try:
+        cfg = ConfigManager.load(path)
+    finally:
+        os.remove(path)
+    chunks = build_chunks(cfg.requests, PLACES)
+    booked = []
+
+    def fake(place, start_time, **kwargs):
+        booked.append((place, start_time))
+        if place == PLACES[0] and start_time.endswith("20:00"):
+            return BookingResult.from_message("手速太慢，该时间段已经被预订啦", 200)
+        return BookingResult.from_message("保存成功", 200)
+
+    assert cli.run(cfg, chunks, None, book_func=fake)
+    assert sorted(booked) == sorted([(PLACES[0], "2030-01-02 18:00"), (PLACES[0], "2030-01-02 20:00"),
+                                     (PLACES[1], "2030-01-02 20:00")])
+
+    def taken(**kwargs):
+        return BookingResult.from_message("手速太慢，该时间段已经被预订啦", 200)
+
+    assert not cli.run(cfg, chunks, None, book_func=taken)
+
+
+def main():
+    print("=" * 60)
+    print("命令行预订测试")
+    print("=" * 60)
+    test_dry_run_without_qt()
+    test_config_errors()
+    test_run_books_all_chunks()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
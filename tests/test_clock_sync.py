@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+测试服务器时钟偏移估计
+本地 HTTP 服务器返回人为偏移的 Date 头
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from main import CrazyRequests
+from clock_sync import ClockSync, ClockSample, ClockEstimate, estimate_offset
+
+SKEW_SECONDS = 7.25
+
+
+# 重定向目标（如登录主机）的时钟与预订主机不同
+LANDING_SKEW_SECONDS = 60.0
+
+
+class _SkewedDateHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    paths = []
+
+    def send_header(self, keyword, value):
+        # BaseHTTPRequestHandler 会自动写入真实的 Date 头，这里替换为偏移后的时间
+        if keyword.lower() == "date":
+            skew = LANDING_SKEW_SECONDS if self.path.startswith("/login") else SKEW_SECONDS
+            value = formatdate(time.time() + skew, usegmt=True)
+        super().send_header(keyword, value)
+
+    def do_HEAD(self):
+        _SkewedDateHandler.paths.append(self.path)
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/login?x=1")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_estimate_against_skewed_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SkewedDateHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = CrazyRequests(proxies=None, cookie="")
+        est = ClockSync(client, url=f"http://127.0.0.1:{server.server_address[1]}/", samples=10).estimate()
+        print(f"[OK] 估计偏移 {est.offset:.3f}s ±{est.error:.3f}s，RTT {est.rtt * 1000:.2f} ms")
+        assert est is not None
+        assert abs(est.offset - SKEW_SECONDS) <= est.error + 0.01
+        assert est.error < 0.2
+        client.close()
+    finally:
+        server.shutdown()
+
+
+def test_redirect_is_not_followed():
+    """对时 URL 重定向时只采样第一跳：Date 头来自预订主机，RTT 只含一个往返"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SkewedDateHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        _SkewedDateHandler.paths = []
+        client = CrazyRequests(proxies=None, cookie="")
+        est = ClockSync(client, url=f"http://127.0.0.1:{server.server_address[1]}/redirect", samples=3).estimate()
+        assert est is not None
+        assert abs(est.offset - SKEW_SECONDS) <= est.error + 0.01
+        assert _SkewedDateHandler.paths == ["/redirect"] * 3
+        client.close()
+    finally:
+        server.shutdown()
+
+
+def test_min_filter_drops_slow_samples():
+    """RTT 过大的样本（区间很宽且偏离）不参与估计"""
+    samples = [
+        ClockSample(t0=100.00, t1=100.01, server_time=105.0),
+        ClockSample(t0=100.50, t1=100.51, server_time=105.0),
+        # 慢样本：若参与交集会与前两个矛盾
+        ClockSample(t0=101.00, t1=103.00, server_time=110.0),
+    ]
+    est = estimate_offset(samples)
+    assert est.samples == 2
+    assert abs(est.rtt - 0.01) < 1e-9
+    assert 4.99 <= est.offset <= 5.5
+
+
+def test_local_fire_time():
+    est = ClockEstimate(offset=2.0, rtt=0.1, error=0.01, samples=5)
+    target = datetime(2025, 9, 16, 21, 0, 0)
+    assert est.local_fire_time(target) == target - timedelta(seconds=2.05)
+
+
+def main():
+    print("=" * 60)
+    print("服务器时钟同步测试")
+    print("=" * 60)
+    test_estimate_against_skewed_server()
+    test_redirect_is_not_followed()
+    test_min_filter_drops_slow_samples()
+    test_local_fire_time()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
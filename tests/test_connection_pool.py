@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+测试长连接客户端的连接复用
+使用本地 HTTP 服务器，无需访问学校网络
+"""
+
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from main import CrazyRequests, get_client, close_clients, release_client
+from prewarm import ConnectionPrewarmer
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    head_paths = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = '{"message": "ok"}'.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        _KeepAliveHandler.head_paths.append(self.path)
+        if self.path == "/":
+            # 与学校主页一样重定向到登录页
+            self.send_response(302)
+            self.send_header("Location", "/login?x=1")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_keep_alive_reuses_connection():
+    """同一客户端连续请求只应建立一次连接"""
+    server = _start_server()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/saveData"
+        client = CrazyRequests(proxies=None, cookie="", pool_size=2)
+        for _ in range(5):
+            assert client.post(url, data={"a": "1"}).json()["message"] == "ok"
+        st = client.stats()
+        print(f"[OK] 连接统计: {st}")
+        assert st["requests"] == 5
+        assert st["connections"] == 1
+        assert st["handshakes_avoided"] == 4
+        client.close()
+    finally:
+        server.shutdown()
+
+
+def test_keep_alive_disabled():
+    """keep_alive=False 时每次请求都新建连接"""
+    server = _start_server()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/saveData"
+        client = CrazyRequests(proxies=None, cookie="", keep_alive=False)
+        for _ in range(3):
+            client.post(url, data={"a": "1"})
+        st = client.stats()
+        print(f"[OK] 连接统计: {st}")
+        assert st["connections"] == 3
+        assert st["handshakes_avoided"] == 0
+        client.close()
+    finally:
+        server.shutdown()
+
+
+def test_registry_shares_client():
+    """相同 proxies + cookie 共用同一个客户端，需要更大的连接池时重建，较小的请求沿用已有的客户端"""
+    a = get_client(proxies=None, cookie="c1")
+    b = get_client(proxies={}, cookie="c1")
+    c = get_client(proxies=None, cookie="c2")
+    assert a is b
+    assert a is not c
+    d = get_client(proxies=None, cookie="c1", pool_size=8)
+    assert d is not a and d.pool_size == 8
+    assert get_client(proxies=None, cookie="c1", pool_size=2) is d
+    close_clients()
+
+
+def test_smaller_pool_request_keeps_warm_connections():
+    """连接池较小的调用方（如占用查询）不会关闭已预热的连接"""
+    server = _start_server()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/saveData"
+        warm = get_client(proxies=None, cookie="warm", pool_size=8)
+        warm.post(url, data={"a": "1"})
+        assert get_client(proxies=None, cookie="warm", pool_size=4) is warm
+        warm.post(url, data={"a": "1"})
+        assert warm.stats()["connections"] == 1
+    finally:
+        close_clients()
+        server.shutdown()
+
+
+def test_release_client_on_new_cookie():
+    """Cookie 更新后释放旧 Cookie 的客户端，其他账号的客户端不受影响"""
+    old = get_client(proxies=None, cookie="old")
+    other = get_client(proxies=None, cookie="other")
+    release_client(None, "old")
+    new = get_client(proxies=None, cookie="new")
+    assert get_client(proxies=None, cookie="old") is not old
+    assert get_client(proxies=None, cookie="other") is other and new is not other
+    release_client(None, "never-created")
+    close_clients()
+
+
+def test_head_does_not_follow_redirects():
+    """预热的 HEAD 请求停在第一跳，不跟随重定向"""
+    server = _start_server()
+    try:
+        _KeepAliveHandler.head_paths = []
+        client = CrazyRequests(proxies=None, cookie="")
+        resp = client.head(f"http://127.0.0.1:{server.server_address[1]}/")
+        assert resp.status_code == 302 and resp.headers["Location"] == "/login?x=1"
+        assert _KeepAliveHandler.head_paths == ["/"]
+        client.close()
+    finally:
+        server.shutdown()
+
+
+def test_prewarm_keeps_connections_open():
+    """预热线程到点前建立 N 条连接并保活，之后的请求全部复用"""
+    server = _start_server()
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        client = CrazyRequests(proxies=None, cookie="", pool_size=2)
+        target = datetime.now() + timedelta(seconds=2)
+        warmer = ConnectionPrewarmer(client, target, lead_seconds=1.5, connections=2,
+                                     ping_interval=0.5, url=base + "/")
+        warmer.start()
+        warmer.join(timeout=5)
+        assert not warmer.is_alive()
+        warm = client.stats()
+        print(f"[OK] 预热后连接统计: {warm}")
+        assert warm["connections"] == 2
+        assert warm["requests"] > 2
+
+        client.post(base + "/saveData", data={"a": "1"})
+        assert client.stats()["connections"] == 2
+        client.close()
+    finally:
+        server.shutdown()
+
+
+def main():
+    print("=" * 60)
+    print("长连接客户端测试")
+    print("=" * 60)
+    test_keep_alive_reuses_connection()
+    test_keep_alive_disabled()
+    test_registry_shares_client()
+    test_smaller_pool_request_keeps_warm_connections()
+    test_release_client_on_new_cookie()
+    test_head_does_not_follow_redirects()
+    test_prewarm_keeps_connections_open()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+测试 DNS 固定与多地址竞速连接（仅使用本机地址）
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import dns_cache
+from dns_cache import DNS_CACHE, DnsCache
+from helpers import FakeClock, closed_port, listen
+from main import CrazyRequests
+
+
+def _info(ip, port):
+    return socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", (ip, port)
+
+
+class _FakeResolver:
+    """临时替换 getaddrinfo，返回给定的地址列表并统计调用次数"""
+
+    def __init__(self, infos):
+        self.infos = infos
+        self.calls = 0
+
+    def __enter__(self):
+        self._saved = socket.getaddrinfo
+
+        def fake(host, port, *args, **kwargs):
+            if host == "booking.test":
+                self.calls += 1
+                return list(self.infos)
+            return self._saved(host, port, *args, **kwargs)
+
+        dns_cache.socket.getaddrinfo = fake
+        return self
+
+    def __exit__(self, *exc):
+        dns_cache.socket.getaddrinfo = self._saved
+
+
+def test_pinned_lookup_skips_resolver():
+    server = listen()
+    port = server.getsockname()[1]
+    cache = DnsCache()
+    try:
+        with _FakeResolver([_info("127.0.0.1", port)]) as resolver:
+            cache.pin("booking.test", port)
+            for _ in range(5):
+                cache.connect("booking.test", port, timeout=2).close()
+            assert resolver.calls == 1
+    finally:
+        server.close()
+    st = cache.stats()["127.0.0.1"]
+    assert st.successes == 5 and st.latency is not None
+
+
+def test_pin_expires_and_lookup_does_not_pin():
+    clock = FakeClock()
+    cache = DnsCache(pin_ttl=60.0, clock=clock)
+    with _FakeResolver([_info("127.0.0.1", 443)]) as resolver:
+        # 没有固定的主机每次都解析，不会被自动固定
+        cache.lookup("booking.test", 443)
+        cache.lookup("booking.test", 443)
+        assert resolver.calls == 2 and cache.pinned("booking.test", 443) is None
+
+        cache.pin("booking.test", 443)
+        clock.now = 59.0
+        cache.lookup("booking.test", 443)
+        assert resolver.calls == 3
+
+        # 过期后重新解析，直到下一次 pin
+        resolver.infos = [_info("127.0.0.2", 443)]
+        clock.now = 60.0
+        assert [info[4][0] for info in cache.lookup("booking.test", 443)] == ["127.0.0.2"]
+        assert resolver.calls == 4 and cache.pinned("booking.test", 443) is None
+        cache.pin("booking.test", 443)
+        assert [info[4][0] for info in cache.lookup("booking.test", 443)] == ["127.0.0.2"]
+        assert resolver.calls == 5
+
+
+def test_race_skips_dead_address_and_prefers_fastest():
+    server = listen()
+    port = server.getsockname()[1]
+    dead = closed_port()
+    # stagger 远大于本机建连耗时：若要等 stagger 才启动下一个候选，耗时会明显超过下面的上限
+    cache = DnsCache(stagger=2.0)
+    try:
+        # 127.0.0.2 上的端口未监听：连接被拒后应立即启动下一个候选
+        infos = [_info("127.0.0.2", dead), _info("127.0.0.1", port)]
+        with _FakeResolver(infos):
+            cache.pin("booking.test", port)
+            t0 = time.monotonic()
+            sock = cache.connect("booking.test", port, timeout=2)
+            elapsed = time.monotonic() - t0
+            assert sock.getpeername() == ("127.0.0.1", port)
+            sock.close()
+            print(f"[OK] 竞速建连 {elapsed * 1000:.1f} ms，统计: {cache.stats()}")
+            assert elapsed < 1.0
+            # 失败过的地址排到最后，已测速的地址排在前面
+            assert [info[4][0] for info in cache.lookup("booking.test", port)] == ["127.0.0.1", "127.0.0.2"]
+    finally:
+        server.close()
+
+
+def test_stagger_starts_next_address_when_first_is_slow():
+    server = listen()
+    port = server.getsockname()[1]
+    cache = DnsCache(stagger=0.1)
+    # 192.0.2.1（TEST-NET-1）不可达：要么一直无响应，要么立即报错，都不应拖慢建连
+    with _FakeResolver([_info("192.0.2.1", port), _info("127.0.0.1", port)]):
+        cache.pin("booking.test", port)
+        t0 = time.monotonic()
+        sock = cache.connect("booking.test", port, timeout=3)
+        elapsed = time.monotonic() - t0
+    sock.close()
+    server.close()
+    # 只要求明显早于超时：不等第一个地址超时就启动了下一个
+    assert elapsed < 2.0
+
+
+def test_crazy_requests_uses_pinned_addresses():
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    try:
+        with _FakeResolver([_info("127.0.0.1", port)]) as resolver:
+            DNS_CACHE.pin("booking.test", port)
+            client = CrazyRequests(proxies=None, cookie="", keep_alive=False)
+            for _ in range(3):
+                assert client.get(f"http://booking.test:{port}/").content == b"ok"
+            assert resolver.calls == 1
+            client.close()
+    finally:
+        DNS_CACHE.unpin("booking.test", port)
+        server.shutdown()
+
+
+def main():
+    print("=" * 60)
+    print("DNS 固定与竞速建连测试")
+    print("=" * 60)
+    test_pinned_lookup_skips_resolver()
+    test_pin_expires_and_lookup_does_not_pin()
+    test_race_skips_dead_address_and_prefers_fastest()
+    test_stagger_starts_next_address_when_first_is_slow()
+    test_crazy_requests_uses_pinned_addresses()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
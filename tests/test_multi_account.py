@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+测试多账号并行预订（预订函数为假实现）
+"""
+
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from config import AccountProfile
+from constants import PLACES
+from helpers import AppConfig
+from multi_account import MultiAccountEngine, main_account_name, profile_config, profile_jobs
+from retry_policy import BookingResult, BookingStatus
+from utils import build_chunks
+
+D = "2025-09-17"
+
+
+def _cfg(**overrides):
+    fields = dict(cookie="JSESSIONID=main", user_id="100", user_name="主", user_email="m@x", user_phone="1",
+                  max_concurrency=2, retry_hot_interval=0.01, retry_interval=0.01,
+                  retry_backoff_cap=0.05, retry_error_deadline=1.0)
+    fields.update(overrides)
+    return AppConfig(**fields)
+
+
+def Profile(**kwargs):
+    base = dict(name="", cookie="", user_id="", user_name="", user_email="", user_phone="", theme="")
+    base.update(kwargs)
+    return SimpleNamespace(**base)
+
+
+def test_profile_config():
+    cfg = _cfg()
+    assert profile_config(cfg, None) is cfg
+    p = profile_config(cfg, Profile(cookie="JSESSIONID=a", user_id="200", user_name="甲"))
+    # 只有主题沿用主账号，其余个人信息留空即为空，不会借用主账号的身份
+    assert (p.cookie, p.user_id, p.user_name, p.user_email, p.theme) == ("JSESSIONID=a", "200", "甲", "", "练琴")
+    assert profile_config(cfg, Profile(cookie="JSESSIONID=a", user_id="200", theme="合奏")).theme == "合奏"
+    assert cfg.cookie == "JSESSIONID=main"
+    assert main_account_name(cfg) == "主"
+
+
+def test_profile_jobs_skip_incomplete():
+    complete = AccountProfile(name="甲", cookie="JSESSIONID=a", user_id="200")
+    cfg = _cfg(profiles=[
+        complete,
+        AccountProfile(name="乙", user_id="300"),
+        AccountProfile(name="丙", cookie="JSESSIONID=c"),
+        AccountProfile(name="丁", enabled=False),
+    ])
+    logs = []
+    jobs = profile_jobs(cfg, PLACES, on_log=logs.append)
+    assert [(name, p) for name, p, _ in jobs] == [("甲", complete)]
+    assert len(logs) == 2 and "乙" in logs[0] and "丙" in logs[1]
+
+
+def test_build_chunks():
+    items = [SimpleNamespace(place=PLACES[0], date=D, start="18:00", end="21:00", fallbacks=["MPC4*（GP）"])]
+    chunks = build_chunks(items, PLACES)
+    assert [(s, e) for _, s, e in chunks] == [(f"{D} 18:00", f"{D} 20:00"), (f"{D} 20:00", f"{D} 21:00")]
+    assert chunks[0][0][0] == PLACES[0] and len(chunks[0][0]) > 1
+    try:
+        build_chunks([SimpleNamespace(place=" ", date=D, start="18:00", end="20:00", fallbacks=[])], PLACES)
+        assert False, "空地点应抛出 ValueError"
+    except ValueError:
+        pass
+
+
+def test_accounts_share_concurrency_and_report_separately():
+    lock = threading.Lock()
+    inflight = {"now": 0, "max": 0}
+    calls = []
+
+    def fake(cookie, user_id, place, start_time, **kwargs):
+        with lock:
+            inflight["now"] += 1
+            inflight["max"] = max(inflight["max"], inflight["now"])
+            calls.append((cookie, user_id, place))
+        time.sleep(0.05)
+        with lock:
+            inflight["now"] -= 1
+        if user_id == "300" and place == PLACES[2]:
+            return BookingResult.from_message("手速太慢，该时间段已经被预订啦", 200)
+        return BookingResult.from_message("保存成功", 200)
+
+    cfg = _cfg()
+    jobs = [
+        ("主", None, [(PLACES[0], f"{D} 18:00", f"{D} 20:00"), (PLACES[0], f"{D} 20:00", f"{D} 22:00")]),
+        ("甲", Profile(name="甲", cookie="JSESSIONID=a", user_id="200"), [(PLACES[1], f"{D} 18:00", f"{D} 20:00")]),
+        ("乙", Profile(name="乙", cookie="JSESSIONID=b", user_id="300"), [(PLACES[2], f"{D} 18:00", f"{D} 20:00")]),
+    ]
+    logs = []
+    engine = MultiAccountEngine(cfg, jobs, clients={n: object() for n, _, _ in jobs},
+                                on_log=logs.append, book_func=fake)
+    results = engine.run()
+
+    # 并发上限由所有账号共用
+    assert inflight["max"] <= 2
+    # 每个账号用自己的 Cookie 与用户信息
+    assert {(c, u) for c, u, _ in calls} == {("JSESSIONID=main", "100"), ("JSESSIONID=a", "200"),
+                                            ("JSESSIONID=b", "300")}
+    assert [st.status for st in results["主"]] == [BookingStatus.SUCCESS, BookingStatus.SUCCESS]
+    assert results["甲"][0].status is BookingStatus.SUCCESS
+    assert results["乙"][0].status is BookingStatus.TAKEN
+    assert any(m.startswith("[乙] ") for m in logs)
+    summary = engine.summary()
+    print("[OK] " + "\n     ".join(summary))
+    assert summary[0].startswith("[主] 订到 2/2") and summary[2].startswith("[乙] 订到 0/1")
+
+
+def test_duplicate_account_names():
+    try:
+        MultiAccountEngine(_cfg(), [("甲", None, []), ("甲", Profile(), [])], clients={"甲": object()})
+        assert False, "账号名重复应抛出 ValueError"
+    except ValueError:
+        pass
+
+
+def main():
+    print("=" * 60)
+    print("多账号并行预订测试")
+    print("=" * 60)
+    test_profile_config()
+    test_profile_jobs_skip_incomplete()
+    test_build_chunks()
+    test_accounts_share_concurrency_and_report_separately()
+    test_duplicate_account_names()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+测试网络平台后端（Linux 后端读取伪造的 /proc 与 /sys 目录树，不依赖本机网络）
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import netplatform
+from netplatform.base import Interface, normalize_proxies
+from netplatform.linux import LinuxBackend
+from proxy_detector import ProxyDetector
+
+ROUTE = """\
+Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT
+wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0
+cscotun0\t00000000\t00000000\t0001\t0\t0\t50\t00000000\t0\t0\t0
+wlan0\t0001A8C0\t00000000\t0001\t0\t0\t600\t00FFFFFF\t0\t0\t0
+cscotun0\t0000400A\t00000000\t0001\t0\t0\t0\t0000FFFF\t0\t0\t0
+"""
+
+FIB_TRIE = """\
+Main:
+  +-- 0.0.0.0/0 3 0 5
+     |-- 0.0.0.0
+        /0 universe UNICAST
+     +-- 127.0.0.0/8 2 0 2
+        +-- 127.0.0.0/31 1 0 0
+           |-- 127.0.0.0
+              /8 host LOCAL
+           |-- 127.0.0.1
+              /32 host LOCAL
+     +-- 192.168.1.0/24 2 0 2
+           |-- 192.168.1.0
+              /24 link UNICAST
+           |-- 192.168.1.23
+              /32 host LOCAL
+        |-- 192.168.1.255
+           /32 link BROADCAST
+     +-- 10.64.0.0/16 2 0 2
+           |-- 10.64.3.7
+              /32 host LOCAL
+Local:
+  +-- 0.0.0.0/0 3 0 5
+           |-- 192.168.1.23
+              /32 host LOCAL
+"""
+
+IF_INET6 = """\
+00000000000000000000000000000001 01 80 10 80       lo
+fe80000000000000021122fffe334455 03 40 20 80    wlan0
+"""
+
+# 网卡: (flags, type)
+LINKS = {
+    "lo": ("0x9", "772"),
+    "wlan0": ("0x1003", "1"),
+    "cscotun0": ("0x1091", "65534"),
+    "docker0": ("0x1002", "1"),
+}
+
+
+def _fake_root(links=LINKS, route=ROUTE) -> str:
+    root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(root, "proc", "net"))
+    for name, text in (("route", route), ("fib_trie", FIB_TRIE), ("if_inet6", IF_INET6)):
+        with open(os.path.join(root, "proc", "net", name), "w", encoding="ascii") as f:
+            f.write(text)
+    for name, (flags, kind) in links.items():
+        d = os.path.join(root, "sys", "class", "net", name)
+        os.makedirs(d)
+        for fname, value in (("flags", flags), ("type", kind)):
+            with open(os.path.join(d, fname), "w", encoding="ascii") as f:
+                f.write(value + "\n")
+    return root
+
+
+def test_linux_interfaces_and_gateway():
+    root = _fake_root()
+    try:
+        backend = LinuxBackend(root=root, environ={})
+        ifaces = {i.name: i for i in backend.interfaces()}
+        assert sorted(ifaces) == ["cscotun0", "docker0", "lo", "wlan0"]
+        assert ifaces["wlan0"].up and ifaces["wlan0"].addresses == ["192.168.1.23", "fe80::211:22ff:fe33:4455"]
+        assert ifaces["lo"].addresses == ["127.0.0.1", "::1"]
+        assert ifaces["cscotun0"].virtual and ifaces["cscotun0"].addresses == ["10.64.3.7"]
+        assert not ifaces["docker0"].up and ifaces["docker0"].addresses == []
+        # 跃点数最小的默认路由（VPN 隧道没有网关地址）
+        assert backend.default_gateway() == ("cscotun0", "0.0.0.0")
+        assert LinuxBackend(root=root, environ={}).vpn_interface().name == "cscotun0"
+    finally:
+        shutil.rmtree(root)
+
+    # 没有 VPN：默认网关为 Wi-Fi 的网关
+    links = {k: v for k, v in LINKS.items() if k != "cscotun0"}
+    route = "\n".join(line for line in ROUTE.splitlines() if not line.startswith("cscotun0")) + "\n"
+    root = _fake_root(links, route)
+    try:
+        backend = LinuxBackend(root=root, environ={})
+        assert backend.default_gateway() == ("wlan0", "192.168.1.1")
+        assert backend.vpn_interface() is None
+    finally:
+        shutil.rmtree(root)
+
+    # 目录不存在（如容器中没有挂载 /proc）时不抛异常
+    backend = LinuxBackend(root=os.path.join(tempfile.gettempdir(), "no-such-root"), environ={})
+    assert backend.default_gateway() is None and backend.vpn_interface() is None
+
+
+def test_vpn_detection_rules():
+    assert Interface("以太网 3", "Cisco AnyConnect Secure Mobility Client Virtual Miniport Adapter",
+                     up=True, addresses=["10.64.3.7"]).looks_like_vpn
+    assert not Interface("Teredo", "Teredo Tunneling Pseudo-Interface", up=True).looks_like_vpn
+    assert not Interface("wlan0", "wlan0", up=True).looks_like_vpn
+
+
+def test_environment_proxies():
+    env = {"https_proxy": "127.0.0.1:9000", "HTTP_PROXY": "http://10.0.0.1:8080", "no_proxy": "localhost"}
+    assert LinuxBackend(environ=env).system_proxy() == {"http": "http://10.0.0.1:8080",
+                                                       "https": "http://127.0.0.1:9000"}
+    assert LinuxBackend(environ={"all_proxy": "socks5://127.0.0.1:7890"}).system_proxy() == {
+        "http": "socks5://127.0.0.1:7890", "https": "socks5://127.0.0.1:7890"}
+    assert LinuxBackend(environ={}).system_proxy() is None
+    assert normalize_proxies({"ftp": "x:1"}) is None
+
+
+def test_detector_uses_backend_without_subprocess():
+    root = _fake_root()
+    saved_backend, saved_popen = netplatform._backend, subprocess.Popen
+
+    def no_subprocess(*args, **kwargs):
+        raise AssertionError(f"不应启动子进程: {args}")
+
+    try:
+        netplatform._backend = LinuxBackend(root=root, environ={"http_proxy": "127.0.0.1:9000"})
+        subprocess.Popen = no_subprocess
+        t0 = time.monotonic()
+        assert ProxyDetector.is_anyconnect_connected()
+        assert ProxyDetector.get_system_proxy()["http"] == "http://127.0.0.1:9000"
+        elapsed = time.monotonic() - t0
+        print(f"[OK] VPN 与系统代理检测耗时 {elapsed * 1000:.1f} ms")
+        assert elapsed < 0.5
+    finally:
+        netplatform._backend, subprocess.Popen = saved_backend, saved_popen
+        shutil.rmtree(root)
+
+
+def main():
+    print("=" * 60)
+    print("网络平台后端测试")
+    print("=" * 60)
+    test_linux_interfaces_and_gateway()
+    test_vpn_detection_rules()
+    test_environment_proxies()
+    test_detector_uses_backend_without_subprocess()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
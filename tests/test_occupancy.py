@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+测试占用数据并发获取与缓存（本地桩服务器回放 fixtures 中的响应）
+fixtures/occupancy_2025-09-17.json 是按推测的接口格式手工构造的合成数据，不是从真实接口录制的
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "src"))
+
+from availability import AvailabilityIndex
+from helpers import FakeClock
+from main import FID_MAP, CrazyRequests
+from occupancy import OccupancyCache, OccupancyFetcher, parse_occupancy
+
+DAY = date(2025, 9, 17)
+D = DAY.strftime("%Y-%m-%d")
+PLACES = list(FID_MAP)
+
+with open(os.path.join(TESTS_DIR, "fixtures", "occupancy_2025-09-17.json"), encoding="utf-8") as f:
+    RECORDED = json.load(f)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """按 fid 回放 fixtures 中的响应，支持 ETag 条件请求"""
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    hits = 0
+    not_modified = 0
+    inflight = 0
+    max_inflight = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.hits += 1
+            cls.inflight += 1
+            cls.max_inflight = max(cls.max_inflight, cls.inflight)
+        try:
+            query = parse_qs(urlsplit(self.path).query)
+            fid, day = query["fid"][0], query["date"][0]
+            time.sleep(0.02)
+            if self.headers.get("Cookie") == "JSESSIONID=busy":
+                # 接口出错：仍是 JSON，但没有记录列表
+                body, etag = json.dumps({"code": 500, "msg": "系统繁忙", "data": None}).encode("utf-8"), None
+            elif self.headers.get("Cookie") != "JSESSIONID=ok":
+                body, etag = b"<html>login</html>", None
+            else:
+                body = json.dumps(RECORDED[fid] if day == D else {"list": []}).encode("utf-8")
+                etag = f'"{fid}-{day}"'
+            if etag and self.headers.get("If-None-Match") == etag:
+                with cls.lock:
+                    cls.not_modified += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json" if etag else "text/html")
+            if etag:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.inflight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def _start():
+    for name in ("hits", "not_modified", "inflight", "max_inflight"):
+        setattr(_StubHandler, name, 0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/listData"
+
+
+def test_parse_occupancy():
+    body = json.dumps({"list": [
+        {"startTime": "2025-09-17 18:00:00", "endTime": "2025-09-17 20:00:00"},
+        {"startTime": "2025-09-16 22:00:00", "endTime": "2025-09-17 08:00:00"},
+        {"startTime": "2025-09-18 08:00:00", "endTime": "2025-09-18 09:00:00"},
+        {"startTime": "", "endTime": None},
+    ]}).encode("utf-8")
+    assert parse_occupancy(body, DAY) == [(f"{D} 00:00", f"{D} 08:00"), (f"{D} 18:00", f"{D} 20:00")]
+    assert parse_occupancy(b"[]", DAY) == []
+    assert parse_occupancy(b'{"rows": [], "data": null}', DAY) == []
+    for body in (b"<html>login</html>", b'{"code": 500, "msg": "error", "data": null}', b'{"list": {}}', b"42"):
+        try:
+            parse_occupancy(body, DAY)
+            assert False, f"应抛出 ValueError: {body!r}"
+        except ValueError:
+            pass
+
+
+def test_fetch_all_rooms_concurrently():
+    server, url = _start()
+    client = CrazyRequests(proxies=None, cookie="JSESSIONID=ok", pool_size=8)
+    try:
+        fetcher = OccupancyFetcher(client, url=url, max_workers=8)
+        t0 = time.monotonic()
+        results = fetcher.fetch_all(DAY)
+        elapsed = time.monotonic() - t0
+        st = client.stats()
+        print(f"[OK] {len(results)} 个房间并发查询耗时 {elapsed * 1000:.0f} ms，"
+              f"服务器最大并发 {_StubHandler.max_inflight}，连接统计: {st}")
+        assert len(results) == len(PLACES)
+        assert results[PLACES[0]] == [(f"{D} 09:30", f"{D} 11:00"), (f"{D} 18:00", f"{D} 20:00")]
+        assert results[PLACES[1]] == []
+        assert _StubHandler.max_inflight > 1
+        # 48 个查询复用连接池中的连接
+        assert st["connections"] <= 8 and st["requests"] == len(PLACES)
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_ttl_cache_and_conditional_requests():
+    server, url = _start()
+    client = CrazyRequests(proxies=None, cookie="JSESSIONID=ok")
+    clock = FakeClock()
+    try:
+        fetcher = OccupancyFetcher(client, url=url, cache=OccupancyCache(ttl=60, clock=clock))
+        first = fetcher.fetch_all(DAY, PLACES[:6])
+        # TTL 内不发请求
+        clock.now = 30
+        assert fetcher.fetch_all(DAY, PLACES[:6]) == first
+        assert _StubHandler.hits == 6
+        # 过期后发条件请求，304 时沿用缓存
+        clock.now = 90
+        assert fetcher.fetch_all(DAY, PLACES[:6]) == first
+        assert _StubHandler.hits == 12 and _StubHandler.not_modified == 6
+        assert fetcher.stats() == {"requests": 12, "not_modified": 6, "cache_hits": 6}
+        # 304 后重新计时
+        clock.now = 120
+        fetcher.fetch_all(DAY, PLACES[:6])
+        assert _StubHandler.hits == 12
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_expired_cookie_keeps_stale_records():
+    server, url = _start()
+    good = CrazyRequests(proxies=None, cookie="JSESSIONID=ok")
+    bad = CrazyRequests(proxies=None, cookie="JSESSIONID=expired")
+    clock = FakeClock()
+    cache = OccupancyCache(ttl=60, clock=clock)
+    try:
+        assert OccupancyFetcher(bad, url=url, cache=cache).fetch_all(DAY, PLACES[:2]) == {}
+        first = OccupancyFetcher(good, url=url, cache=cache).fetch_all(DAY, PLACES[:2])
+        clock.now = 120
+        assert OccupancyFetcher(bad, url=url, cache=cache).fetch_all(DAY, PLACES[:2]) == first
+    finally:
+        good.close()
+        bad.close()
+        server.shutdown()
+
+
+def test_unrecognized_json_keeps_stale_records():
+    server, url = _start()
+    good = CrazyRequests(proxies=None, cookie="JSESSIONID=ok")
+    busy = CrazyRequests(proxies=None, cookie="JSESSIONID=busy")
+    clock = FakeClock()
+    cache = OccupancyCache(ttl=60, clock=clock)
+    try:
+        first = OccupancyFetcher(good, url=url, cache=cache).fetch_all(DAY, PLACES[:2])
+        assert any(first.values())
+        clock.now = 120
+        # 出错响应不会被当作“没有占用”覆盖缓存
+        assert OccupancyFetcher(busy, url=url, cache=cache).fetch_all(DAY, PLACES[:2]) == first
+        assert cache.get(PLACES[0], DAY).records == first[PLACES[0]]
+    finally:
+        good.close()
+        busy.close()
+        server.shutdown()
+
+
+def test_fill_availability_index():
+    server, url = _start()
+    client = CrazyRequests(proxies=None, cookie="JSESSIONID=ok", pool_size=8)
+    index = AvailabilityIndex(start_date=DAY, days=1)
+    try:
+        OccupancyFetcher(client, url=url).fill(index, DAY)
+    finally:
+        client.close()
+        server.shutdown()
+    assert not index.is_free(PLACES[0], f"{D} 18:00", f"{D} 20:00")
+    assert index.is_free(PLACES[1], f"{D} 18:00", f"{D} 20:00")
+    assert not index.is_free(PLACES[5], f"{D} 06:00", f"{D} 08:00")
+    heat = index.occupancy(DAY)
+    assert heat.any(axis=1).sum() == sum(1 for body in RECORDED.values() if body["list"])
+
+
+def test_disabled_without_url():
+    # 接口地址未经核实，没有默认值：未配置 occupancy_url 时拒绝查询
+    try:
+        OccupancyFetcher(None, url="")
+        assert False, "未配置接口时应抛出 ValueError"
+    except ValueError as e:
+        assert "occupancy_url" in str(e)
+
+
+def main():
+    print("=" * 60)
+    print("占用数据获取测试")
+    print("=" * 60)
+    test_parse_occupancy()
+    test_fetch_all_rooms_concurrently()
+    test_ttl_cache_and_conditional_requests()
+    test_expired_cookie_keeps_stale_records()
+    test_unrecognized_json_keeps_stale_records()
+    test_fill_availability_index()
+    test_disabled_without_url()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
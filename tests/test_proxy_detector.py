@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+测试并行代理检测（替换掉真实的连通性测试，不访问学校网络）
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from helpers import closed_port, listen
+import proxy_detector
+from proxy_detector import ProxyDetector
+
+
+class _Patched:
+    """临时替换 ProxyDetector 的连通性测试：proxy_results 的值与 direct 均为 (耗时, 是否可用)"""
+
+    def __init__(self, ports, proxy_results, direct, system=None):
+        self.ports = ports
+        self.proxy_results = proxy_results
+        self.direct = direct
+        self.system = system
+
+    def __enter__(self):
+        self._saved = {name: ProxyDetector.__dict__[name] for name in
+                       ("COMMON_PROXY_PORTS", "test_proxy", "test_direct_connection", "get_system_proxy",
+                        "is_anyconnect_connected")}
+        results, direct, system = self.proxy_results, self.direct, self.system
+
+        def fake_test_proxy(proxy_dict, timeout=5.0):
+            delay, ok = results[proxy_dict["http"]]
+            time.sleep(min(delay, timeout))
+            return ok and delay <= timeout
+
+        def fake_direct(timeout=5.0):
+            time.sleep(min(direct[0], timeout))
+            return direct[1] and direct[0] <= timeout
+
+        ProxyDetector.COMMON_PROXY_PORTS = self.ports
+        ProxyDetector.test_proxy = staticmethod(fake_test_proxy)
+        ProxyDetector.test_direct_connection = staticmethod(fake_direct)
+        ProxyDetector.get_system_proxy = staticmethod(lambda: system)
+        ProxyDetector.is_anyconnect_connected = staticmethod(lambda: False)
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self._saved.items():
+            setattr(ProxyDetector, name, value)
+
+
+def test_local_proxy_wins_over_faster_direct():
+    a, b = listen(), listen()
+    pa, pb = a.getsockname()[1], b.getsockname()[1]
+    ports = [("Reqable", pa), ("Clash", pb), ("None", closed_port())]
+    results = {f"http://127.0.0.1:{pa}": (0.4, True), f"http://127.0.0.1:{pb}": (0.1, True)}
+    try:
+        with _Patched(ports, results, direct=(0.05, True)):
+            assert ProxyDetector.detect_local_proxies() == [("Reqable", pa), ("Clash", pb)]
+            t0 = time.monotonic()
+            proxy = ProxyDetector.auto_detect(deadline=5)
+            elapsed = time.monotonic() - t0
+    finally:
+        a.close()
+        b.close()
+    print(f"[OK] 选中 {proxy}，耗时 {elapsed:.2f}s")
+    # 并行验证：耗时约等于最慢的高优先级候选，而不是各候选之和
+    assert proxy == {"http": f"http://127.0.0.1:{pa}", "https": f"http://127.0.0.1:{pa}"}
+    assert elapsed < 0.9
+
+
+def test_direct_when_no_local_proxy():
+    with _Patched([("Reqable", closed_port())], {}, direct=(0.1, True)):
+        t0 = time.monotonic()
+        assert ProxyDetector.auto_detect(deadline=5) is None
+        assert time.monotonic() - t0 < 1.0
+
+
+def test_grace_limits_wait_for_slow_preferred_route():
+    a = listen()
+    pa = a.getsockname()[1]
+    try:
+        with _Patched([("Reqable", pa)], {f"http://127.0.0.1:{pa}": (2.5, True)}, direct=(0.05, True)):
+            t0 = time.monotonic()
+            assert ProxyDetector.auto_detect(deadline=5) is None
+            elapsed = time.monotonic() - t0
+    finally:
+        a.close()
+    assert proxy_detector.PRIORITY_GRACE <= elapsed < proxy_detector.PRIORITY_GRACE + 0.8
+
+
+def test_overall_deadline():
+    a = listen()
+    pa = a.getsockname()[1]
+    system = {"http": "http://10.0.0.1:1", "https": "http://10.0.0.1:1"}
+    results = {f"http://127.0.0.1:{pa}": (3.0, True), system["http"]: (3.0, True)}
+    try:
+        with _Patched([("Reqable", pa)], results, direct=(3.0, True), system=system):
+            t0 = time.monotonic()
+            assert ProxyDetector.auto_detect(deadline=0.8) is None
+            elapsed = time.monotonic() - t0
+    finally:
+        a.close()
+    assert elapsed < 1.3
+
+
+def test_progress_messages():
+    a = listen()
+    pa = a.getsockname()[1]
+    messages = []
+    try:
+        with _Patched([("Reqable", pa)], {f"http://127.0.0.1:{pa}": (0.05, False)}, direct=(0.1, True)):
+            assert ProxyDetector.auto_detect(deadline=5, on_progress=messages.append) is None
+    finally:
+        a.close()
+    print(f"[OK] 进度: {messages}")
+    assert messages[0] == "正在扫描本地代理端口…"
+    assert messages[1] == "正在验证 3 条线路…"
+    assert f"Reqable (127.0.0.1:{pa}) 不可用" in messages
+    assert "直接连接 可用" in messages
+    assert messages[-1].startswith("使用 直接连接")
+
+
+def main():
+    print("=" * 60)
+    print("并行代理检测测试")
+    print("=" * 60)
+    test_local_proxy_wins_over_faster_direct()
+    test_direct_when_no_local_proxy()
+    test_grace_limits_wait_for_slow_preferred_route()
+    test_overall_deadline()
+    test_progress_messages()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+测试预发送请求（本地 HTTP / HTTPS 服务器，BOOK_URL 被替换为本地地址）
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "src"))
+
+import main as core
+from booking_engine import BookingEngine
+from helpers import AppConfig, HttpsServer
+from main import BookingRequestTemplate
+from raw_sender import RawSender
+from retry_policy import BookingStatus
+from tls_policy import TLS_POLICY
+
+
+FORM = dict(user_id="1", user_name="n", place="MPC327 管弦乐学部琴房（UP）",
+            start_time="2025-09-17 18:00", end_time="2025-09-17 20:00")
+
+
+class _CountingSemaphore:
+    """记录当前占用数的并发信号量（用于检查预发送请求在响应返回前一直占着名额）"""
+
+    def __init__(self, value):
+        self._sem = threading.BoundedSemaphore(value)
+        self._lock = threading.Lock()
+        self.held = 0
+
+    def acquire(self, *args, **kwargs):
+        ok = self._sem.acquire(*args, **kwargs)
+        if ok:
+            with self._lock:
+                self.held += 1
+        return ok
+
+    def release(self):
+        with self._lock:
+            self.held -= 1
+        self._sem.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    completed_at = []
+    semaphore = None
+    held_on_arrival = []
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        raw = self.rfile.read(length)
+        if len(raw) < length:  # 未用上的预发送连接被关闭：请求体不完整
+            self.close_connection = True
+            return
+        form = parse_qs(raw.decode("utf-8"))
+        _Handler.completed_at.append(time.perf_counter())
+        if _Handler.semaphore is not None:
+            # 稍等再查看：发出请求后立即归还名额的实现此时已归还
+            time.sleep(0.1)
+            _Handler.held_on_arrival.append(_Handler.semaphore.held)
+        body = ('{"message": "保存成功 %s"}' % form["bizFieldBookField.startTime"][0]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(body), body))
+
+    def log_message(self, *args):
+        pass
+
+
+def _start(server_cls=ThreadingHTTPServer):
+    _Handler.completed_at = []
+    server = server_cls(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _template(scheme, server):
+    old = core.BOOK_URL
+    core.BOOK_URL = f"{scheme}://127.0.0.1:{server.server_address[1]}/saveData"
+    try:
+        return BookingRequestTemplate.compile(**FORM)
+    finally:
+        core.BOOK_URL = old
+
+
+def test_request_bytes():
+    template = BookingRequestTemplate.compile(**FORM)
+    request = RawSender(None, "JSESSIONID=abc").build_request(template)
+    head, _, body = request.partition(b"\r\n\r\n")
+    assert head.startswith(b"POST /a/field/book/bizFieldBookMain/saveData?reBookMainId=&ruleId=")
+    assert b"\r\nHost: booking.cuhk.edu.cn\r\n" in head
+    assert b"\r\nCookie: JSESSIONID=abc\r\n" in head
+    assert f"\r\nContent-Length: {len(body)}\r\n".encode() in head
+
+
+def test_staged_request_completes_only_on_fire():
+    server = _start()
+    try:
+        staged = RawSender(None, "").stage(_template("http", server))
+        time.sleep(0.3)
+        assert _Handler.completed_at == []  # 最后一个字节未发出，服务器还在等待请求体
+        t0 = time.perf_counter()
+        msg = staged.fire()
+        assert msg.status is BookingStatus.SUCCESS and msg.message == "保存成功 2025-09-17 18:00"
+        print(f"[OK] 预发送请求：写出最后字节后 {(_Handler.completed_at[0] - t0) * 1000:.2f} ms 服务器收到完整请求")
+        assert _Handler.completed_at[0] >= t0
+    finally:
+        server.shutdown()
+
+
+def test_staged_request_over_tls():
+    TLS_POLICY.clear()
+    server = _start(HttpsServer)
+    try:
+        staged = RawSender(None, "").stage(_template("https", server))
+        assert staged.fire().message == "保存成功 2025-09-17 18:00"
+        assert TLS_POLICY.get("127.0.0.1") is False  # 自签名证书：降级并记住策略
+    finally:
+        TLS_POLICY.clear()
+        server.shutdown()
+
+
+def test_engine_fires_staged_requests():
+    server = _start()
+    old = core.BOOK_URL
+    core.BOOK_URL = f"http://127.0.0.1:{server.server_address[1]}/saveData"
+    cfg = AppConfig(burst_size=2, burst_offsets_ms=[0, 20], raw_sender=True)
+
+    def must_not_be_called(**kwargs):
+        raise AssertionError("预发送成功时不应走常规请求")
+
+    logs = []
+    sem = _CountingSemaphore(cfg.max_concurrency)
+    _Handler.semaphore, _Handler.held_on_arrival = sem, []
+    try:
+        engine = BookingEngine(cfg, [(FORM["place"], FORM["start_time"], FORM["end_time"])],
+                               on_log=logs.append, book_func=must_not_be_called, inflight=sem)
+        fire_at = datetime.now() + timedelta(seconds=1.2)
+        states = engine.run(fire_at=fire_at)
+    finally:
+        _Handler.semaphore = None
+        core.BOOK_URL = old
+        server.shutdown()
+    # 服务器收到完整请求时（响应尚未读取）并发名额仍被占用；全部结束后归还
+    assert _Handler.held_on_arrival and all(n >= 1 for n in _Handler.held_on_arrival)
+    assert sem.held == 0
+    assert any("已预发送 2/2" in m for m in logs)
+    assert states[0].done and states[0].last_message.startswith("保存成功")
+    # 第一个请求在 20 ms 内成功时第二个不再发出，其预发送连接被直接关闭
+    assert states[0].attempts in (1, 2)
+    assert len(_Handler.completed_at) == states[0].attempts
+
+
+def main():
+    print("=" * 60)
+    print("预发送请求测试")
+    print("=" * 60)
+    test_request_bytes()
+    test_staged_request_completes_only_on_fire()
+    test_staged_request_over_tls()
+    test_engine_fires_staged_requests()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+测试预编译的预订请求模板，并与逐次构建表单的方式做微基准对比
+"""
+
+import os
+import sys
+import timeit
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import requests
+
+from main import BOOK_URL, FORM_CONTENT_TYPE, BookingRequestTemplate, book, book_params, build_book_form
+from retry_policy import BookingStatus
+
+FORM = dict(user_id="1230000", user_name="张三", place="MPC327 管弦乐学部琴房（UP）",
+            start_time="2025-09-17 18:00", end_time="2025-09-17 20:00",
+            user_email="a@link.cuhk.edu.cn", user_phone="123456", theme="练琴 & 合奏")
+
+
+def _legacy_request() -> requests.PreparedRequest:
+    """旧的热路径：每次构建表单字典，由 requests 编码查询参数与表单"""
+    data = build_book_form(**FORM)
+    return requests.Request("POST", BOOK_URL, params=book_params(), data=data).prepare()
+
+
+def _template_request(template: BookingRequestTemplate) -> requests.PreparedRequest:
+    return requests.Request("POST", template.url, data=template.render(),
+                            headers={"Content-Type": FORM_CONTENT_TYPE}).prepare()
+
+
+def test_template_matches_legacy_encoding():
+    template = BookingRequestTemplate.compile(**FORM)
+    legacy = _legacy_request()
+    new = _template_request(template)
+    assert new.url == legacy.url
+    assert new.headers["Content-Type"] == legacy.headers["Content-Type"]
+    old_form, new_form = parse_qs(legacy.body), parse_qs(new.body.decode("ascii"))
+    ids = ("id", "bizFieldBookField.id", "bizFieldBookField.BId")
+    assert {k: v for k, v in old_form.items() if k not in ids} == {k: v for k, v in new_form.items() if k not in ids}
+    # id 与 BId 相同，field id 另取，且每次渲染都是新的 UUID
+    assert new_form["id"] == new_form["bizFieldBookField.BId"] != new_form["bizFieldBookField.id"]
+    assert len(new_form["id"][0]) == 32
+    assert template.render() != template.render()
+
+
+def test_unknown_place():
+    assert BookingRequestTemplate.compile(**dict(FORM, place="不存在")) is None
+    assert book(cookie="", **dict(FORM, place="不存在")).status is BookingStatus.INVALID
+
+
+def test_book_posts_prebuilt_body():
+    class _Client:
+        def post(self, url, params=None, data=None, json=None):
+            self.url, self.data = url, data
+            return type("R", (), {"content": b'{"message": "ok"}', "status_code": 200})()
+
+    client = _Client()
+    template = BookingRequestTemplate.compile(**FORM)
+    result = book(cookie="", client=client, template=template, **FORM)
+    assert result.message == "ok" and result.status is BookingStatus.UNKNOWN and result.http_status == 200
+    assert client.url == template.url and isinstance(client.data, bytes)
+
+
+def test_benchmark():
+    template = BookingRequestTemplate.compile(**FORM)
+    n = 2000
+    legacy = min(timeit.repeat(_legacy_request, number=n, repeat=3)) / n * 1e6
+    new = min(timeit.repeat(lambda: _template_request(template), number=n, repeat=3)) / n * 1e6
+    render = min(timeit.repeat(template.render, number=n, repeat=3)) / n * 1e6
+    print(f"[Benchmark] 逐次构建: {legacy:.1f} us/次，模板+prepare: {new:.1f} us/次，仅 render: {render:.1f} us/次")
+    # 模板+prepare 与逐次构建只差两三倍，受机器负载影响，只输出不断言；
+    # 仅 render 比逐次构建快一个数量级以上，留足余量只断言先后
+    assert render * 4 < legacy
+
+
+def main():
+    print("=" * 60)
+    print("预订请求模板测试")
+    print("=" * 60)
+    test_template_matches_legacy_encoding()
+    test_unknown_place()
+    test_book_posts_prebuilt_body()
+    test_benchmark()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+测试重试策略（假时钟，不实际等待）
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from helpers import FakeClock
+from main import parse_book_result
+from retry_policy import BookingStatus, RetryPolicy, classify_message
+
+
+def _policy(clock, **kwargs):
+    # 抖动取中值 0.5，结果可精确断言
+    return RetryPolicy(clock=clock, rng=lambda: 0.5, **kwargs)
+
+
+def test_classify_message():
+    assert classify_message("保存成功") is BookingStatus.SUCCESS
+    assert classify_message("手速太慢，该时间段已经被预订啦") is BookingStatus.TAKEN
+    assert classify_message("请求过于频繁") is BookingStatus.RATE_LIMITED
+    assert classify_message("预约尚未开放") is BookingStatus.NOT_OPEN
+    assert classify_message("系统繁忙") is BookingStatus.UNKNOWN
+    assert all(s.terminal for s in (BookingStatus.SUCCESS, BookingStatus.TAKEN, BookingStatus.COOKIE_EXPIRED))
+    print("[OK] 消息分类正确")
+
+
+def test_parse_book_result():
+    # 状态码与响应格式直接决定类别，不依赖消息措辞
+    assert parse_book_result(b"<html>busy</html>", 429).status is BookingStatus.RATE_LIMITED
+    assert parse_book_result(b"<html>oops</html>", 502).status is BookingStatus.SERVER_ERROR
+    assert parse_book_result(b"<html>login</html>", 200).status is BookingStatus.COOKIE_EXPIRED
+    result = parse_book_result('{"message": "保存成功"}'.encode("utf-8"), 200, latency=0.05)
+    assert (result.status, result.http_status, result.latency) == (BookingStatus.SUCCESS, 200, 0.05)
+    assert str(result) == "保存成功"
+    print("[OK] 响应解析为带类别的结果")
+
+
+def test_hot_window_then_interval():
+    clock = FakeClock()
+    policy = _policy(clock, hot_window=2.0, hot_interval=0.05, interval=0.2)
+    state = policy.start()
+    assert policy.next_delay(state, BookingStatus.NOT_OPEN) == 0.05
+    clock.advance(1.9)
+    assert policy.next_delay(state, BookingStatus.UNKNOWN) == 0.05
+    clock.advance(0.2)
+    assert policy.next_delay(state, BookingStatus.NOT_OPEN) == 0.2
+
+
+def test_exponential_backoff_with_cap_and_reset():
+    clock = FakeClock()
+    policy = _policy(clock, backoff_base=0.2, backoff_factor=2.0, backoff_cap=1.0, error_deadline=0)
+    state = policy.start()
+    delays = [policy.next_delay(state, BookingStatus.NETWORK_ERROR) for _ in range(5)]
+    # 0.2, 0.4, 0.8, 1.0, 1.0 取 3/4
+    assert [round(d, 3) for d in delays] == [0.15, 0.3, 0.6, 0.75, 0.75]
+    # 抖动范围 [d/2, d)
+    low = RetryPolicy(clock=clock, rng=lambda: 0.0).backoff(1)
+    high = RetryPolicy(clock=clock, rng=lambda: 0.999).backoff(1)
+    assert low == 0.1 and 0.199 < high < 0.2
+    # 一次非错误结果后重新从 base 开始退避
+    policy.next_delay(state, BookingStatus.NOT_OPEN)
+    assert state.consecutive_errors == 0
+    assert round(policy.next_delay(state, BookingStatus.SERVER_ERROR), 3) == 0.15
+
+
+def test_error_deadline_gives_up():
+    clock = FakeClock()
+    policy = _policy(clock, error_deadline=10.0)
+    state = policy.start()
+    assert policy.next_delay(state, BookingStatus.RATE_LIMITED) is not None
+    clock.advance(9.0)
+    assert policy.next_delay(state, BookingStatus.NETWORK_ERROR) is not None
+    clock.advance(1.0)
+    assert policy.next_delay(state, BookingStatus.NETWORK_ERROR) is None
+    assert "连续出错" in state.reason
+
+
+def test_overall_deadline_and_terminal():
+    clock = FakeClock()
+    policy = _policy(clock, deadline=30.0)
+    state = policy.start()
+    assert policy.next_delay(state, BookingStatus.SUCCESS) is None
+    assert state.reason == "success"
+    clock.advance(30.0)
+    assert policy.next_delay(state, BookingStatus.NOT_OPEN) is None
+    assert "30" in state.reason
+
+
+def main():
+    print("=" * 60)
+    print("重试策略测试")
+    print("=" * 60)
+    test_classify_message()
+    test_parse_book_result()
+    test_hot_window_then_interval()
+    test_exponential_backoff_with_cap_and_reset()
+    test_error_deadline_gives_up()
+    test_overall_deadline_and_terminal()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
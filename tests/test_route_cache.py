@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+测试按网络指纹缓存的线路检测（替换掉真实的检测与复核，不访问学校网络）
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import route_cache
+from proxy_detector import ProxyDetector
+from route_cache import RouteCache, cached_detect, fingerprint_of, network_fingerprint
+
+REQABLE = {"http": "http://127.0.0.1:9000", "https": "http://127.0.0.1:9000"}
+
+
+class _Patched:
+    """临时替换完整检测与单线路复核，记录调用次数"""
+
+    def __init__(self, found, valid=True):
+        self.found = found
+        self.valid = valid
+        self.detects = 0
+        self.validates = []
+
+    def __enter__(self):
+        self._saved = {name: ProxyDetector.__dict__[name] for name in ("detect", "validate")}
+
+        def fake_detect(deadline=6.0, on_progress=None):
+            self.detects += 1
+            return self.found
+
+        def fake_validate(proxy_dict, timeout=3.0):
+            self.validates.append(proxy_dict)
+            return self.valid
+
+        ProxyDetector.detect = staticmethod(fake_detect)
+        ProxyDetector.validate = staticmethod(fake_validate)
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self._saved.items():
+            setattr(ProxyDetector, name, value)
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_fingerprint():
+    a = fingerprint_of(["eth0", "10.0.0.2"], "eth0 10.0.0.1", {"http": "http://p:1"}, [9000])
+    assert a == fingerprint_of(["10.0.0.2", "eth0"], "eth0 10.0.0.1", {"http": "http://p:1"}, [9000])
+    assert a != fingerprint_of(["eth0", "10.8.0.5"], "eth0 10.0.0.1", {"http": "http://p:1"}, [9000])
+    assert a != fingerprint_of(["eth0", "10.0.0.2"], "eth0 10.0.0.1", {}, [9000])
+    assert a != fingerprint_of(["eth0", "10.0.0.2"], "eth0 10.0.0.1", {"http": "http://p:1"}, [])
+    # 真实环境：不访问网络，应在毫秒级完成且结果稳定
+    t0 = time.monotonic()
+    fp = network_fingerprint()
+    elapsed = time.monotonic() - t0
+    print(f"[OK] 网络指纹 {fp}（{elapsed * 1000:.1f} ms）")
+    assert fp == network_fingerprint() and elapsed < 1.0
+
+
+def test_cache_persists_and_expires():
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "route_cache.json")
+        now = [1000.0]
+        cache = RouteCache(path, ttl=60, clock=lambda: now[0])
+        assert cache.get("home") is None
+        cache.put("home", "Reqable (127.0.0.1:9000)", REQABLE)
+        cache.put("campus", "直接连接", None)
+
+        again = RouteCache(path, ttl=60, clock=lambda: now[0])
+        assert again.get("home").proxies == REQABLE
+        assert again.get("campus").proxies is None and again.get("campus").label == "直接连接"
+        now[0] += 61
+        assert again.get("home") is None
+        again.invalidate("campus")
+        assert "campus" not in _read(path)
+
+        # 超出条数上限时丢弃最早检测的
+        for i in range(route_cache.MAX_ENTRIES + 2):
+            now[0] += 1
+            again.put(f"net{i}", "直接连接", None)
+        kept = _read(path)
+        assert len(kept) == route_cache.MAX_ENTRIES and "net0" not in kept and "home" not in kept
+
+        # 损坏的文件视为空缓存；ttl 为 0 时不缓存
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("{broken")
+        assert RouteCache(path).get("net5") is None
+        off = RouteCache(path, ttl=0)
+        off.put("x", "直接连接", None)
+        assert off.get("x") is None
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_hit_skips_detection():
+    tmp = tempfile.mkdtemp()
+    try:
+        cache = RouteCache(os.path.join(tmp, "route_cache.json"))
+        with _Patched(("Reqable (127.0.0.1:9000)", REQABLE)) as p:
+            # 首次：完整检测并写入缓存
+            assert cached_detect(cache, fingerprint=lambda: "home") == REQABLE
+            assert p.detects == 1 and p.validates == []
+
+            # 网络未变化：先交出缓存的线路，只复核这一条，不做完整检测
+            cached, messages = [], []
+            assert cached_detect(cache, on_progress=messages.append, on_cached=cached.append,
+                                 fingerprint=lambda: "home") == REQABLE
+            assert p.detects == 1 and p.validates == [REQABLE] and cached == [REQABLE]
+            assert any("网络未变化" in m for m in messages)
+
+            # 网络变了：完整检测
+            assert cached_detect(cache, fingerprint=lambda: "campus") == REQABLE
+            assert p.detects == 2
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_stale_route_is_redetected():
+    tmp = tempfile.mkdtemp()
+    try:
+        cache = RouteCache(os.path.join(tmp, "route_cache.json"))
+        cache.put("home", "Reqable (127.0.0.1:9000)", REQABLE)
+        with _Patched(("直接连接", None), valid=False) as p:
+            cached = []
+            assert cached_detect(cache, on_cached=cached.append, fingerprint=lambda: "home") is None
+            assert cached == [REQABLE] and p.detects == 1
+        assert cache.get("home").proxies is None
+
+        # 所有线路都不可用：不写入缓存
+        with _Patched(None, valid=False) as p:
+            assert cached_detect(cache, fingerprint=lambda: "home") is None
+            assert p.detects == 1
+        assert cache.get("home") is None
+
+        # 指纹计算失败：不使用缓存，照常检测
+        def broken():
+            raise OSError("no network")
+
+        with _Patched(("直接连接", None)) as p:
+            assert cached_detect(cache, fingerprint=broken) is None
+            assert p.detects == 1
+    finally:
+        shutil.rmtree(tmp)
+
+
+def main():
+    print("=" * 60)
+    print("线路检测缓存测试")
+    print("=" * 60)
+    test_fingerprint()
+    test_cache_persists_and_expires()
+    test_hit_skips_detection()
+    test_stale_route_is_redetected()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+测试高精度定时触发
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+from scheduler import wait_until, PrecisionTimer, FIRE_SKEWS_MS
+
+
+def test_wait_until_skew():
+    """
+    不早于目标触发，且偏差被记录
+    偏差只打印不作断言（取决于机器负载）；上限放宽到 100ms，只用于发现"没有自旋、整段睡过头"这类错误
+    """
+    for _ in range(3):
+        target = datetime.now() + timedelta(milliseconds=200)
+        skew_ms = wait_until(target)
+        print(f"[OK] 触发偏差 {skew_ms:+.3f} ms")
+        assert skew_ms is not None
+        assert datetime.now() >= target
+        assert skew_ms < 100
+        assert FIRE_SKEWS_MS[-1] == skew_ms
+
+
+def test_wait_until_past_target():
+    """目标时间已过时立即返回正偏差"""
+    skew_ms = wait_until(datetime.now() - timedelta(seconds=1))
+    assert skew_ms >= 1000
+
+
+def test_precision_timer_fires_on_background_thread():
+    fired = {}
+
+    def func():
+        fired["thread"] = threading.current_thread()
+
+    timer = PrecisionTimer(datetime.now() + timedelta(milliseconds=100), func)
+    timer.start()
+    timer.join(timeout=2)
+    assert fired["thread"] is timer
+    assert timer.skew_ms is not None
+
+
+def test_timer_run_outlives_caller():
+    """timer_run 返回后脚本结束，进程仍应等到定时器触发（与 threading.Timer 一致）"""
+    code = (
+        "import sys; sys.path.insert(0, %r); from datetime import datetime, timedelta; import main; "
+        "t = (datetime.now() + timedelta(seconds=1.5)).strftime('%%Y-%%m-%%d %%H:%%M:%%S'); "
+        "main.timer_run(t, lambda: print('FIRED', flush=True))" % SRC
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    assert "FIRED" in out.stdout
+
+
+def test_precision_timer_cancel():
+    fired = []
+    timer = PrecisionTimer(datetime.now() + timedelta(seconds=2), lambda: fired.append(1))
+    timer.start()
+    time.sleep(0.05)
+    timer.cancel()
+    timer.join(timeout=2)
+    assert not timer.is_alive()
+    assert fired == []
+    assert timer.skew_ms is None
+
+
+def main():
+    print("=" * 60)
+    print("高精度定时测试")
+    print("=" * 60)
+    test_wait_until_skew()
+    test_wait_until_past_target()
+    test_precision_timer_fires_on_background_thread()
+    test_timer_run_outlives_caller()
+    test_precision_timer_cancel()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
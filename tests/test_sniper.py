@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+测试捡漏轮询（本地桩服务器模拟占用数据，预订函数为假实现）
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from helpers import AppConfig, FakeClock
+from main import FID_MAP, CrazyRequests
+from retry_policy import BookingResult
+from sniper import AdaptiveInterval, Sniper, WatchItem
+
+DAY = date(2025, 9, 17)
+D = DAY.strftime("%Y-%m-%d")
+PLACES = list(FID_MAP)
+ROOMS = PLACES[:3]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """按 fid 返回当前的占用记录，记录未变化时对条件请求回 304"""
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    bookings = {}   # fid -> [(start, end)]
+    version = {}    # fid -> 修改次数
+    hits = 0
+    not_modified = 0
+
+    def do_GET(self):
+        cls = type(self)
+        query = parse_qs(urlsplit(self.path).query)
+        fid = query["fid"][0]
+        with cls.lock:
+            cls.hits += 1
+            records = list(cls.bookings.get(fid, []))
+            etag = f'"{fid}-{cls.version.get(fid, 0)}"'
+            if self.headers.get("If-None-Match") == etag:
+                cls.not_modified += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        body = json.dumps({"list": [{"startTime": s + ":00", "endTime": e + ":00"} for s, e in records]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+    @classmethod
+    def set(cls, place, records):
+        fid = FID_MAP[place]
+        with cls.lock:
+            cls.bookings[fid] = records
+            cls.version[fid] = cls.version.get(fid, 0) + 1
+
+
+def _start():
+    _StubHandler.bookings, _StubHandler.version = {}, {}
+    _StubHandler.hits = _StubHandler.not_modified = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/listData"
+
+
+def test_adaptive_interval():
+    iv = AdaptiveInterval(1.0, 4.0, backoff=2.0)
+    assert [iv.update(False) for _ in range(3)] == [2.0, 4.0, 4.0]
+    assert iv.update(True) == 1.0
+
+
+def test_books_freed_slot():
+    server, url = _start()
+    client = CrazyRequests(proxies=None, cookie="JSESSIONID=ok")
+    clock = FakeClock()
+    booked = []
+
+    def fake_book(place, start_time, end_time, **kwargs):
+        booked.append((place, start_time, end_time))
+        return BookingResult.from_message("保存成功", 200)
+
+    for room in ROOMS:
+        _StubHandler.set(room, [(f"{D} 18:00", f"{D} 20:00")])
+    items = [WatchItem(ROOMS, f"{D} 18:00", f"{D} 20:00"), WatchItem(ROOMS[:1], f"{D} 21:00", f"{D} 22:00")]
+    _StubHandler.set(ROOMS[0], [(f"{D} 18:00", f"{D} 20:00"), (f"{D} 21:00", f"{D} 22:00")])
+    sniper = Sniper(AppConfig(), items, client, url=url, on_log=lambda m: None, book_func=fake_book, clock=clock)
+    try:
+        # 全部被占用：只查询，不预订；之后的轮询只收到 304
+        for i in range(5):
+            clock.now = i * 2.0
+            assert not sniper.poll_once()
+        assert booked == []
+        assert _StubHandler.hits == 15 and _StubHandler.not_modified == 12
+
+        # 第二个房间的预订被取消
+        _StubHandler.set(ROOMS[1], [])
+        clock.now = 10.0
+        assert sniper.poll_once()
+        assert sniper.wait(5)
+        assert booked == [(ROOMS[1], f"{D} 18:00", f"{D} 20:00")]
+        assert items[0].booked == ROOMS[1] and items[1].booked is None
+
+        # 订到的时段不再关注，只剩第一个房间需要查询
+        clock.now = 12.0
+        sniper.poll_once()
+        assert _StubHandler.hits == 19
+
+        m = sniper.metrics()
+        print(f"[OK] 捡漏指标: {m}")
+        assert m["polls"] == 7 and m["requests"] == 19 and m["detections"] == 1
+        assert m["detection_latency_max"] == 2.0
+        assert m["requests_per_minute"] == 19 / (12.0 / 60)
+        assert m["booked"] == 1
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_lost_race_keeps_watching():
+    server, url = _start()
+    client = CrazyRequests(proxies=None, cookie="JSESSIONID=ok")
+    results = iter(["手速太慢，该时间段已经被预订啦", "保存成功"])
+
+    def fake_book(place, **kwargs):
+        return BookingResult.from_message(next(results), 200)
+
+    _StubHandler.set(ROOMS[0], [(f"{D} 18:00", f"{D} 20:00")])
+    item = WatchItem(ROOMS[:1], f"{D} 18:00", f"{D} 20:00")
+    sniper = Sniper(AppConfig(), [item], client, url=url, on_log=lambda m: None, book_func=fake_book)
+    try:
+        sniper.poll_once()
+        _StubHandler.set(ROOMS[0], [])
+        sniper.poll_once()
+        assert sniper.wait(5)
+        assert item.booked is None
+        sniper.poll_once()
+        assert sniper.wait(5)
+        assert item.booked == ROOMS[0]
+        assert sniper.metrics()["booking_attempts"] == 2
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_run_stops_when_all_booked():
+    server, url = _start()
+    client = CrazyRequests(proxies=None, cookie="JSESSIONID=ok")
+    logs = []
+
+    def fake_book(place, **kwargs):
+        return BookingResult.from_message("保存成功", 200)
+
+    item = WatchItem(ROOMS[:2], f"{D} 08:00", f"{D} 09:00")
+    sniper = Sniper(AppConfig(), [item], client, url=url, interval=AdaptiveInterval(0.01, 0.05),
+                    on_log=logs.append, book_func=fake_book)
+    try:
+        t = threading.Thread(target=sniper.run)
+        t.start()
+        t.join(5)
+        assert not t.is_alive()
+        assert item.booked == ROOMS[0]
+        assert logs[-1].startswith("捡漏结束")
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_booking_does_not_block_polling():
+    server, url = _start()
+    client = CrazyRequests(proxies=None, cookie="JSESSIONID=ok")
+    release = threading.Event()
+    calls = []
+
+    def slow_book(place, **kwargs):
+        # 服务器一直回“未开放”，直到测试放行
+        calls.append(place)
+        release.wait(5)
+        return BookingResult.from_message("预约未开放", 200)
+
+    item = WatchItem(ROOMS[:1], f"{D} 08:00", f"{D} 09:00")
+    other = WatchItem(ROOMS[1:2], f"{D} 10:00", f"{D} 11:00")
+    _StubHandler.set(ROOMS[1], [(f"{D} 10:00", f"{D} 11:00")])
+    sniper = Sniper(AppConfig(), [item, other], client, url=url, on_log=lambda m: None, book_func=slow_book,
+                    book_deadline=0.3)
+    try:
+        sniper.poll_once()
+        # 预订还在进行，轮询照常返回；进行中的时段不会重复预订
+        assert item.booking and not sniper.wait(0.1)
+        _StubHandler.set(ROOMS[1], [])
+        sniper.poll_once()
+        assert other.booking and sniper.metrics()["booking_attempts"] == 2
+        release.set()
+        # retry_deadline 为 0（不限）时，捡漏预订也会在 book_deadline 后放弃
+        t0 = time.monotonic()
+        assert sniper.wait(5)
+        print(f"[OK] 未开放时捡漏预订 {time.monotonic() - t0:.2f}s 后放弃，共请求 {len(calls)} 次")
+        assert item.booked is None and other.booked is None
+        assert not item.booking and not other.booking
+    finally:
+        release.set()
+        client.close()
+        server.shutdown()
+
+
+def main():
+    print("=" * 60)
+    print("捡漏轮询测试")
+    print("=" * 60)
+    test_adaptive_interval()
+    test_books_freed_slot()
+    test_lost_race_keeps_watching()
+    test_run_stops_when_all_booked()
+    test_booking_does_not_block_polling()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准：测量导入耗时与窗口首次绘制耗时，并检查启动时不会加载的模块
+每项在独立的子进程中测量（冷启动，模块未被当前进程缓存）。
+超出预算即失败；机器较慢或负载较高时可用环境变量 MUS_STARTUP_BUDGET_SCALE
+按比例放宽预算（如 2 表示预算翻倍）。
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+SCALE = float(os.environ.get("MUS_STARTUP_BUDGET_SCALE", "1"))
+
+# 预算（毫秒）
+CLI_IMPORT_BUDGET_MS = 150        # 命令行入口（不含网络库，--dry-run 只需这些）
+ENGINE_IMPORT_BUDGET_MS = 600     # 预订引擎（含 requests / urllib3）
+GUI_IMPORT_BUDGET_MS = 1500       # 主窗口模块（含 PySide6，不含 QtWebEngine）
+GUI_FIRST_PAINT_BUDGET_MS = 1500  # 创建主窗口到首次绘制（网络检测在后台进行，不计入）
+
+
+def _import_ms(module: str) -> dict:
+    """在子进程中用 -X importtime 测量导入 module 的累计耗时，并返回已加载的模块"""
+    code = (
+        "import sys, json; sys.path.insert(0, %r); import %s; "
+        "print(json.dumps(sorted(sys.modules)))" % (SRC, module)
+    )
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                         capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr[-2000:]
+    cumulative = None
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative = int(parts[1]) / 1000
+    assert cumulative is not None, f"未找到 {module} 的导入耗时"
+    return {"ms": cumulative, "modules": json.loads(out.stdout)}
+
+
+def _check(name: str, ms: float, budget: float):
+    budget *= SCALE
+    assert ms <= budget, f"{name} 耗时 {ms:.1f} ms 超出预算 {budget:.0f} ms（较慢的机器可设置 MUS_STARTUP_BUDGET_SCALE 放宽）"
+    print(f"[OK] {name}: {ms:.1f} ms（预算 {budget:.0f} ms）")
+
+
+def test_import_budgets():
+    cli = _import_ms("cli")
+    _check("导入 cli", cli["ms"], CLI_IMPORT_BUDGET_MS)
+    assert not [m for m in cli["modules"] if m.startswith("PySide6")]
+    # 网络库在真正开抢时才导入
+    assert "requests" not in cli["modules"] and "main" not in cli["modules"]
+
+    engine = _import_ms("booking_engine")
+    _check("导入 booking_engine", engine["ms"], ENGINE_IMPORT_BUDGET_MS)
+    assert not [m for m in engine["modules"] if m.startswith("PySide6")]
+    # 不含网络库的 cli 通常只需 booking_engine 的几分之一，只断言先后
+    assert cli["ms"] < engine["ms"], f"导入 cli（{cli['ms']:.1f} ms）不应慢于 booking_engine（{engine['ms']:.1f} ms）"
+
+
+_GUI_SCRIPT = r"""
+import json, os, sys, time
+sys.path.insert(0, %(src)r)
+t0 = time.perf_counter()
+import main_window
+t_import = time.perf_counter()
+from PySide6 import QtWidgets
+app = QtWidgets.QApplication(sys.argv)
+t1 = time.perf_counter()
+w = main_window.MainWindow()
+w.show()
+deadline = time.perf_counter() + 30
+while w.first_paint_at is None and time.perf_counter() < deadline:
+    app.processEvents()
+result = {
+    "import_ms": (t_import - t0) * 1000,
+    "first_paint_ms": ((w.first_paint_at or deadline) - t1) * 1000,
+    "webengine_loaded": any(m.startswith("PySide6.QtWebEngine") for m in sys.modules),
+}
+w.close()  # 等待后台的网络检测线程结束
+print(json.dumps(result))
+"""
+
+
+def test_gui_startup_budget():
+    try:
+        import PySide6  # noqa: F401
+    except ImportError:
+        print("[SKIP] 未安装 PySide6，跳过窗口启动耗时测试")
+        return
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    out = subprocess.run([sys.executable, "-c", _GUI_SCRIPT % {"src": SRC}],
+                         capture_output=True, text=True, timeout=120, env=env)
+    assert out.returncode == 0, out.stderr[-2000:]
+    r = json.loads(out.stdout.strip().splitlines()[-1])
+    _check("导入 main_window", r["import_ms"], GUI_IMPORT_BUDGET_MS)
+    _check("创建主窗口到首次绘制", r["first_paint_ms"], GUI_FIRST_PAINT_BUDGET_MS)
+    # QtWebEngine 只在需要登录时加载
+    assert not r["webengine_loaded"]
+
+
+def main():
+    print("=" * 60)
+    print("启动耗时基准")
+    print("=" * 60)
+    test_import_budgets()
+    test_gui_startup_budget()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+测试 TLS 验证策略缓存与会话复用
+本地 HTTPS 服务器使用自签名证书（tests/certs/localhost.pem），证书验证必然失败，
+第一次请求降级后，之后的请求应直接禁用验证，每次只握手一次；
+重连时应复用 TLS 会话（直连与经 CONNECT 代理隧道）
+"""
+
+import os
+import select
+import socket
+import ssl
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "src"))
+
+import urllib3
+
+from helpers import HttpsServer
+from main import CrazyRequests
+from tls_policy import TLS_POLICY, TlsPolicyCache, clear_sessions, ssl_context
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server():
+    server = HttpsServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _ConnectProxy(BaseHTTPRequestHandler):
+    """最小的 HTTP CONNECT 代理"""
+    protocol_version = "HTTP/1.1"
+    tunnels = 0
+
+    def do_CONNECT(self):
+        host, port = self.path.rsplit(":", 1)
+        upstream = socket.create_connection((host, int(port)))
+        type(self).tunnels += 1
+        self.send_response(200, "Connection established")
+        self.end_headers()
+        conns = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, _ = select.select(conns, [], [], 5)
+                if not readable:
+                    break
+                for src in readable:
+                    data = src.recv(65536)
+                    if not data:
+                        return
+                    (upstream if src is self.connection else self.connection).sendall(data)
+        finally:
+            upstream.close()
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def test_policy_cache_ttl():
+    now = [0.0]
+    cache = TlsPolicyCache(ttl=10, clock=lambda: now[0])
+    assert cache.get("a") is None
+    cache.set("a", False)
+    assert cache.get("a") is False
+    now[0] = 10.0
+    assert cache.get("a") is None
+
+
+def test_shared_contexts():
+    assert ssl_context(True) is ssl_context(True)
+    assert ssl_context(False) is ssl_context(False)
+    assert ssl_context(True).verify_mode == ssl.CERT_REQUIRED
+    assert ssl_context(False).verify_mode == ssl.CERT_NONE
+
+
+def test_fallback_is_remembered():
+    TLS_POLICY.clear()
+    server = _start_server()
+    url = f"https://127.0.0.1:{server.server_address[1]}/"
+    try:
+        client = CrazyRequests(proxies=None, cookie="", keep_alive=False)
+        for _ in range(4):
+            assert client.get(url).content == b"ok"
+        st = client.stats()
+        print(f"[OK] 4 次请求，握手 {st['connections']} 次（含 1 次验证失败），缓存策略: {TLS_POLICY.get('127.0.0.1')}")
+        # 只有第一次请求多付出一次失败的握手
+        assert st["connections"] == 5
+        assert TLS_POLICY.get("127.0.0.1") is False
+
+        # 另一个客户端（新会话）直接沿用缓存的策略
+        other = CrazyRequests(proxies=None, cookie="", keep_alive=True)
+        for _ in range(3):
+            other.get(url)
+        assert other.stats()["connections"] == 1
+        client.close()
+        other.close()
+    finally:
+        TLS_POLICY.clear()
+        server.shutdown()
+
+
+def test_session_resumption_direct():
+    TLS_POLICY.clear()
+    clear_sessions()
+    server = _start_server()
+    url = f"https://127.0.0.1:{server.server_address[1]}/"
+    try:
+        # 每次请求后服务器断开连接，模拟发布时刻连接被断开后的重连
+        client = CrazyRequests(proxies=None, cookie="", keep_alive=False)
+        for _ in range(4):
+            client.get(url)
+        st = client.stats()
+        print(f"[OK] 直连：TLS 完整握手 {st['tls_full_handshakes']} 次，会话复用 {st['tls_resumed']} 次")
+        # 第一次降级后的握手为完整握手（验证失败的握手未完成，不计入），其余重连均复用会话
+        assert st["tls_full_handshakes"] == 1
+        assert st["tls_resumed"] == 3
+
+        # 新的客户端实例同样复用进程内缓存的会话
+        other = CrazyRequests(proxies=None, cookie="", keep_alive=False)
+        other.get(url)
+        assert other.stats()["tls_resumed"] == 1
+        client.close()
+        other.close()
+    finally:
+        TLS_POLICY.clear()
+        clear_sessions()
+        server.shutdown()
+
+
+def test_session_resumption_through_proxy():
+    clear_sessions()
+    server = _start_server()
+    proxy = ThreadingHTTPServer(("127.0.0.1", 0), _ConnectProxy)
+    proxy.daemon_threads = True
+    threading.Thread(target=proxy.serve_forever, daemon=True).start()
+    _ConnectProxy.tunnels = 0
+    addr = f"http://127.0.0.1:{proxy.server_address[1]}"
+    url = f"https://127.0.0.1:{server.server_address[1]}/"
+    try:
+        client = CrazyRequests(proxies={"http": addr, "https": addr}, cookie="", keep_alive=False)
+        for _ in range(3):
+            assert client.get(url).content == b"ok"
+        st = client.stats()
+        print(f"[OK] 代理隧道：TLS 完整握手 {st['tls_full_handshakes']} 次，会话复用 {st['tls_resumed']} 次")
+        assert _ConnectProxy.tunnels == 3
+        assert st["tls_full_handshakes"] == 1 and st["tls_resumed"] == 2
+        client.close()
+    finally:
+        clear_sessions()
+        proxy.shutdown()
+        server.shutdown()
+
+
+def main():
+    print("=" * 60)
+    print("TLS 验证策略缓存测试")
+    print("=" * 60)
+    test_policy_cache_ttl()
+    test_shared_contexts()
+    test_fallback_is_remembered()
+    test_session_resumption_direct()
+    test_session_resumption_through_proxy()
+    print("[OK] 全部通过")
+
+
+if __name__ == "__main__":
+    main()